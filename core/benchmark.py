@@ -0,0 +1,348 @@
+"""
+View benchmark and query-count regression check.
+
+``manage.py benchmark_views`` builds a throwaway test database, seeds it with
+a dataset of configurable size (restaurants, menu items, customers and
+orders spread over the last ``days`` days) and requests every major view
+through the test client:
+
+- once cold, straight after seeding, with empty caches
+- then ``repeat`` more times warm
+
+Each scenario records the response status, the SQL statements of the cold
+request and the most any warm request ran (streamed CSV bodies are read
+inside the measurement), and wall-clock timings. Because a dataset ten
+times larger must not need more queries, QUERY_BUDGETS do not depend on
+its size.
+
+The budgets are enforced by ViewQueryBudgetTests in core/tests.py, which
+seeds a small dataset and runs every scenario under assertNumQueries, so
+``manage.py test`` fails as soon as a view gains a query. The command is
+the optional extra: it writes the results as a JSON report, and given the
+report of a previous release as a baseline, any increase in queries, or a
+median time more than the tolerance above the baseline's, is reported as
+a regression and the command exits non-zero.
+"""
+import random
+import statistics
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+REPORT_VERSION = 1
+
+# SQL statements a warm request of each scenario runs. ViewQueryBudgetTests
+# (core/tests.py) asserts them exactly; the command treats them as ceilings.
+QUERY_BUDGETS = {
+    'home': 0,
+    'browse_restaurants': 4,
+    'browse_restaurants_search': 7,
+    'restaurant_detail': 1,
+    'dish_typeahead': 0,
+    'customer_dashboard': 9,
+    'owner_dashboard': 9,
+    'admin_dashboard': 29,
+    'analytics_dashboard': 16,
+    'cart_add_ajax': 11,
+    'cart_summary_ajax': 1,
+    'cart_total_count_ajax': 2,
+    'checkout': 4,
+    'process_checkout': 33,
+    'export_orders_csv': 5,
+    'export_revenue_csv': 5,
+    'export_users_csv': 5,
+    'export_restaurants_csv': 5,
+}
+
+ORDER_STATUSES = ['completed'] * 6 + ['confirmed', 'pending', 'preparing', 'ready', 'cancelled']
+PAYMENT_METHODS = ['cash', 'cash', 'paystack', 'bank_transfer', 'pos']
+DISH_WORDS = ['jollof', 'egusi', 'suya', 'pepper', 'soup', 'rice', 'fried', 'chicken', 'beef', 'goat',
+              'plantain', 'yam', 'moi', 'akara', 'puff', 'stew', 'fish', 'spicy', 'grilled', 'okra']
+CATEGORY_NAMES = ['Mains', 'Soups', 'Grills', 'Sides', 'Drinks', 'Desserts']
+
+
+@dataclass
+class Dataset:
+    restaurants: int = 20
+    items: int = 30  # per restaurant
+    customers: int = 200
+    orders: int = 5000
+    days: int = 60
+    seed: int = 1
+
+
+@dataclass
+class Actors:
+    admin: object = None
+    owner: object = None
+    customer: object = None
+    restaurant: object = None
+    menu_item: object = None
+
+
+def seed_dataset(dataset):
+    """Fill the (empty) database with ``dataset``; returns the Actors the scenarios log in as"""
+    from core.models import PlatformSettings
+    from orders.models import Order, OrderItem
+    from orders.rollups import rebuild_rollups
+    from payments.models import Payment
+    from restaurants.models import Category, MenuItem, Restaurant
+    from restaurants.search import rebuild_all
+
+    rng = random.Random(dataset.seed)
+    User = get_user_model()
+    password = make_password(None)
+    now = timezone.now()
+
+    admin = User.objects.create(username='bench-admin', email='admin@bench.test', role='admin',
+                                is_staff=True, is_superuser=True, password=password)
+    owners = User.objects.bulk_create([
+        User(username=f'bench-owner-{i}', email=f'owner{i}@bench.test', role='restaurant_owner', password=password)
+        for i in range(max(dataset.restaurants // 2, 1))
+    ])
+    customers = User.objects.bulk_create([
+        User(username=f'bench-customer-{i}', email=f'customer{i}@bench.test', role='customer', password=password)
+        for i in range(max(dataset.customers, 1))
+    ])
+
+    restaurants = Restaurant.objects.bulk_create([
+        Restaurant(
+            owner=owners[i % len(owners)], name=f'Bench Kitchen {i}', slug=f'bench-kitchen-{i}',
+            description=f'{rng.choice(DISH_WORDS).title()} and {rng.choice(DISH_WORDS)} specialists',
+            address=f'{i} Bench Street', phone='08000000000', email=f'kitchen{i}@bench.test',
+            opening_time='08:00', closing_time='22:00',
+        )
+        for i in range(max(dataset.restaurants, 1))
+    ])
+    categories = Category.objects.bulk_create([
+        Category(restaurant=restaurant, name=name, order=position)
+        for restaurant in restaurants
+        for position, name in enumerate(CATEGORY_NAMES[:4])
+    ])
+    by_restaurant = {}
+    for category in categories:
+        by_restaurant.setdefault(category.restaurant_id, []).append(category)
+    items = MenuItem.objects.bulk_create([
+        MenuItem(
+            category=by_restaurant[restaurant.pk][i % 4],
+            name=f"{' '.join(rng.sample(DISH_WORDS, 2)).title()} {i}",
+            description=' '.join(rng.sample(DISH_WORDS, 5)),
+            price=Decimal(rng.randrange(500, 8000, 50)),
+            track_stock=i % 5 == 0,
+            stock_quantity=1000 if i % 5 == 0 else 0,
+        )
+        for restaurant in restaurants
+        for i in range(max(dataset.items, 1))
+    ], batch_size=1000)
+    menus = {}
+    for item in items:
+        menus.setdefault(item.category.restaurant_id, []).append(item)
+
+    orders, lines = [], []
+    for _ in range(dataset.orders):
+        restaurant = rng.choice(restaurants)
+        customer = rng.choice(customers)
+        picked = rng.sample(menus[restaurant.pk], min(rng.randint(1, 4), len(menus[restaurant.pk])))
+        quantities = [rng.randint(1, 3) for _ in picked]
+        status = rng.choice(ORDER_STATUSES)
+        orders.append(Order(
+            customer=customer, restaurant=restaurant, status=status,
+            total_price=sum(item.price * n for item, n in zip(picked, quantities)),
+            payment_method=rng.choice(PAYMENT_METHODS),
+            payment_status='confirmed' if status == 'completed' else 'pending',
+            customer_name=customer.username, customer_phone='08000000000', customer_email=customer.email,
+        ))
+        lines.append(list(zip(picked, quantities)))
+    orders = Order.objects.bulk_create(orders, batch_size=1000)
+
+    # auto_now_add stamped everything "now"; spread the history over the window
+    for order in orders:
+        order.created_at = order.updated_at = now - timedelta(seconds=rng.randrange(max(dataset.days, 1) * 86400))
+    Order.objects.bulk_update(orders, ['created_at', 'updated_at'], batch_size=1000)
+
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, menu_item=item, quantity=n, price=item.price)
+        for order, order_lines in zip(orders, lines)
+        for item, n in order_lines
+    ], batch_size=2000)
+    Payment.objects.bulk_create([
+        Payment(
+            order=order, amount=order.total_price, reference=f'bench-{order.pk}',
+            status='success' if order.status in ('completed', 'confirmed') else 'pending',
+        )
+        for order in orders if order.payment_method == 'paystack'
+    ], batch_size=1000)
+
+    # bulk_create skips the signals that keep these in step
+    rebuild_rollups()
+    rebuild_all()
+    # Created on first read otherwise, and its save would invalidate the
+    # settings every worker just cached, in the middle of a measurement
+    PlatformSettings.get_settings()
+
+    owner = owners[0]
+    restaurant = restaurants[0]
+    return Actors(
+        admin=admin,
+        owner=owner,
+        customer=customers[0],
+        restaurant=restaurant,
+        menu_item=next(item for item in menus[restaurant.pk] if not item.track_stock),
+    )
+
+
+@dataclass
+class Scenario:
+    name: str
+    url: str
+    user: str = ''  # Actors attribute to log in as; anonymous when empty
+    method: str = 'get'
+    data: dict = None
+    ajax: bool = False
+    # Called with the client before every request, outside the measurement
+    setup: object = None
+    expect: tuple = (200,)
+
+
+def build_scenarios(actors):
+    restaurant = actors.restaurant
+    item = actors.menu_item
+
+    def fill_cart(client):
+        client.post(reverse('add_to_cart', args=[item.pk]), {'quantity': 2})
+
+    return [
+        Scenario('home', reverse('home')),
+        Scenario('browse_restaurants', reverse('browse_restaurants')),
+        Scenario('browse_restaurants_search', reverse('browse_restaurants') + '?search=jollof'),
+        Scenario('restaurant_detail', reverse('restaurant_detail', args=[restaurant.slug])),
+        Scenario('dish_typeahead', reverse('menu_item_typeahead') + '?q=jol'),
+        Scenario('customer_dashboard', reverse('dashboard'), user='customer'),
+        Scenario('owner_dashboard', reverse('restaurant_dashboard'), user='owner'),
+        Scenario('admin_dashboard', reverse('dashboard'), user='admin'),
+        Scenario('analytics_dashboard', reverse('analytics_dashboard'), user='admin'),
+        Scenario('cart_add_ajax', reverse('add_to_cart', args=[item.pk]), user='customer', method='post',
+                 data={'quantity': 1}, ajax=True),
+        Scenario('cart_summary_ajax', reverse('ajax_cart_summary'), user='customer', ajax=True),
+        Scenario('cart_total_count_ajax', reverse('ajax_cart_total_count'), user='customer', ajax=True),
+        Scenario('checkout', reverse('checkout'), user='customer', setup=fill_cart),
+        Scenario('process_checkout', reverse('process_checkout'), user='customer', method='post',
+                 data={'payment_method': 'cash'}, setup=fill_cart, expect=(302,)),
+        Scenario('export_orders_csv', reverse('export_orders'), user='admin'),
+        Scenario('export_revenue_csv', reverse('export_revenue_report'), user='admin'),
+        Scenario('export_users_csv', reverse('export_users'), user='admin'),
+        Scenario('export_restaurants_csv', reverse('export_restaurants'), user='admin'),
+    ]
+
+
+def request_scenario(client, scenario):
+    """Send one request of ``scenario``; returns (status, SQL statements, milliseconds)"""
+    headers = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'} if scenario.ajax else {}
+    with CaptureQueriesContext(connection) as ctx:
+        started = time.perf_counter()
+        response = getattr(client, scenario.method)(scenario.url, scenario.data or {}, **headers)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        elapsed = (time.perf_counter() - started) * 1000
+    return response.status_code, len(ctx.captured_queries), elapsed
+
+
+def run_scenario(scenario, client, repeat):
+    """Request ``scenario`` once cold and ``repeat`` times warm; returns its report entry"""
+    runs = []
+    for _ in range(repeat + 1):
+        if scenario.setup:
+            scenario.setup(client)
+        runs.append(request_scenario(client, scenario))
+    statuses = sorted({status for status, _, _ in runs})
+    cold, warm = runs[0], runs[1:] or runs[:1]
+    timings = sorted(ms for _, _, ms in warm)
+    return {
+        'url': scenario.url,
+        'status': statuses[0] if len(statuses) == 1 else statuses,
+        'expected_status': list(scenario.expect),
+        'cold_queries': cold[1],
+        'queries': max(queries for _, queries, _ in warm),
+        'query_budget': QUERY_BUDGETS.get(scenario.name),
+        'cold_ms': round(cold[2], 2),
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(timings[min(int(len(timings) * 0.95), len(timings) - 1)], 2),
+        'max_ms': round(timings[-1], 2),
+    }
+
+
+def run_benchmark(dataset, repeat=5, only=None):
+    """Seed ``dataset`` and run every scenario (or those named in ``only``); returns the report"""
+    seed_started = time.perf_counter()
+    actors = seed_dataset(dataset)
+    seed_seconds = time.perf_counter() - seed_started
+
+    clients = {}
+    scenarios = {}
+    for scenario in build_scenarios(actors):
+        if only and scenario.name not in only:
+            continue
+        if scenario.user not in clients:
+            clients[scenario.user] = Client()
+            if scenario.user:
+                clients[scenario.user].force_login(getattr(actors, scenario.user))
+        scenarios[scenario.name] = run_scenario(scenario, clients[scenario.user], max(repeat, 1))
+
+    report = {
+        'version': REPORT_VERSION,
+        'generated_at': timezone.now().isoformat(),
+        'database': connection.vendor,
+        'dataset': asdict(dataset),
+        'seed_seconds': round(seed_seconds, 2),
+        'repeat': repeat,
+        'scenarios': scenarios,
+    }
+    report['failures'] = check_budgets(report)
+    return report
+
+
+def check_budgets(report):
+    """Scenarios that answered unexpectedly or ran more queries than their budget"""
+    failures = []
+    for name, result in report['scenarios'].items():
+        if result['status'] not in result['expected_status']:
+            failures.append(f"{name}: status {result['status']}, expected {result['expected_status']}")
+        budget = result.get('query_budget')
+        if budget is not None and result['queries'] > budget:
+            failures.append(f"{name}: {result['queries']} queries, budget {budget}")
+    return failures
+
+
+@dataclass
+class Comparison:
+    regressions: list = field(default_factory=list)
+    improvements: list = field(default_factory=list)
+
+
+def compare_reports(report, baseline, time_tolerance=0.5, min_slack_ms=5.0):
+    """Differences between ``report`` and an earlier ``baseline`` report"""
+    comparison = Comparison()
+    for name, result in report['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        for key in ('queries', 'cold_queries'):
+            if result[key] > before[key]:
+                comparison.regressions.append(f"{name}: {key} {before[key]} -> {result[key]}")
+            elif result[key] < before[key]:
+                comparison.improvements.append(f"{name}: {key} {before[key]} -> {result[key]}")
+        limit = before['p50_ms'] * (1 + time_tolerance) + min_slack_ms
+        if result['p50_ms'] > limit:
+            comparison.regressions.append(
+                f"{name}: p50 {before['p50_ms']:.1f}ms -> {result['p50_ms']:.1f}ms (limit {limit:.1f}ms)"
+            )
+    return comparison
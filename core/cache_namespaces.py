@@ -0,0 +1,79 @@
+"""
+Namespaced access to the shared cache.
+
+Each app keeps its entries in a namespace (menus, stats, settings,
+typeahead, feeds); keys are prefixed with it, so two namespaces never
+share an entry. The namespace's current version lives in the cache itself and
+is passed as Django's ``version`` argument. Clearing a namespace is
+therefore one increment: entries written under the old version are never
+read again and expire on their own TTL. This behaves the same on the locmem,
+file-based and Redis backends, and none of them need key scanning.
+"""
+import time
+
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+NAMESPACES = ('menus', 'stats', 'settings', 'typeahead', 'feeds')
+
+
+def _version_key(namespace):
+    return f"namespace-version:{namespace}"
+
+
+def _check(namespace):
+    if namespace not in NAMESPACES:
+        raise ValueError(f"Unknown cache namespace '{namespace}' (expected one of {', '.join(NAMESPACES)})")
+
+
+def _clock():
+    # Microseconds, so a re-seeded counter lands above any version bumped
+    # since the last one was seeded
+    return time.time_ns() // 1000
+
+
+def get_version(namespace):
+    """Current version of a namespace, created on first use"""
+    _check(namespace)
+    version = cache.get(_version_key(namespace))
+    if version is None:
+        # Seeded from the clock so an evicted counter never comes back lower
+        # than a version that is still cached
+        cache.add(_version_key(namespace), _clock(), None)
+        version = cache.get(_version_key(namespace), _clock())
+    return version
+
+
+def bump_version(namespace):
+    """Invalidate every entry in a namespace. Returns the new version."""
+    _check(namespace)
+    try:
+        return cache.incr(_version_key(namespace))
+    except ValueError:
+        # Counter missing (never used, or evicted): start a fresh one
+        version = _clock()
+        cache.set(_version_key(namespace), version, None)
+        return version
+
+
+class NamespacedCache:
+    """The subset of the cache API the apps use, scoped to one namespace"""
+
+    def __init__(self, namespace):
+        _check(namespace)
+        self.namespace = namespace
+
+    def _key(self, key):
+        return f"{self.namespace}:{key}"
+
+    def get(self, key, default=None):
+        return cache.get(self._key(key), default, version=get_version(self.namespace))
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        cache.set(self._key(key), value, timeout, version=get_version(self.namespace))
+
+    def delete_many(self, keys):
+        cache.delete_many([self._key(key) for key in keys], version=get_version(self.namespace))
+
+    def clear(self):
+        return bump_version(self.namespace)
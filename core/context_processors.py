@@ -1,7 +1,9 @@
 """
 Context processors to make notification data available globally in templates
 """
-from django.utils import timezone
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 def user_notifications(request):
@@ -48,64 +50,38 @@ def user_notifications(request):
         return context
     
     try:
-        from restaurants.models import Restaurant
-        from orders.models import Order, SavedCart
-        from datetime import timedelta
+        from orders.models import Order
+        from .notification_counters import get_platform_counters, get_owner_counters
         
         user = request.user
         
         # ========== ADMIN NOTIFICATIONS ==========
         if user.role == 'admin':
-            # All pending orders across platform
-            admin_pending = Order.objects.filter(status='pending').count()
-            
-            # All active carts
-            admin_carts = SavedCart.objects.count()
-            
-            # Today's orders
-            admin_today = Order.objects.filter(
-                created_at__date=timezone.now().date()
-            ).count()
-            
-            # New restaurants this week
-            week_ago = timezone.now() - timedelta(days=7)
-            new_restaurants = Restaurant.objects.filter(
-                created_at__gte=week_ago
-            ).count()
+            counters = get_platform_counters()
+            admin_pending = counters['pending_orders']
+            admin_carts = counters['active_carts']
             
             context.update({
                 'admin_total_pending_orders': admin_pending,
                 'admin_total_active_carts': admin_carts,
-                'admin_today_orders': admin_today,
-                'admin_new_restaurants': new_restaurants,
+                'admin_today_orders': counters['today_orders'],
+                'admin_new_restaurants': counters['new_restaurants'],
                 'admin_total_notifications': admin_pending + admin_carts,
             })
         
         # ========== RESTAURANT OWNER NOTIFICATIONS ==========
         elif user.role == 'restaurant_owner':
-            restaurants = Restaurant.objects.filter(owner=user)
+            # Cached per owner and refreshed by order/cart/restaurant signals
+            counters = get_owner_counters(user.id)
+            pending_orders = counters['pending_orders']
+            active_carts = counters['active_carts']
             
-            if restaurants.exists():
-                pending_orders = Order.objects.filter(
-                    restaurant__in=restaurants,
-                    status='pending'
-                ).count()
-                
-                active_carts = SavedCart.objects.filter(
-                    restaurant__in=restaurants
-                ).count()
-                
-                today_orders = Order.objects.filter(
-                    restaurant__in=restaurants,
-                    created_at__date=timezone.now().date()
-                ).count()
-                
-                context.update({
-                    'owner_pending_orders': pending_orders,
-                    'owner_active_carts': active_carts,
-                    'owner_total_notifications': pending_orders + active_carts,
-                    'owner_today_orders': today_orders,
-                })
+            context.update({
+                'owner_pending_orders': pending_orders,
+                'owner_active_carts': active_carts,
+                'owner_total_notifications': pending_orders + active_carts,
+                'owner_today_orders': counters['today_orders'],
+            })
         
         # ========== CUSTOMER NOTIFICATIONS ==========
         elif user.role == 'customer':
@@ -145,7 +121,7 @@ def user_notifications(request):
             })
             
     except Exception as e:
-        print(f"Notification context error: {e}")
+        logger.exception(f"Notification context error: {e}")
     
     return context
 
@@ -0,0 +1,51 @@
+"""
+Date filters written as half-open datetime ranges.
+
+Lookups such as ``created_at__date=day`` compile to a function applied to the
+column (``django_datetime_cast_date(created_at)`` on SQLite,
+``created_at::date`` on PostgreSQL). The database then cannot use an index
+on created_at. These helpers express the same filters as
+``created_at >= start AND created_at < end``, so composite indexes that end
+in created_at stay usable.
+"""
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+
+def _as_date(day):
+    if isinstance(day, str):
+        return date.fromisoformat(day)
+    if isinstance(day, datetime):
+        return day.date()
+    return day
+
+
+def start_of_day(day):
+    """First instant of ``day`` as a datetime comparable with DateTimeFields"""
+    start = datetime.combine(_as_date(day), time.min)
+    if settings.USE_TZ:
+        start = timezone.make_aware(start)
+    return start
+
+
+def on_day(field, day):
+    """Q for ``<field>__date=day``"""
+    day = _as_date(day)
+    return Q(**{f'{field}__gte': start_of_day(day), f'{field}__lt': start_of_day(day + timedelta(days=1))})
+
+
+def since_day(field, day):
+    """Q for ``<field>__date__gte=day``"""
+    return Q(**{f'{field}__gte': start_of_day(day)})
+
+
+def between_days(field, start_date, end_date):
+    """Q for ``<field>__date__range=[start_date, end_date]`` (both inclusive)"""
+    end_date = _as_date(end_date)
+    return Q(**{
+        f'{field}__gte': start_of_day(start_date),
+        f'{field}__lt': start_of_day(end_date + timedelta(days=1)),
+    })
@@ -5,13 +5,28 @@ from django.conf import settings
 
 def send_email(subject, to_email, template_name, context):
     """
-    Send HTML email with fallback to text
+    Render an HTML email (with text fallback) and queue it for delivery.
+
+    The send_queued_emails worker delivers queued emails over a shared SMTP
+    connection, so request handlers never wait on SMTP. Set
+    EMAIL_QUEUE_ENABLED=False to send immediately instead.
     """
     try:
         # Render HTML content
         html_content = render_to_string(f'emails/{template_name}', context)
         text_content = strip_tags(html_content)
         
+        if getattr(settings, 'EMAIL_QUEUE_ENABLED', True):
+            from .models import OutboundEmail
+            OutboundEmail.objects.create(
+                subject=subject,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to_email=to_email,
+                body=text_content,
+                html_body=html_content,
+            )
+            return True
+        
         # Create email
         email = EmailMultiAlternatives(
             subject=subject,
@@ -36,7 +51,7 @@ def send_order_confirmation(order):
         'order': order,
         'customer': order.customer,
         'restaurant': order.restaurant,
-        'order_items': order.orderitem_set.all(),
+        'order_items': order.orderitem_set.select_related('menu_item'),
     }
     
     return send_email(
@@ -52,7 +67,7 @@ def send_order_notification_to_restaurant(order):
     context = {
         'order': order,
         'restaurant': order.restaurant,
-        'order_items': order.orderitem_set.all(),
+        'order_items': order.orderitem_set.select_related('menu_item'),
     }
     
     return send_email(
@@ -0,0 +1,133 @@
+"""
+Precomputed home page feeds.
+
+The home page used to group the whole OrderItem table by menu item on
+every view to find top sellers, then run a query per item list. All of
+its lists (featured restaurants, the hero sample order, top sellers,
+today's specials and customer picks) are now built together as plain
+dicts and kept as one entry in the "feeds" cache namespace, so a home page
+view is a single cache read:
+
+- top sellers are summed from the DailyMenuItemStats rollup over the last
+  TOP_SELLER_DAYS days, so building them costs the same however long the
+  order history grows
+- only orderable items (MenuItem.can_be_ordered) of active restaurants are
+  listed
+
+Any menu or restaurant change clears the namespace
+(restaurants/menu_cache.invalidate_menu), and the next view rebuilds it.
+The Procfile's ``feeds`` process (``manage.py refresh_home_feeds --loop``)
+rebuilds the entry more often than HOME_FEED_TTL expires it, so visitors
+do not wait on expiry. That only helps web workers sharing its cache
+(CACHE_BACKEND=file or redis); with the per-process locmem default, each
+worker's first view after expiry still rebuilds.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q, Sum
+from django.urls import reverse
+from django.utils import timezone
+
+from .cache_namespaces import NamespacedCache
+
+cache = NamespacedCache('feeds')
+
+HOME_FEED_TTL = getattr(settings, 'HOME_FEED_TTL', 900)
+TOP_SELLER_DAYS = getattr(settings, 'TOP_SELLER_DAYS', 30)
+# Items created this recently count as specials
+SPECIALS_DAYS = 14
+FEED_SIZE = 4
+FEATURED_RESTAURANTS = 6
+
+FEEDS_KEY = 'home:feeds'
+
+
+def _orderable_items():
+    from restaurants.models import MenuItem
+
+    return MenuItem.objects.filter(
+        Q(track_stock=True, stock_quantity__gt=0) | Q(track_stock=False, is_available=True),
+        category__restaurant__is_active=True,
+    ).select_related('category__restaurant')
+
+
+def _serialize_item(item):
+    restaurant = item.category.restaurant
+    return {
+        'id': item.pk,
+        'name': item.name,
+        'price': str(item.price),
+        'image_url': item.image.url if item.image else '',
+        'restaurant': restaurant.name,
+        'url': reverse('restaurant_detail', args=[restaurant.slug]) if restaurant.slug else '',
+    }
+
+
+def _serialize_restaurant(restaurant):
+    image = restaurant.banner_image or restaurant.logo
+    return {
+        'id': restaurant.pk,
+        'name': restaurant.name,
+        'description': restaurant.description,
+        'slug': restaurant.slug,
+        'image_url': image.url if image else '',
+        'opening_time': restaurant.opening_time,
+        'closing_time': restaurant.closing_time,
+    }
+
+
+def _top_sellers(items, today):
+    from orders.models import DailyMenuItemStats
+
+    top_ids = list(
+        DailyMenuItemStats.objects.filter(
+            day__gte=today - timedelta(days=TOP_SELLER_DAYS - 1),
+            menu_item__in=items.values('pk'),
+        )
+        .values('menu_item')
+        .annotate(total_qty=Sum('quantity'))
+        .filter(total_qty__gt=0)
+        .order_by('-total_qty', 'menu_item')
+        .values_list('menu_item', flat=True)[:FEED_SIZE]
+    )
+    if not top_ids:
+        # Nothing sold in the window yet
+        return list(items[:FEED_SIZE])
+    by_id = {item.pk: item for item in items.filter(pk__in=top_ids)}
+    return [by_id[pk] for pk in top_ids if pk in by_id]
+
+
+def build_home_feeds():
+    """Compute every home page list (six queries)"""
+    from restaurants.models import Restaurant
+
+    now = timezone.now()
+    items = _orderable_items()
+    restaurants = Restaurant.objects.filter(is_active=True)[:FEATURED_RESTAURANTS]
+    return {
+        'featured_restaurants': [_serialize_restaurant(restaurant) for restaurant in restaurants],
+        'sample_items': [_serialize_item(item) for item in items[:FEED_SIZE]],
+        'top_sellers': [_serialize_item(item) for item in _top_sellers(items, now.date())],
+        'todays_specials': [
+            _serialize_item(item)
+            for item in items.filter(created_at__gte=now - timedelta(days=SPECIALS_DAYS))[:FEED_SIZE]
+        ],
+        'customer_picks': [_serialize_item(item) for item in items.order_by('-created_at')[:FEED_SIZE]],
+        'built_at': now,
+    }
+
+
+def refresh_home_feeds():
+    """Rebuild the cached feeds now; returns them"""
+    feeds = build_home_feeds()
+    cache.set(FEEDS_KEY, feeds, HOME_FEED_TTL)
+    return feeds
+
+
+def get_home_feeds():
+    """Home page feeds, built on a cache miss"""
+    feeds = cache.get(FEEDS_KEY)
+    if feeds is None:
+        feeds = refresh_home_feeds()
+    return feeds
@@ -0,0 +1,47 @@
+"""
+Database-backed work queues.
+
+OutboundEmail (send_queued_emails) and PaystackEvent
+(process_paystack_events) are rows a worker picks up once they are due,
+retrying failures with exponential backoff. QueuedJob holds the fields and
+retry bookkeeping they share; claim_due() takes the next batch of due rows.
+"""
+from datetime import timedelta
+
+from django.db import connection, models
+from django.utils import timezone
+
+
+class QueuedJob(models.Model):
+    """Abstract base of a queue row with a 'pending' status"""
+
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        abstract = True
+
+    def schedule_retry(self, error, max_attempts, base_delay=30, max_delay=3600):
+        """Record a failed attempt and back off exponentially, or give up"""
+        self.attempts += 1
+        self.last_error = str(error)[:1000]
+        if self.attempts >= max_attempts:
+            self.status = 'failed'
+        else:
+            delay = min(base_delay * (2 ** (self.attempts - 1)), max_delay)
+            self.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+        self.save(update_fields=['status', 'attempts', 'last_error', 'next_attempt_at'])
+
+
+def claim_due(model, batch_size):
+    """Up to ``batch_size`` pending rows of ``model`` that are due, oldest first.
+
+    Call it inside transaction.atomic(). Where the database supports it the
+    rows stay locked with SKIP LOCKED until the transaction ends, so several
+    workers can share a queue without handling a row twice.
+    """
+    due = model.objects.filter(status='pending', next_attempt_at__lte=timezone.now())
+    if connection.features.has_select_for_update_skip_locked:
+        due = due.select_for_update(skip_locked=True)
+    return list(due.order_by('next_attempt_at')[:batch_size])
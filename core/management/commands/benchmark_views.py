@@ -0,0 +1,111 @@
+import json
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from core.benchmark import QUERY_BUDGETS, Dataset, compare_reports, run_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway database and measure query counts and timings of the major views; '
+        'writes a JSON report and fails on budget or baseline regressions'
+    )
+
+    def add_arguments(self, parser):
+        defaults = Dataset()
+        parser.add_argument('--restaurants', type=int, default=defaults.restaurants,
+                            help=f'Restaurants to seed (default: {defaults.restaurants})')
+        parser.add_argument('--items', type=int, default=defaults.items,
+                            help=f'Menu items per restaurant (default: {defaults.items})')
+        parser.add_argument('--customers', type=int, default=defaults.customers,
+                            help=f'Customers to seed (default: {defaults.customers})')
+        parser.add_argument('--orders', type=int, default=defaults.orders,
+                            help=f'Orders to seed (default: {defaults.orders})')
+        parser.add_argument('--days', type=int, default=defaults.days,
+                            help=f'Days of order history (default: {defaults.days})')
+        parser.add_argument('--seed', type=int, default=defaults.seed, help='Random seed for the dataset')
+        parser.add_argument('--repeat', type=int, default=5, help='Warm requests per scenario (default: 5)')
+        parser.add_argument('--only', nargs='+', metavar='SCENARIO', help='Run only these scenarios')
+        parser.add_argument('--list', action='store_true', help='List the scenarios and their query budgets')
+        parser.add_argument('--output', help='Write the JSON report to this file (default: stdout)')
+        parser.add_argument('--baseline', help='JSON report of a previous run to compare against')
+        parser.add_argument('--time-tolerance', type=float, default=0.5,
+                            help='Allowed median slowdown against the baseline, as a fraction (default: 0.5)')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for name, budget in QUERY_BUDGETS.items():
+                self.stdout.write(f'{name}: {budget} queries')
+            return
+
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Could not read baseline report: {e}')
+
+        dataset = Dataset(
+            restaurants=options['restaurants'], items=options['items'], customers=options['customers'],
+            orders=options['orders'], days=options['days'], seed=options['seed'],
+        )
+        only = set(options['only'] or [])
+        report = self._run(dataset, options['repeat'], only)
+
+        # Messages go to stderr when stdout carries the report
+        out = self.stdout if options['output'] else self.stderr
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            self._summarize(report)
+            self.stdout.write(f"Report written to {options['output']}")
+        else:
+            self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+
+        failures = list(report['failures'])
+        if baseline is not None:
+            if baseline.get('dataset') != report['dataset']:
+                out.write(self.style.WARNING('Baseline was measured on a different dataset'))
+            comparison = compare_reports(report, baseline, options['time_tolerance'])
+            for line in comparison.improvements:
+                out.write(self.style.SUCCESS(f'Improved: {line}'))
+            failures += comparison.regressions
+
+        if failures:
+            for line in failures:
+                self.stderr.write(self.style.ERROR(f'Regression: {line}'))
+            raise CommandError(f'{len(failures)} performance regression(s)')
+        out.write(self.style.SUCCESS('Benchmark passed.'))
+
+    def _run(self, dataset, repeat, only):
+        unknown = only - {scenario for scenario in QUERY_BUDGETS}
+        if unknown:
+            raise CommandError(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+
+        setup_test_environment()
+        # A private cache, so the run neither reads nor clears the real one
+        isolated = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark-views',
+        }})
+        isolated.enable()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            caches['default'].clear()
+            return run_benchmark(dataset, repeat, only)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            isolated.disable()
+            teardown_test_environment()
+
+    def _summarize(self, report):
+        for name, result in report['scenarios'].items():
+            budget = result['query_budget']
+            self.stdout.write(
+                f"{name:28} {result['status']}  queries {result['queries']:>3} "
+                f"(cold {result['cold_queries']:>3}, budget {budget if budget is not None else '-':>3})  "
+                f"p50 {result['p50_ms']:8.2f}ms  p95 {result['p95_ms']:8.2f}ms  cold {result['cold_ms']:8.2f}ms"
+            )
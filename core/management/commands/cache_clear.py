@@ -0,0 +1,28 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from core.cache_namespaces import NAMESPACES, bump_version
+
+
+class Command(BaseCommand):
+    help = 'Invalidate one or more cache namespaces, or clear the whole cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--namespace', action='append', choices=NAMESPACES,
+            help='Namespace to invalidate (repeatable)',
+        )
+        parser.add_argument('--all', action='store_true', help='Clear every cache entry, not just namespaces')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            cache.clear()
+            self.stdout.write(self.style.SUCCESS('Cleared the entire cache.'))
+            return
+
+        if not options['namespace']:
+            raise CommandError(f'Pass --namespace ({", ".join(NAMESPACES)}) or --all')
+
+        for namespace in options['namespace']:
+            version = bump_version(namespace)
+            self.stdout.write(self.style.SUCCESS(f'Invalidated "{namespace}" (now version {version}).'))
@@ -0,0 +1,59 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.cache_namespaces import NAMESPACES, get_version
+
+
+class Command(BaseCommand):
+    help = 'Show the configured cache backend, namespace versions and backend usage'
+
+    def _redis_stats(self, location):
+        # A separate client from the public redis package, not the cache's private one
+        import redis
+
+        client = redis.Redis.from_url(location)
+        try:
+            info = client.info()
+            keys = client.dbsize()
+        finally:
+            client.close()
+        hits, misses = info.get('keyspace_hits', 0), info.get('keyspace_misses', 0)
+        lookups = hits + misses
+        self.stdout.write(f'  Keys: {keys}')
+        self.stdout.write(f'  Memory used: {info.get("used_memory_human", "?")}')
+        self.stdout.write(
+            f'  Hits: {hits}  Misses: {misses}  Hit rate: {(hits / lookups * 100) if lookups else 0:.1f}%'
+        )
+
+    def _file_stats(self, directory):
+        files = [entry for entry in os.scandir(directory) if entry.is_file()] if os.path.isdir(directory) else []
+        size = sum(entry.stat().st_size for entry in files)
+        self.stdout.write(f'  Entries: {len(files)}  Size on disk: {size / 1024:.1f} KB')
+
+    def handle(self, *args, **options):
+        config = settings.CACHES['default']
+        backend = getattr(settings, 'CACHE_BACKEND', 'locmem')
+        self.stdout.write(f'Backend: {backend} ({config["BACKEND"]})')
+        self.stdout.write(f'Location: {config.get("LOCATION", "")}')
+        self.stdout.write(f'Key prefix: {config.get("KEY_PREFIX", "")}')
+
+        self.stdout.write('Namespaces:')
+        for namespace in NAMESPACES:
+            self.stdout.write(f'  {namespace}: version {get_version(namespace)}')
+
+        self.stdout.write('Usage:')
+        try:
+            location = config.get('LOCATION', '')
+            if config['BACKEND'].endswith('.RedisCache'):
+                # LOCATION may list replicas after the primary
+                self._redis_stats(location.split(',')[0])
+            elif config['BACKEND'].endswith('.FileBasedCache'):
+                self._file_stats(location)
+            elif config['BACKEND'].endswith('.LocMemCache'):
+                self.stdout.write('  locmem is per-process; usage is only visible inside each web worker')
+            else:
+                self.stdout.write('  Not reported for this backend')
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'  Could not read backend stats: {e}'))
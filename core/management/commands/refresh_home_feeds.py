@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.home_feeds import HOME_FEED_TTL, refresh_home_feeds
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the cached home page feeds (top sellers, specials, customer picks)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep rebuilding every --interval seconds')
+        parser.add_argument(
+            '--interval', type=float, default=max(HOME_FEED_TTL / 3, 1),
+            help='Seconds between rebuilds in --loop mode (default: a third of HOME_FEED_TTL)',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            feeds = refresh_home_feeds()
+            self.stdout.write(self.style.SUCCESS(
+                f"Home feeds rebuilt in {(time.monotonic() - started) * 1000:.0f}ms: "
+                f"{len(feeds['top_sellers'])} top sellers, {len(feeds['todays_specials'])} specials, "
+                f"{len(feeds['customer_picks'])} picks"
+            ))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,70 @@
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.job_queue import claim_due
+from core.models import OutboundEmail
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued OutboundEmail rows over a shared SMTP connection, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Emails sent per SMTP connection (default: 50)')
+        parser.add_argument('--max-attempts', type=int, default=5, help='Attempts before an email is marked failed (default: 5)')
+        parser.add_argument('--loop', action='store_true', help='Keep polling the queue instead of exiting when it is empty')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds between polls in --loop mode (default: 5)')
+
+    def _deliver(self, emails, max_attempts):
+        sent = failed = 0
+        smtp = get_connection(fail_silently=False)
+        try:
+            smtp.open()
+        except Exception as e:
+            for email in emails:
+                email.schedule_retry(e, max_attempts)
+            self.stdout.write(self.style.ERROR(f'Could not open mail connection: {e}'))
+            return sent, len(emails)
+
+        try:
+            for email in emails:
+                try:
+                    smtp.send_messages([email.to_message(smtp)])
+                except Exception as e:
+                    email.schedule_retry(e, max_attempts)
+                    failed += 1
+                else:
+                    email.mark_sent()
+                    sent += 1
+        finally:
+            smtp.close()
+        return sent, failed
+
+    def drain(self, batch_size, max_attempts):
+        """Send due emails batch by batch until none are left"""
+        total_sent = total_failed = 0
+        while True:
+            with transaction.atomic():
+                batch = claim_due(OutboundEmail, batch_size)
+                if not batch:
+                    break
+                sent, failed = self._deliver(batch, max_attempts)
+            total_sent += sent
+            total_failed += failed
+        return total_sent, total_failed
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        max_attempts = max(options['max_attempts'], 1)
+
+        while True:
+            sent, failed = self.drain(batch_size, max_attempts)
+            if sent or failed:
+                self.stdout.write(f'Sent {sent} email(s), {failed} failed attempt(s)')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS('Email queue drained.'))
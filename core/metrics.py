@@ -0,0 +1,251 @@
+"""
+Per-view request metrics.
+
+core.middleware.MetricsMiddleware measures every request:
+
+- SQL statements and the time spent in them, through
+  connection.execute_wrapper()
+- template rendering time, through the TimedDjangoTemplates backend
+  configured in settings.TEMPLATES
+- total time in the view and middleware below it
+
+and adds them to a registry keyed by URL name (``app:name``, or
+``<unresolved>``). The same statement (ignoring its parameters and the
+length of IN lists) run METRICS_DUPLICATE_THRESHOLD or more times in one
+request is the N+1 pattern: it is logged with the view name and counted
+per view, so a loop that queries per row shows up without anyone
+profiling it.
+
+The registry lives in the worker process (like prometheus_client without
+multiprocess mode); each worker reports its own numbers, labelled with its
+pid. They are served as:
+
+- a Server-Timing header on the response (METRICS_SERVER_TIMING, or any
+  staff/admin user), which browser dev tools show per request
+- /internal/metrics/, a table for platform admins
+- /internal/metrics.prom, the Prometheus text format, for platform admins
+  or a scraper sending ``Authorization: Bearer <METRICS_TOKEN>``
+"""
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = getattr(settings, 'METRICS_ENABLED', True)
+METRICS_DUPLICATE_THRESHOLD = getattr(settings, 'METRICS_DUPLICATE_THRESHOLD', 5)
+
+# Upper bounds (seconds) of the request duration histogram
+DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+UNRESOLVED = '<unresolved>'
+
+_current = ContextVar('request_metrics', default=None)
+
+# Literals that differ between otherwise identical statements
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r'IN \((?:\s*(?:%s|\?)\s*,?)+\)')
+
+
+def statement_shape(sql):
+    """``sql`` with literals and IN lists collapsed, for spotting repeats"""
+    sql = _LITERALS.sub('?', sql)
+    return _IN_LISTS.sub('IN (...)', sql)
+
+
+@dataclass
+class RequestMetrics:
+    started: float = field(default_factory=time.perf_counter)
+    sql_count: int = 0
+    sql_time: float = 0.0
+    template_time: float = 0.0
+    template_depth: int = 0
+    statements: Counter = field(default_factory=Counter)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def duplicates(self, threshold=None):
+        """{statement shape: executions} for shapes run at least ``threshold`` times"""
+        threshold = threshold or METRICS_DUPLICATE_THRESHOLD
+        shapes = Counter()
+        for sql, n in self.statements.items():
+            shapes[statement_shape(sql)] += n
+        return {shape: n for shape, n in shapes.items() if n >= threshold}
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.sql_count += 1
+            self.statements[sql] += 1
+
+
+def current():
+    """Metrics of the request being handled, or None"""
+    return _current.get()
+
+
+def start():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish(token):
+    _current.reset(token)
+
+
+class TimedTemplate:
+    """Wraps a backend template to add its render time to the current request"""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        metrics = current()
+        if metrics is None:
+            return self.template.render(context, request)
+        # Templates rendered while rendering (render_to_string in a tag) are already timed
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.template_time += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, with render time recorded per request"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+@dataclass
+class ViewStats:
+    requests: int = 0
+    errors: int = 0
+    sql_count: int = 0
+    sql_time: float = 0.0
+    template_time: float = 0.0
+    total_time: float = 0.0
+    max_time: float = 0.0
+    max_sql_count: int = 0
+    duplicate_requests: int = 0
+    last_duplicate: str = ''
+    buckets: list = field(default_factory=lambda: [0] * len(DURATION_BUCKETS))
+
+    def average(self, total):
+        return total / self.requests if self.requests else 0.0
+
+
+class MetricsRegistry:
+    """Per-view totals for this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+        self.started_at = time.time()
+
+    def record(self, view, metrics, status_code, duration):
+        duplicates = metrics.duplicates()
+        with self._lock:
+            stats = self._views.setdefault(view, ViewStats())
+            stats.requests += 1
+            stats.errors += status_code >= 500
+            stats.sql_count += metrics.sql_count
+            stats.sql_time += metrics.sql_time
+            stats.template_time += metrics.template_time
+            stats.total_time += duration
+            stats.max_time = max(stats.max_time, duration)
+            stats.max_sql_count = max(stats.max_sql_count, metrics.sql_count)
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    stats.buckets[i] += 1
+            if duplicates:
+                stats.duplicate_requests += 1
+                shape, n = max(duplicates.items(), key=lambda item: item[1])
+                stats.last_duplicate = f'{n}x {shape[:500]}'
+        if duplicates:
+            for shape, n in duplicates.items():
+                logger.warning(f"Possible N+1 in {view}: statement ran {n} times: {shape[:300]}")
+
+    def snapshot(self):
+        """[(view, ViewStats copy)] sorted by total time, slowest first"""
+        with self._lock:
+            rows = [(view, ViewStats(**{**vars(stats), 'buckets': list(stats.buckets)}))
+                    for view, stats in self._views.items()]
+        return sorted(rows, key=lambda row: row[1].total_time, reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+            self.started_at = time.time()
+
+
+registry = MetricsRegistry()
+
+
+def server_timing(metrics, duration):
+    """Server-Timing header value for one request"""
+    return ', '.join([
+        f'db;dur={metrics.sql_time * 1000:.1f};desc="{metrics.sql_count} queries"',
+        f'tpl;dur={metrics.template_time * 1000:.1f}',
+        f'total;dur={duration * 1000:.1f}',
+    ])
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text():
+    """The registry in the Prometheus text exposition format"""
+    pid = os.getpid()
+    series = {
+        'http_view_requests_total': ('counter', 'Requests handled', lambda s: s.requests),
+        'http_view_errors_total': ('counter', 'Requests answered with a 5xx status', lambda s: s.errors),
+        'http_view_sql_queries_total': ('counter', 'SQL statements executed', lambda s: s.sql_count),
+        'http_view_sql_seconds_total': ('counter', 'Time spent in SQL', lambda s: s.sql_time),
+        'http_view_template_seconds_total': ('counter', 'Time spent rendering templates', lambda s: s.template_time),
+        'http_view_duplicate_query_requests_total': (
+            'counter', 'Requests that repeated a statement (possible N+1)', lambda s: s.duplicate_requests,
+        ),
+    }
+    rows = registry.snapshot()
+    lines = []
+    for name, (kind, description, value) in series.items():
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}']
+        for view, stats in rows:
+            lines.append(f'{name}{{view="{_label(view)}",pid="{pid}"}} {value(stats)}')
+
+    name = 'http_view_duration_seconds'
+    lines += [f'# HELP {name} Request duration', f'# TYPE {name} histogram']
+    for view, stats in rows:
+        labels = f'view="{_label(view)}",pid="{pid}"'
+        for bound, n in zip(DURATION_BUCKETS, stats.buckets):
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {n}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {stats.requests}')
+        lines.append(f'{name}_sum{{{labels}}} {stats.total_time}')
+        lines.append(f'{name}_count{{{labels}}} {stats.requests}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,43 @@
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+
+
+class MetricsMiddleware:
+    """Record SQL, template and total time per view (see core/metrics.py)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'METRICS_SERVER_TIMING', settings.DEBUG)
+
+    def __call__(self, request):
+        if not metrics.METRICS_ENABLED:
+            return self.get_response(request)
+
+        request_metrics, token = metrics.start()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(request_metrics))
+                response = self.get_response(request)
+        finally:
+            metrics.finish(token)
+
+        duration = request_metrics.elapsed
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match is not None and match.view_name else metrics.UNRESOLVED
+        metrics.registry.record(view, request_metrics, response.status_code, duration)
+
+        if self.server_timing or self._is_staff(request):
+            response['Server-Timing'] = metrics.server_timing(request_metrics, duration)
+        return response
+
+    @staticmethod
+    def _is_staff(request):
+        user = getattr(request, 'user', None)
+        return user is not None and user.is_authenticated and (
+            user.is_staff or user.is_superuser or getattr(user, 'role', '') == 'admin'
+        )
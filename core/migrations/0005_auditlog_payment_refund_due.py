@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_auditlog_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='auditlog',
+            name='action_type',
+            field=models.CharField(choices=[('user_create', 'User Created'), ('user_update', 'User Updated'), ('user_delete', 'User Deleted'), ('user_role_change', 'User Role Changed'), ('user_toggle', 'User Status Toggled'), ('restaurant_create', 'Restaurant Created'), ('restaurant_update', 'Restaurant Updated'), ('restaurant_delete', 'Restaurant Deleted'), ('restaurant_toggle', 'Restaurant Status Toggled'), ('order_update', 'Order Updated'), ('order_cancel', 'Order Cancelled'), ('payment_refund_due', 'Payment Needs Refund'), ('promo_create', 'Promo Code Created'), ('promo_update', 'Promo Code Updated'), ('promo_delete', 'Promo Code Deleted'), ('settings_update', 'Settings Updated'), ('export_data', 'Data Exported'), ('login', 'User Login'), ('logout', 'User Logout'), ('other', 'Other Action')], max_length=50),
+        ),
+    ]
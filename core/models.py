@@ -3,6 +3,8 @@ from django.contrib.auth import get_user_model
 from django.utils import timezone
 import uuid
 
+from .job_queue import QueuedJob
+
 User = get_user_model()
 
 
@@ -93,10 +95,14 @@ class PlatformSettings(models.Model):
     def save(self, *args, **kwargs):
         self.pk = 1  # Ensure singleton
         super().save(*args, **kwargs)
+        # Tell every worker's cached copy to reload (see core/platform_settings.py)
+        from django.db import transaction
+        from .platform_settings import invalidate_platform_settings
+        transaction.on_commit(invalidate_platform_settings)
     
     @classmethod
     def get_settings(cls):
-        """Get or create the singleton settings instance"""
+        """Get or create the singleton settings instance (for editing; read via get_platform_settings)"""
         settings, created = cls.objects.get_or_create(pk=1)
         return settings
     
@@ -212,6 +218,7 @@ class AuditLog(models.Model):
         ('restaurant_toggle', 'Restaurant Status Toggled'),
         ('order_update', 'Order Updated'),
         ('order_cancel', 'Order Cancelled'),
+        ('payment_refund_due', 'Payment Needs Refund'),
         ('promo_create', 'Promo Code Created'),
         ('promo_update', 'Promo Code Updated'),
         ('promo_delete', 'Promo Code Deleted'),
@@ -242,6 +249,7 @@ class AuditLog(models.Model):
         indexes = [
             models.Index(fields=['action_type', 'created_at']),
             models.Index(fields=['user', 'created_at']),
+            models.Index(fields=['-created_at', '-id'], name='auditlog_keyset_idx'),
         ]
     
     def __str__(self):
@@ -296,3 +304,58 @@ class AdminFeedback(models.Model):
     def __str__(self):
         who = self.sender.username if self.sender else 'Anonymous'
         return f"Feedback from {who} ({self.sender_role})"
+
+
+# ============================================
+# OUTBOUND EMAIL QUEUE
+# ============================================
+class OutboundEmail(QueuedJob):
+    """Rendered email waiting to be delivered by the send_queued_emails worker"""
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    
+    subject = models.CharField(max_length=255)
+    from_email = models.CharField(max_length=255)
+    to_email = models.EmailField()
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['next_attempt_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.subject} -> {self.to_email} ({self.status})"
+    
+    def to_message(self, connection=None):
+        """Build the EmailMultiAlternatives for this queued email"""
+        from django.core.mail import EmailMultiAlternatives
+        
+        message = EmailMultiAlternatives(
+            subject=self.subject,
+            body=self.body,
+            from_email=self.from_email,
+            to=[self.to_email],
+            connection=connection,
+        )
+        if self.html_body:
+            message.attach_alternative(self.html_body, "text/html")
+        return message
+    
+    def mark_sent(self):
+        self.status = 'sent'
+        self.attempts += 1
+        self.sent_at = timezone.now()
+        self.last_error = ''
+        self.save(update_fields=['status', 'attempts', 'sent_at', 'last_error'])
@@ -0,0 +1,87 @@
+"""
+Cached notification counters used by the navbar badges.
+
+The context processor runs on every template render, so the counts are
+stored in the cache per owner (and once platform-wide) instead of being
+recomputed on every request. Order, SavedCart and Restaurant signals drop
+the affected entries (see core/signals.py), as does bulk_transition() for
+the UPDATEs that send no signals, and the TTL bounds how stale a count can
+get for time-based windows such as "today" or "this week".
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .cache_namespaces import NamespacedCache
+from .date_ranges import on_day
+
+cache = NamespacedCache('stats')
+
+COUNTER_TTL = getattr(settings, 'NOTIFICATION_COUNTER_TTL', 60)
+
+
+def _platform_key():
+    return f"notifications:platform:{timezone.now().date().isoformat()}"
+
+
+def _owner_key(owner_id):
+    return f"notifications:owner:{owner_id}:{timezone.now().date().isoformat()}"
+
+
+def _compute_platform_counters():
+    from restaurants.models import Restaurant
+    from orders.models import Order, SavedCart
+
+    today = timezone.now().date()
+    order_counts = Order.objects.aggregate(
+        pending=Count('id', filter=Q(status='pending')),
+        today=Count('id', filter=on_day('created_at', today)),
+    )
+    week_ago = timezone.now() - timedelta(days=7)
+    return {
+        'pending_orders': order_counts['pending'],
+        'active_carts': SavedCart.objects.count(),
+        'today_orders': order_counts['today'],
+        'new_restaurants': Restaurant.objects.filter(created_at__gte=week_ago).count(),
+    }
+
+
+def _compute_owner_counters(owner_id):
+    from orders.models import SavedCart
+    from orders.stats import OwnerStats
+
+    stats = OwnerStats(owner_id).summary()
+    return {
+        'pending_orders': stats['pending_orders'],
+        'active_carts': SavedCart.objects.filter(restaurant__owner_id=owner_id).count(),
+        'today_orders': stats['today_orders'],
+    }
+
+
+def get_platform_counters():
+    """Platform-wide pending/cart/today/new-restaurant counts for admins"""
+    key = _platform_key()
+    counters = cache.get(key)
+    if counters is None:
+        counters = _compute_platform_counters()
+        cache.set(key, counters, COUNTER_TTL)
+    return counters
+
+
+def get_owner_counters(owner_id):
+    """Pending/cart/today counts across all restaurants of one owner"""
+    key = _owner_key(owner_id)
+    counters = cache.get(key)
+    if counters is None:
+        counters = _compute_owner_counters(owner_id)
+        cache.set(key, counters, COUNTER_TTL)
+    return counters
+
+
+def invalidate_counters(*owner_ids):
+    """Drop the platform counters and those of the given owners (None is skipped)"""
+    keys = [_platform_key()]
+    keys += [_owner_key(owner_id) for owner_id in owner_ids if owner_id is not None]
+    cache.delete_many(keys)
@@ -0,0 +1,114 @@
+"""
+Process-local, read-only view of PlatformSettings.
+
+get_platform_settings() keeps an immutable snapshot of the singleton in
+each worker process. At most once per PLATFORM_SETTINGS_CHECK_INTERVAL
+seconds it compares its version with the "settings" namespace version in
+the shared cache (core/cache_namespaces.py). PlatformSettings.save() bumps
+that version after commit, so every gunicorn worker reloads within about
+a second of an admin edit, and reads in between touch neither the
+database nor the cache.
+
+Use PlatformSettings.get_settings() when you need to edit and save the
+row. Use get_platform_settings() everywhere else.
+"""
+import time
+from dataclasses import dataclass, fields
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
+
+from django.conf import settings
+
+from .cache_namespaces import bump_version, get_version
+
+CHECK_INTERVAL = getattr(settings, 'PLATFORM_SETTINGS_CHECK_INTERVAL', 1.0)
+
+
+@dataclass(frozen=True, slots=True)
+class PlatformSettingsSnapshot:
+    """Immutable copy of the PlatformSettings row"""
+
+    site_name: str
+    site_tagline: str
+    support_email: str
+    support_phone: str
+
+    commission_percentage: Decimal
+    minimum_order_amount: Decimal
+    delivery_fee: Decimal
+    free_delivery_threshold: Decimal
+
+    payment_gateway: str
+    currency: str
+    currency_symbol: str
+
+    enable_delivery: bool
+    enable_pickup: bool
+    enable_dine_in: bool
+    max_order_items: int
+    order_timeout_minutes: int
+
+    allow_guest_checkout: bool
+    require_email_verification: bool
+    enable_reviews: bool
+    enable_promo_codes: bool
+    auto_approve_restaurants: bool
+    enable_reservations: bool
+    enable_notifications: bool
+    enable_sms_notifications: bool
+
+    allow_customer_registration: bool
+    allow_restaurant_registration: bool
+
+    restaurants_per_page: int
+    menu_items_per_page: int
+    orders_per_page: int
+    show_out_of_stock: bool
+
+    enable_tax: bool
+    tax_percentage: Decimal
+    tax_name: str
+
+    maintenance_mode: bool
+    maintenance_message: str
+
+    updated_at: Optional[datetime]
+
+    @classmethod
+    def from_model(cls, instance):
+        values = {}
+        for field in fields(cls):
+            value = getattr(instance, field.name)
+            if field.type is Decimal and value is not None and not isinstance(value, Decimal):
+                # Unsaved model defaults are floats
+                value = Decimal(str(value))
+            values[field.name] = value
+        return cls(**values)
+
+
+# (version, snapshot, monotonic time of the last version check)
+_memo = (None, None, 0.0)
+
+
+def get_platform_settings():
+    """Current platform settings as a PlatformSettingsSnapshot"""
+    global _memo
+    version, snapshot, checked_at = _memo
+    now = time.monotonic()
+    if snapshot is not None and now - checked_at < CHECK_INTERVAL:
+        return snapshot
+
+    current = get_version('settings')
+    if snapshot is None or current != version:
+        from .models import PlatformSettings
+        snapshot = PlatformSettingsSnapshot.from_model(PlatformSettings.get_settings())
+    _memo = (current, snapshot, now)
+    return snapshot
+
+
+def invalidate_platform_settings():
+    """Make every worker reload the settings on its next check"""
+    global _memo
+    bump_version('settings')
+    _memo = (None, None, 0.0)
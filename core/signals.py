@@ -0,0 +1,30 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from orders.models import Order, SavedCart
+from restaurants.models import Restaurant
+from .notification_counters import invalidate_counters
+
+
+def _owner_id_for(instance):
+    """Owner of the restaurant an Order/SavedCart belongs to (None if gone)"""
+    try:
+        return instance.restaurant.owner_id
+    except Restaurant.DoesNotExist:
+        return None
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+@receiver(post_save, sender=SavedCart)
+@receiver(post_delete, sender=SavedCart)
+def refresh_counters_for_order_or_cart(sender, instance, **kwargs):
+    """Drop cached notification counters when orders or carts change."""
+    invalidate_counters(_owner_id_for(instance))
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+def refresh_counters_for_restaurant(sender, instance, **kwargs):
+    """Drop cached notification counters when restaurants are added or removed."""
+    invalidate_counters(instance.owner_id)
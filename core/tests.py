@@ -1,3 +1,206 @@
-from django.test import TestCase
+import tempfile
+from datetime import timedelta
+import warnings
+from contextlib import nullcontext
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.db import transaction
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import CustomUser
+
+from .benchmark import QUERY_BUDGETS, Dataset, build_scenarios, request_scenario, seed_dataset
+from .cache_namespaces import NamespacedCache, bump_version, get_version
+from .job_queue import claim_due
+from .models import OutboundEmail
+from .platform_settings import invalidate_platform_settings
+from .views import SyncStreamingResponse
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'core-tests'}}
+
+
+@override_settings(CACHES=LOCMEM)
+class NamespacedCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_version_is_stable_until_bumped(self):
+        version = get_version('menus')
+        self.assertEqual(get_version('menus'), version)
+        self.assertEqual(bump_version('menus'), version + 1)
+        self.assertEqual(get_version('menus'), version + 1)
+
+    def test_bump_hides_entries_written_before_it(self):
+        menus = NamespacedCache('menus')
+        menus.set('menu:1', 'old menu')
+        menus.clear()
+        self.assertIsNone(menus.get('menu:1'))
+        menus.set('menu:1', 'new menu')
+        self.assertEqual(menus.get('menu:1'), 'new menu')
+
+    def test_namespaces_are_isolated(self):
+        menus, stats = NamespacedCache('menus'), NamespacedCache('stats')
+        menus.set('restaurant:1', 'menu')
+        stats.set('restaurant:1', 'stats')
+        bump_version('stats')
+        self.assertEqual(menus.get('restaurant:1'), 'menu')
+        self.assertIsNone(stats.get('restaurant:1'))
+
+    def test_evicted_counter_never_goes_back(self):
+        menus = NamespacedCache('menus')
+        for _ in range(5):
+            version = bump_version('menus')
+        menus.set('menu:1', 'stale')
+        cache.delete('namespace-version:menus')
+        self.assertGreater(get_version('menus'), version)
+        self.assertIsNone(menus.get('menu:1'))
+
+    def test_unknown_namespace_is_rejected(self):
+        with self.assertRaises(ValueError):
+            NamespacedCache('sessions')
+        with self.assertRaises(ValueError):
+            bump_version('sessions')
+
+
+class CacheStatsCommandTests(SimpleTestCase):
+    def run_command(self):
+        out = StringIO()
+        call_command('cache_stats', stdout=out)
+        return out.getvalue()
+
+    @override_settings(CACHES=LOCMEM)
+    def test_locmem(self):
+        output = self.run_command()
+        self.assertIn('feeds: version', output)
+        self.assertIn('locmem is per-process', output)
+
+    def test_file_backend_counts_entries(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory,
+        }}):
+            NamespacedCache('menus').set('menu:1', 'menu')
+            output = self.run_command()
+        self.assertIn('Entries: ', output)
+        self.assertNotIn('Entries: 0 ', output)
+
+
+@override_settings(CACHES=LOCMEM)
+class ViewQueryBudgetTests(TransactionTestCase):
+    """The benchmark_views scenarios, held to QUERY_BUDGETS on a small dataset.
+
+    Not a TestCase: its wrapping transaction would hide the BEGIN/COMMIT
+    statements and on_commit work a real request runs.
+    """
+
+    def setUp(self):
+        cache.clear()
+        invalidate_platform_settings()
+        self.actors = seed_dataset(Dataset(restaurants=3, items=8, customers=10, orders=200, days=14))
+
+    def send(self, client, scenario, queries=None):
+        if scenario.setup:
+            scenario.setup(client)
+        with self.assertNumQueries(queries) if queries is not None else nullcontext():
+            status, _, _ = request_scenario(client, scenario)
+        self.assertIn(status, scenario.expect)
+
+    def test_warm_requests_match_query_budgets(self):
+        scenarios = build_scenarios(self.actors)
+        self.assertEqual([scenario.name for scenario in scenarios], list(QUERY_BUDGETS))
+        clients = {}
+        for scenario in scenarios:
+            if scenario.user not in clients:
+                clients[scenario.user] = Client()
+                if scenario.user:
+                    clients[scenario.user].force_login(getattr(self.actors, scenario.user))
+            with self.subTest(scenario=scenario.name):
+                self.send(clients[scenario.user], scenario)  # cold: fills the caches
+                self.send(clients[scenario.user], scenario, QUERY_BUDGETS[scenario.name])
+
+
+class SyncStreamingResponseTests(TransactionTestCase):
+    async def test_asgi_pulls_batches_instead_of_the_whole_iterator(self):
+        produced = []
+
+        def rows():
+            for i in range(10):
+                produced.append(i)
+                yield f'{i}\n'
+
+        response = SyncStreamingResponse(rows())
+        response.batch_size = 3
+        progress, body = [], []
+        async for part in response:
+            progress.append(len(produced))
+            body.append(part)
+        self.assertEqual(progress[0], 3)
+        self.assertEqual(b''.join(body), b''.join(f'{i}\n'.encode() for i in range(10)))
+
+    def test_csv_export_streams_under_asgi(self):
+        admin = CustomUser.objects.create_user('admin', 'admin@example.com', 'pw', role='admin')
+        for i in range(6):
+            CustomUser.objects.create_user(f'customer{i}', f'customer{i}@example.com', 'pw')
+        client = Client()
+        client.force_login(admin)
+        path = reverse('export_users')
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'cookie', f"sessionid={client.cookies['sessionid'].value}".encode())],
+            'server': ('testserver', 80), 'client': ('127.0.0.1', 50000),
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        with mock.patch('core.views.EXPORT_CHUNK_SIZE', 2), \
+                mock.patch.object(SyncStreamingResponse, 'batch_size', 2), \
+                warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            async_to_sync(ASGIHandler())(scope, receive, send)
+
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertFalse([w for w in caught if 'consume synchronous iterators' in str(w.message)])
+        bodies = [message['body'] for message in messages[1:] if message.get('body')]
+        self.assertGreater(len(bodies), 2)
+        csv_text = b''.join(bodies).decode()
+        self.assertEqual(len(csv_text.strip().splitlines()), 8)
+        self.assertIn('customer5@example.com', csv_text)
+
+
+class JobQueueTests(TestCase):
+    def queue(self, **kwargs):
+        return OutboundEmail.objects.create(
+            subject='Hi', from_email='noreply@example.com', to_email='ada@example.com', body='Hi', **kwargs
+        )
+
+    def test_claim_due_takes_pending_rows_that_are_due_oldest_first(self):
+        now = timezone.now()
+        later = self.queue(next_attempt_at=now - timedelta(minutes=1))
+        first = self.queue(next_attempt_at=now - timedelta(minutes=5))
+        self.queue(next_attempt_at=now + timedelta(minutes=5))
+        self.queue(status='sent')
+        with transaction.atomic():
+            self.assertEqual(claim_due(OutboundEmail, 10), [first, later])
+            self.assertEqual(claim_due(OutboundEmail, 1), [first])
+
+    def test_schedule_retry_backs_off_then_gives_up(self):
+        email = self.queue()
+        email.schedule_retry('timeout', max_attempts=3)
+        self.assertEqual(email.status, 'pending')
+        self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=25))
+        email.schedule_retry('timeout', max_attempts=3)
+        email.schedule_retry('timeout', max_attempts=3)
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts, email.last_error), ('failed', 3, 'timeout'))
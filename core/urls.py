@@ -59,4 +59,8 @@ urlpatterns = [
     
     # AUDIT LOG URLs
     path('admin/audit-logs/', views.audit_log_list, name='audit_log_list'),
+
+    # INTERNAL METRICS URLs (core/metrics.py)
+    path('internal/metrics/', views.internal_metrics, name='internal_metrics'),
+    path('internal/metrics.prom', views.internal_metrics_prometheus, name='internal_metrics_prometheus'),
 ]
\ No newline at end of file
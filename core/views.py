@@ -13,53 +13,40 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Q, Count, Sum
 from django.utils import timezone
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from restaurants.models import Restaurant, Category, MenuItem
+from restaurants.search import search_restaurants
 from orders.models import Order, SavedCart
+from orders.stats import OPEN_STATUSES, CustomerStats
+from orders.transitions import InvalidTransition, transition
 from accounts.models import CustomUser
 from payments.models import Payment
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count, Sum, Avg, Q
+from django.db.models import Count, Sum, Avg, Q, F, Window
+from django.db.models.functions import Coalesce, RowNumber
 from datetime import datetime, timedelta
 import csv
 import json
+import os
+from itertools import islice
+from asgiref.sync import sync_to_async
+from .date_ranges import between_days, on_day, since_day
+from .home_feeds import get_home_feeds
+from .pagination import paginate_keyset
 
 # Home page view
 def home(request):
     """Home page with featured restaurants"""
-    featured_restaurants = Restaurant.objects.filter(is_active=True)[:6]
-    # Sample items for the hero mockup (fallback to currently available menu items)
-    sample_items = MenuItem.objects.filter(is_available=True).select_related('category', 'category__restaurant')[:4]
-    sample_total = sum(float(i.price) for i in sample_items) if sample_items else 0
-
-    # Top sellers: aggregate OrderItem quantities
-    try:
-        from orders.models import OrderItem
-        top_seller_ids = (
-            OrderItem.objects.values('menu_item')
-            .annotate(total_qty=Sum('quantity'))
-            .order_by('-total_qty')
-            .values_list('menu_item', flat=True)[:4]
-        )
-        top_sellers = list(MenuItem.objects.filter(id__in=list(top_seller_ids)).select_related('category')[:4])
-    except Exception:
-        top_sellers = list(MenuItem.objects.filter(is_available=True).select_related('category')[:4])
-
-    # Today's specials: recently created items (last 14 days)
-    two_weeks_ago = timezone.now() - timedelta(days=14)
-    todays_specials = list(MenuItem.objects.filter(is_available=True, created_at__gte=two_weeks_ago).select_related('category')[:4])
-
-    # Combo deals / customer picks: fallback to latest available items
-    customer_picks = list(MenuItem.objects.filter(is_available=True).select_related('category').order_by('-created_at')[:4])
-
+    # Precomputed and cached (core/home_feeds.py): one cache read per view
+    feeds = get_home_feeds()
     context = {
-        'featured_restaurants': featured_restaurants,
-        'sample_items': sample_items,
-        'sample_total': sample_total,
-        'top_sellers': top_sellers,
-        'todays_specials': todays_specials,
-        'customer_picks': customer_picks,
+        'featured_restaurants': feeds['featured_restaurants'],
+        'sample_items': feeds['sample_items'],
+        'sample_total': sum(float(item['price']) for item in feeds['sample_items']),
+        'top_sellers': feeds['top_sellers'],
+        'todays_specials': feeds['todays_specials'],
+        'customer_picks': feeds['customer_picks'],
     }
     return render(request, 'core/home.html', context)
 
@@ -70,22 +57,22 @@ def browse_restaurants(request):
     # Search functionality
     search_query = request.GET.get('search', '')
     if search_query:
-        restaurants = restaurants.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(category__name__icontains=search_query)
-        ).distinct()
+        # Full-text index over name, description, categories and dishes, best match first
+        restaurants = search_restaurants(restaurants, search_query)
     
     # Category filter
     category_filter = request.GET.get('category', '')
     if category_filter:
-        restaurants = restaurants.filter(category__name__iexact=category_filter)
+        restaurants = restaurants.filter(
+            pk__in=Category.objects.filter(name__iexact=category_filter).values('restaurant_id')
+        )
     
     # Get unique categories for filter dropdown
     categories = Category.objects.filter(restaurant__is_active=True).values_list('name', flat=True).distinct()
     
     context = {
-        'restaurants': restaurants,
+        # Cuisine badges list each restaurant's categories
+        'restaurants': restaurants.prefetch_related('category_set'),
         'search_query': search_query,
         'category_filter': category_filter,
         'categories': categories,
@@ -93,11 +80,72 @@ def browse_restaurants(request):
     }
     return render(request, 'core/browse_restaurants.html', context)
 
+def _build_owner_overview(owner_users, active_carts):
+    """Per-owner restaurants with order counts, revenue, latest orders and carts.
+
+    Uses one annotated restaurant query, one windowed query for the latest
+    5 orders per restaurant, and the already-loaded active carts.
+    """
+    restaurants = Restaurant.objects.filter(owner__role='restaurant_owner').annotate(
+        orders_count=Count('order'),
+        pending_count=Count('order', filter=Q(order__status='pending')),
+        revenue=Sum('order__total_price', filter=Q(order__status='completed')),
+    )
+
+    latest_orders = {}
+    recent = Order.objects.filter(restaurant__owner__role='restaurant_owner').annotate(
+        row_number=Window(
+            expression=RowNumber(),
+            partition_by=[F('restaurant_id')],
+            order_by=[F('created_at').desc(), F('id').desc()],
+        )
+    ).filter(row_number__lte=5).order_by('restaurant_id', 'row_number')
+    for order in recent:
+        latest_orders.setdefault(order.restaurant_id, []).append(order)
+
+    carts_by_restaurant = {}
+    for cart in active_carts:
+        carts_by_restaurant.setdefault(cart.restaurant_id, []).append(cart)
+
+    restaurants_by_owner = {}
+    for restaurant in restaurants:
+        restaurants_by_owner.setdefault(restaurant.owner_id, []).append(restaurant)
+
+    owner_overview = []
+    for owner in owner_users:
+        owner_restaurants = restaurants_by_owner.get(owner.id)
+        if not owner_restaurants:
+            continue
+        owner_data = {
+            'owner': owner,
+            'restaurants': [],
+            'total_orders': 0,
+            'total_revenue': 0,
+            'active_carts': 0,
+        }
+        for restaurant in owner_restaurants:
+            carts = carts_by_restaurant.get(restaurant.id, [])
+            revenue = restaurant.revenue or 0
+            owner_data['restaurants'].append({
+                'restaurant': restaurant,
+                'orders': latest_orders.get(restaurant.id, []),  # Recent 5 orders
+                'orders_count': restaurant.orders_count,
+                'pending_orders': restaurant.pending_count,
+                'carts': carts,
+                'carts_count': len(carts),
+                'revenue': revenue,
+            })
+            owner_data['total_orders'] += restaurant.orders_count
+            owner_data['total_revenue'] += revenue
+            owner_data['active_carts'] += len(carts)
+        owner_overview.append(owner_data)
+    return owner_overview
+
+
 @login_required
 def dashboard(request):
     """Redirect users to their appropriate dashboard"""
     user = request.user
-    print(f"🎯 DASHBOARD ROUTING: {user.username} → {user.role}")
     
     # Clear loader session flag if requested
     if request.method == 'GET' and request.GET.get('clear_loader') == '1':
@@ -116,23 +164,10 @@ def dashboard(request):
         
         # All orders for this customer
         all_orders = Order.objects.filter(customer=user)
-        recent_orders = all_orders.order_by('-created_at')[:5]
-        
-        # Order statistics
-        total_orders = all_orders.count()
-        completed_orders = all_orders.filter(status__in=['confirmed', 'completed']).count()
-        pending_orders = all_orders.filter(status__in=['pending', 'awaiting_confirmation', 'confirmed', 'preparing', 'ready']).count()
-        cancelled_orders = all_orders.filter(status='cancelled').count()
+        recent_orders = all_orders.select_related('restaurant').order_by('-created_at')[:5]
         
-        # Calculate total spent (confirmed and completed)
-        total_spent = all_orders.filter(status__in=['confirmed', 'completed']).aggregate(Sum('total_price'))['total_price__sum'] or 0
-
-        # This month's spending (confirmed and completed)
-        first_day_of_month = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        monthly_spent = all_orders.filter(
-            status__in=['confirmed', 'completed'],
-            created_at__gte=first_day_of_month
-        ).aggregate(Sum('total_price'))['total_price__sum'] or 0
+        # Order statistics and spending in a single aggregate query
+        stats = CustomerStats(user).summary()
         
         # Favorite restaurants (most ordered from)
         favorite_restaurants = all_orders.values(
@@ -147,10 +182,6 @@ def dashboard(request):
             count=Count('id')
         ).order_by('-count')
         
-        # Recent activity (last 7 days)
-        last_week = timezone.now() - timedelta(days=7)
-        recent_activity_count = all_orders.filter(created_at__gte=last_week).count()
-        
         # Featured restaurants
         featured_restaurants = Restaurant.objects.filter(is_active=True)[:6]
         
@@ -159,24 +190,22 @@ def dashboard(request):
         reviews_given = Review.objects.filter(order__customer=user).count() if hasattr(Review, 'objects') else 0
         
         # Active orders (not completed or cancelled)
-        active_orders = all_orders.filter(
-            status__in=['pending', 'awaiting_confirmation', 'confirmed', 'preparing', 'ready']
-        ).order_by('-created_at')[:3]
+        active_orders = all_orders.filter(status__in=OPEN_STATUSES).select_related('restaurant').order_by('-created_at')[:3]
         
         context = {
             'user': user,
             'recent_orders': recent_orders,
             'active_orders': active_orders,
             'featured_restaurants': featured_restaurants,
-            'total_orders': total_orders,
-            'completed_orders': completed_orders,
-            'pending_orders': pending_orders,
-            'cancelled_orders': cancelled_orders,
-            'total_spent': total_spent,
-            'monthly_spent': monthly_spent,
+            'total_orders': stats['total_orders'],
+            'completed_orders': stats['completed_orders'],
+            'pending_orders': stats['pending_orders'],
+            'cancelled_orders': stats['cancelled_orders'],
+            'total_spent': stats['total_spent'],
+            'monthly_spent': stats['monthly_spent'],
             'favorite_restaurants': favorite_restaurants,
             'payment_methods': payment_methods,
-            'recent_activity_count': recent_activity_count,
+            'recent_activity_count': stats['recent_activity_count'],
             'reviews_given': reviews_given,
         }
         return render(request, 'core/customer_dashboard.html', context)
@@ -207,17 +236,21 @@ def dashboard(request):
 
         # Role-specific querysets - Use ONLY role field (each user in one list only)
         admin_users = CustomUser.objects.filter(role='admin').order_by('-date_joined')
-        owner_users = CustomUser.objects.filter(role='restaurant_owner').order_by('-date_joined')
-        customer_users = CustomUser.objects.filter(role='customer').order_by('-date_joined')
+        owner_users = CustomUser.objects.filter(role='restaurant_owner').annotate(
+            restaurant_count=Count('restaurant')
+        ).order_by('-date_joined')
+        customer_users = CustomUser.objects.filter(role='customer').annotate(
+            order_count=Count('order')
+        ).order_by('-date_joined')
         
         # Get restaurants with their owners
-        restaurants_with_owners = Restaurant.objects.select_related('owner').all()
+        restaurants_with_owners = Restaurant.objects.select_related('owner').annotate(order_count=Count('order'))
         
         # Revenue analytics
         total_revenue = Payment.objects.filter(status='success').aggregate(Sum('amount'))['amount__sum'] or 0
         today_revenue = Payment.objects.filter(
+            on_day('created_at', timezone.now().date()),
             status='success',
-            created_at__date=timezone.now().date()
         ).aggregate(Sum('amount'))['amount__sum'] or 0
         
         # Additional metrics for better admin overview
@@ -226,10 +259,10 @@ def dashboard(request):
         this_month_start = today.replace(day=1)
         
         # Today's stats
-        today_orders = Order.objects.filter(created_at__date=today).count()
+        today_orders = Order.objects.filter(on_day('created_at', today)).count()
         pending_orders = Order.objects.filter(status='pending').count()
-        new_users_today = CustomUser.objects.filter(date_joined__date=today).count()
-        new_users_week = CustomUser.objects.filter(date_joined__date__gte=this_week_start).count()
+        new_users_today = CustomUser.objects.filter(on_day('date_joined', today)).count()
+        new_users_week = CustomUser.objects.filter(since_day('date_joined', this_week_start)).count()
         
         # Order stats
         completed_orders = Order.objects.filter(status='completed').count()
@@ -238,12 +271,12 @@ def dashboard(request):
         
         # This week/month revenue
         week_revenue = Payment.objects.filter(
+            since_day('created_at', this_week_start),
             status='success',
-            created_at__date__gte=this_week_start
         ).aggregate(Sum('amount'))['amount__sum'] or 0
         month_revenue = Payment.objects.filter(
+            since_day('created_at', this_month_start),
             status='success',
-            created_at__date__gte=this_month_start
         ).aggregate(Sum('amount'))['amount__sum'] or 0
         
         # Recent activity
@@ -254,42 +287,15 @@ def dashboard(request):
         active_restaurants = Restaurant.objects.filter(is_active=True).count()
         suspended_restaurants = Restaurant.objects.filter(is_active=False).count()
         
-        # Restaurant Owner Overview Data
-        # Get all restaurant owners with their restaurants, orders and carts
-        owner_overview = []
-        for owner in owner_users:
-            owner_restaurants = Restaurant.objects.filter(owner=owner).prefetch_related('order_set')
-            owner_data = {
-                'owner': owner,
-                'restaurants': [],
-                'total_orders': 0,
-                'total_revenue': 0,
-                'active_carts': 0,
-            }
-            
-            for restaurant in owner_restaurants:
-                orders = Order.objects.filter(restaurant=restaurant).order_by('-created_at')
-                carts = SavedCart.objects.filter(restaurant=restaurant).select_related('customer').prefetch_related('items')
-                restaurant_revenue = orders.filter(status='completed').aggregate(Sum('total_price'))['total_price__sum'] or 0
-                
-                owner_data['restaurants'].append({
-                    'restaurant': restaurant,
-                    'orders': orders[:5],  # Recent 5 orders
-                    'orders_count': orders.count(),
-                    'pending_orders': orders.filter(status='pending').count(),
-                    'carts': carts,
-                    'carts_count': carts.count(),
-                    'revenue': restaurant_revenue,
-                })
-                owner_data['total_orders'] += orders.count()
-                owner_data['total_revenue'] += restaurant_revenue
-                owner_data['active_carts'] += carts.count()
-            
-            if owner_restaurants.exists():
-                owner_overview.append(owner_data)
+        # All active carts across the platform (also grouped per restaurant below)
+        all_active_carts = list(
+            SavedCart.objects.select_related('customer', 'restaurant')
+            .prefetch_related('items__menu_item').order_by('-updated_at')
+        )
         
-        # All active carts across the platform
-        all_active_carts = SavedCart.objects.select_related('customer', 'restaurant').prefetch_related('items__menu_item').order_by('-updated_at')
+        # Restaurant Owner Overview Data - built from grouped queries so the
+        # query count stays constant regardless of owners/restaurants
+        owner_overview = _build_owner_overview(owner_users, all_active_carts)
         
         context = {
             'user': user,
@@ -592,28 +598,29 @@ def order_management(request):
     
     if user.role == 'restaurant_owner':
         # Owner sees only their restaurant orders
-        orders = Order.objects.filter(restaurant__owner=user).order_by('-created_at')
-        context['orders'] = orders
+        orders = Order.objects.filter(restaurant__owner=user)
         context['page_title'] = 'My Restaurant Orders'
         
     elif user.role == 'admin':
         # Admin sees all orders
-        orders = Order.objects.all().order_by('-created_at')
-        context['orders'] = orders
+        orders = Order.objects.all()
         context['page_title'] = 'All Platform Orders'
         
     elif user.role == 'customer':
         # Customer sees only their orders
-        orders = Order.objects.filter(customer=user).order_by('-created_at')
-        context['orders'] = orders
+        orders = Order.objects.filter(customer=user)
         context['page_title'] = 'My Orders'
     
     else:
         orders = Order.objects.none()
     
-    context['total_orders'] = orders.count()
-    context['pending_orders'] = orders.filter(status='pending').count()
-    context['completed_orders'] = orders.filter(status='completed').count()
+    counts = orders.aggregate(
+        total_orders=Count('id'),
+        pending_orders=Count('id', filter=Q(status='pending')),
+        completed_orders=Count('id', filter=Q(status='completed')),
+    )
+    context.update(counts)
+    context['orders'] = context['page_obj'] = paginate_keyset(request, orders.select_related('restaurant', 'customer'))
     
     return render(request, 'core/order_management.html', context)
 
@@ -649,8 +656,13 @@ def update_order_status(request, order_id):
     if request.method == 'POST':
         new_status = request.POST.get('status')
         if new_status in dict(Order.STATUS_CHOICES):
-            order.status = new_status
-            order.save()
+            try:
+                # Admins may override the normal flow (e.g. reopen an order)
+                transition(order, new_status, user=request.user, source='update_order_status',
+                           validate=request.user.role != 'admin')
+            except InvalidTransition as e:
+                messages.error(request, str(e))
+                return redirect('order_detail', order_id=order_id)
             messages.success(request, f'Order status updated to {order.get_status_display()}')
         else:
             messages.error(request, 'Invalid status')
@@ -690,64 +702,58 @@ def analytics_dashboard(request):
         # ADMIN ANALYTICS - Enhanced with time filters
         from accounts.models import CustomUser
         from restaurants.models import Restaurant
-        from orders.models import Order
-        from payments.models import Payment
+        from orders.models import DailyRestaurantStats
+        from payments.models import DailyPaymentStats
         
-        # Base queries with time filter
-        date_filter = Q()
-        if start_date:
-            date_filter = Q(created_at__date__range=[start_date, end_date])
+        # Order and payment figures come from the daily rollups (orders/rollups.py)
+        day_filter = Q(day__gte=start_date, day__lte=end_date) if start_date else Q()
+        order_days = DailyRestaurantStats.objects.filter(day_filter)
+        paid_days = DailyPaymentStats.objects.filter(day_filter, status='success')
         
         # Platform metrics with time filter
         total_restaurants = Restaurant.objects.count()
         total_users = CustomUser.objects.count()
-        total_orders = Order.objects.filter(date_filter).count() if start_date else Order.objects.count()
+        order_totals = order_days.aggregate(
+            total_orders=Sum('order_count'),
+            order_value=Sum('revenue'),
+            completed_count=Sum('order_count', filter=Q(status='completed')),
+        )
+        total_orders = order_totals['total_orders'] or 0
         
         # Revenue analytics
-        revenue_filter = Q(status='success')
-        if start_date:
-            revenue_filter &= Q(created_at__date__range=[start_date, end_date])
-            
-        total_revenue = Payment.objects.filter(revenue_filter).aggregate(Sum('amount'))['amount__sum'] or 0
+        total_revenue = paid_days.aggregate(Sum('amount'))['amount__sum'] or 0
         
         # Growth metrics
-        new_users = CustomUser.objects.filter(date_joined__date__range=[start_date, end_date]).count() if start_date else 0
-        new_restaurants = Restaurant.objects.filter(created_at__date__range=[start_date, end_date]).count() if start_date else 0
+        new_users = CustomUser.objects.filter(between_days('date_joined', start_date, end_date)).count() if start_date else 0
+        new_restaurants = Restaurant.objects.filter(between_days('created_at', start_date, end_date)).count() if start_date else 0
         
         # Top performing restaurants (time filtered)
-        restaurant_filter = Q(order__created_at__date__range=[start_date, end_date]) if start_date else Q()
-        top_restaurants = Restaurant.objects.annotate(
-            order_count=Count('order', filter=restaurant_filter),
-            total_revenue=Sum('order__total_price', filter=restaurant_filter)
+        restaurant_filter = Q(daily_stats__day__gte=start_date, daily_stats__day__lte=end_date) if start_date else Q()
+        top_restaurants = Restaurant.objects.select_related('owner').annotate(
+            order_count=Sum('daily_stats__order_count', filter=restaurant_filter),
+            total_revenue=Sum('daily_stats__revenue', filter=restaurant_filter)
         ).order_by('-total_revenue')[:10]
         
         # Order status distribution
-        order_statuses = Order.objects.filter(date_filter).values('status').annotate(count=Count('id'))
+        order_statuses = order_days.values('status').annotate(count=Sum('order_count')).filter(count__gt=0).order_by('status')
         
         # Revenue trend data for charts
-        revenue_trend = Payment.objects.filter(
-            status='success',
-            created_at__date__range=[start_date, end_date] if start_date else Q()
-        ).extra(
-            select={'day': "date(created_at)"}
-        ).values('day').annotate(
-            daily_revenue=Sum('amount')
-        ).order_by('day')
+        revenue_trend = paid_days.values('day').annotate(daily_revenue=Sum('amount')).order_by('day')
         
         # Additional analytics metrics
-        avg_order_value = Order.objects.filter(date_filter).aggregate(Avg('total_price'))['total_price__avg'] or 0
-        completed_count = Order.objects.filter(date_filter, status='completed').count()
+        avg_order_value = (order_totals['order_value'] or 0) / total_orders if total_orders > 0 else 0
+        completed_count = order_totals['completed_count'] or 0
         completion_rate = (completed_count / total_orders * 100) if total_orders > 0 else 0
-        pending_orders = Order.objects.filter(status='pending').count()
+        pending_orders = DailyRestaurantStats.objects.filter(status='pending').aggregate(Sum('order_count'))['order_count__sum'] or 0
         
         # Active carts (SavedCart objects)
         from orders.models import SavedCart
         active_carts = SavedCart.objects.count()
         
         # Today's stats
-        today_orders = Order.objects.filter(created_at__date=today).count()
-        today_revenue = Payment.objects.filter(status='success', created_at__date=today).aggregate(Sum('amount'))['amount__sum'] or 0
-        today_new_users = CustomUser.objects.filter(date_joined__date=today).count()
+        today_orders = DailyRestaurantStats.objects.filter(day=today).aggregate(Sum('order_count'))['order_count__sum'] or 0
+        today_revenue = DailyPaymentStats.objects.filter(day=today, status='success').aggregate(Sum('amount'))['amount__sum'] or 0
+        today_new_users = CustomUser.objects.filter(on_day('date_joined', today)).count()
         
         context.update({
             'scope': 'platform',
@@ -774,61 +780,56 @@ def analytics_dashboard(request):
     elif user.role == 'restaurant_owner':
         # OWNER ANALYTICS - Enhanced with time filters
         from restaurants.models import Restaurant
-        from orders.models import Order
-        from payments.models import Payment
+        from orders.models import CustomerRestaurantStats, DailyMenuItemStats, DailyRestaurantStats
+        from payments.models import DailyPaymentStats
         
         # Get owner's restaurants
         restaurants = Restaurant.objects.filter(owner=user)
         restaurant_ids = restaurants.values_list('id', flat=True)
         
-        # Base queries with time filter
-        date_filter = Q()
+        # Order, item and customer figures come from the rollups (orders/rollups.py)
+        day_filter = Q(restaurant__in=restaurants)
         if start_date:
-            date_filter = Q(created_at__date__range=[start_date, end_date])
-        
-        restaurant_filter = Q(restaurant__in=restaurants) & date_filter
+            day_filter &= Q(day__gte=start_date, day__lte=end_date)
+        order_days = DailyRestaurantStats.objects.filter(day_filter)
         
         # Restaurant metrics
-        total_orders = Order.objects.filter(restaurant_filter).count()
-        pending_orders = Order.objects.filter(restaurant_filter, status='pending').count()
-        completed_orders = Order.objects.filter(restaurant_filter, status='completed').count()
+        totals = order_days.aggregate(
+            total_orders=Sum('order_count'),
+            pending_orders=Sum('order_count', filter=Q(status='pending')),
+            completed_orders=Sum('order_count', filter=Q(status='completed')),
+        )
+        total_orders = totals['total_orders'] or 0
+        pending_orders = totals['pending_orders'] or 0
+        completed_orders = totals['completed_orders'] or 0
         
         # Revenue analytics
-        revenue_filter = Q(order__restaurant__in=restaurants, status='success')
-        if start_date:
-            revenue_filter &= Q(created_at__date__range=[start_date, end_date])
-            
-        total_revenue = Payment.objects.filter(revenue_filter).aggregate(Sum('amount'))['amount__sum'] or 0
+        total_revenue = DailyPaymentStats.objects.filter(
+            day_filter, status='success'
+        ).aggregate(Sum('amount'))['amount__sum'] or 0
         
         # Popular menu items (time filtered)
-        from orders.models import OrderItem
-        popular_items = OrderItem.objects.filter(
-            order__restaurant__in=restaurants,
-            order__created_at__date__range=[start_date, end_date] if start_date else Q()
-        ).values(
+        popular_items = DailyMenuItemStats.objects.filter(day_filter).values(
             'menu_item__name', 'menu_item__category__name'
         ).annotate(
             total_ordered=Sum('quantity'),
-            total_revenue=Sum('price')
+            total_revenue=Sum('revenue')
         ).order_by('-total_ordered')[:10]
         
         # Order trends for charts
-        order_trends = Order.objects.filter(
-            restaurant__in=restaurants,
-            created_at__date__range=[start_date, end_date] if start_date else Q()
-        ).extra(
-            select={'day': "date(created_at)"}
-        ).values('day').annotate(
-            daily_orders=Count('id'),
-            daily_revenue=Sum('total_price')
+        order_trends = order_days.values('day').annotate(
+            daily_orders=Sum('order_count'),
+            daily_revenue=Sum('revenue')
         ).order_by('day')
         
-        # Customer metrics
-        unique_customers = Order.objects.filter(restaurant_filter).values('customer').distinct().count()
-        repeat_customers = Order.objects.filter(
-            restaurant__in=restaurants
-        ).values('customer').annotate(
-            order_count=Count('id')
+        # Customer metrics (a customer's last order falls in the period iff they ordered in it)
+        customer_stats = CustomerRestaurantStats.objects.filter(restaurant__in=restaurants)
+        active_customers = customer_stats
+        if start_date:
+            active_customers = active_customers.filter(since_day('last_order_at', start_date))
+        unique_customers = active_customers.values('customer').distinct().count()
+        repeat_customers = customer_stats.values('customer').annotate(
+            order_count=Sum('order_count')
         ).filter(order_count__gt=1).count()
         
         context.update({
@@ -852,7 +853,7 @@ def analytics_dashboard(request):
         
         date_filter = Q()
         if start_date:
-            date_filter = Q(created_at__date__range=[start_date, end_date])
+            date_filter = between_days('created_at', start_date, end_date)
             
         customer_orders = Order.objects.filter(Q(customer=user) & date_filter)
         total_orders = customer_orders.count()
@@ -860,8 +861,8 @@ def analytics_dashboard(request):
         
         # Favorite restaurants
         favorite_restaurants = Order.objects.filter(
+            between_days('created_at', start_date, end_date) if start_date else Q(),
             customer=user,
-            created_at__date__range=[start_date, end_date] if start_date else Q()
         ).values(
             'restaurant__name'
         ).annotate(
@@ -1014,7 +1015,7 @@ def notifications_dashboard(request):
         active_carts = SavedCart.objects.select_related('customer', 'restaurant').prefetch_related('items__menu_item').order_by('-updated_at')
         
         # Today's activity
-        today_orders = Order.objects.filter(created_at__date=timezone.now().date()).select_related('restaurant', 'customer').order_by('-created_at')
+        today_orders = Order.objects.filter(on_day('created_at', timezone.now().date())).select_related('restaurant', 'customer').order_by('-created_at')
         
         # Recent restaurants (this week)
         week_ago = timezone.now() - timedelta(days=7)
@@ -1055,8 +1056,8 @@ def notifications_dashboard(request):
         
         # Today's orders
         today_orders = Order.objects.filter(
+            on_day('created_at', timezone.now().date()),
             restaurant__in=restaurants,
-            created_at__date=timezone.now().date()
         ).select_related('restaurant', 'customer').order_by('-created_at')
         
         # All recent orders
@@ -1422,6 +1423,57 @@ def promo_code_delete(request, promo_id):
 # EXPORT FUNCTIONALITY VIEWS
 # ============================================================================
 
+# Rows fetched per database round-trip while streaming exports
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """Pseudo-buffer whose write() returns the value, so csv.writer yields rows"""
+
+    def write(self, value):
+        return value
+
+
+class SyncStreamingResponse(StreamingHttpResponse):
+    """StreamingHttpResponse over a sync iterator that also streams under ASGI.
+
+    Django 4.2 serves a sync iterator to an ASGI server by list()-ing all of
+    it first. This pulls it ``batch_size`` parts at a time instead, in the
+    request's sync thread, so QuerySet.iterator() keeps its connection.
+    """
+
+    batch_size = 200
+
+    async def __aiter__(self):
+        if self.is_async:
+            async for part in super().__aiter__():
+                yield part
+            return
+        parts = iter(self.streaming_content)
+        next_batch = sync_to_async(lambda: list(islice(parts, self.batch_size)), thread_sensitive=True)
+        while batch := await next_batch():
+            for part in batch:
+                yield part
+
+
+def _stream_csv(filename, rows):
+    """Stream ``rows`` as a CSV attachment without building it in memory"""
+    writer = csv.writer(Echo())
+    response = SyncStreamingResponse((writer.writerow(row) for row in rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}_{timezone.now().strftime("%Y%m%d_%H%M%S")}.csv"'
+    return response
+
+
+def _restaurants_with_order_totals():
+    """Restaurants annotated with order counts and completed revenue from the daily rollups"""
+    completed = Q(daily_stats__status='completed')
+    return Restaurant.objects.select_related('owner').annotate(
+        order_count=Coalesce(Sum('daily_stats__order_count'), 0),
+        completed_count=Coalesce(Sum('daily_stats__order_count', filter=completed), 0),
+        revenue=Sum('daily_stats__revenue', filter=completed),
+    )
+
+
 @login_required
 def export_users(request):
     """Export users to CSV (Admin only)"""
@@ -1431,25 +1483,22 @@ def export_users(request):
     
     from .models import AuditLog
     
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="users_{timezone.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['ID', 'Username', 'Email', 'Role', 'Phone', 'Is Active', 'Is Verified', 'Date Joined', 'Last Login'])
-    
     users = CustomUser.objects.all().order_by('-date_joined')
-    for user in users:
-        writer.writerow([
-            user.id,
-            user.username,
-            user.email,
-            user.role,
-            user.phone_number or '',
-            'Yes' if user.is_active else 'No',
-            'Yes' if user.is_verified else 'No',
-            user.date_joined.strftime('%Y-%m-%d %H:%M:%S'),
-            user.last_login.strftime('%Y-%m-%d %H:%M:%S') if user.last_login else 'Never',
-        ])
+    
+    def rows():
+        yield ['ID', 'Username', 'Email', 'Role', 'Phone', 'Is Active', 'Is Verified', 'Date Joined', 'Last Login']
+        for user in users.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield [
+                user.id,
+                user.username,
+                user.email,
+                user.role,
+                user.phone_number or '',
+                'Yes' if user.is_active else 'No',
+                'Yes' if user.is_verified else 'No',
+                user.date_joined.strftime('%Y-%m-%d %H:%M:%S'),
+                user.last_login.strftime('%Y-%m-%d %H:%M:%S') if user.last_login else 'Never',
+            ]
     
     AuditLog.log(
         user=request.user,
@@ -1459,7 +1508,7 @@ def export_users(request):
         request=request
     )
     
-    return response
+    return _stream_csv('users', rows())
 
 
 @login_required
@@ -1471,39 +1520,33 @@ def export_restaurants(request):
     
     from .models import AuditLog
     
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="restaurants_{timezone.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['ID', 'Name', 'Owner', 'Owner Email', 'Address', 'Phone', 'Is Active', 'Total Orders', 'Total Revenue', 'Created At'])
-    
-    restaurants = Restaurant.objects.select_related('owner').all()
-    for r in restaurants:
-        order_count = Order.objects.filter(restaurant=r).count()
-        revenue = Order.objects.filter(restaurant=r, status='completed').aggregate(Sum('total_price'))['total_price__sum'] or 0
-        
-        writer.writerow([
-            r.id,
-            r.name,
-            r.owner.username,
-            r.owner.email,
-            r.address,
-            r.phone,
-            'Yes' if r.is_active else 'No',
-            order_count,
-            f'{revenue:.2f}',
-            r.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-        ])
+    restaurants = _restaurants_with_order_totals()
+    
+    def rows():
+        yield ['ID', 'Name', 'Owner', 'Owner Email', 'Address', 'Phone', 'Is Active', 'Total Orders', 'Total Revenue', 'Created At']
+        for r in restaurants.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield [
+                r.id,
+                r.name,
+                r.owner.username,
+                r.owner.email,
+                r.address,
+                r.phone,
+                'Yes' if r.is_active else 'No',
+                r.order_count,
+                f'{r.revenue or 0:.2f}',
+                r.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            ]
     
     AuditLog.log(
         user=request.user,
         action_type='export_data',
-        description=f'Exported {restaurants.count()} restaurants to CSV',
+        description=f'Exported {Restaurant.objects.count()} restaurants to CSV',
         target_model='Restaurant',
         request=request
     )
     
-    return response
+    return _stream_csv('restaurants', rows())
 
 
 @login_required
@@ -1513,43 +1556,41 @@ def export_orders(request):
         messages.error(request, 'Access denied. Admin only.')
         return redirect('dashboard')
     
-    from .models import AuditLog, PlatformSettings
+    from .models import AuditLog
+    from .platform_settings import get_platform_settings
     
-    settings = PlatformSettings.get_settings()
+    settings = get_platform_settings()
     commission_rate = float(settings.commission_percentage)
     
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="orders_{timezone.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Order ID', 'Restaurant', 'Customer', 'Customer Email', 'Status', 'Total', 'Commission', 'Restaurant Earns', 'Created At'])
-    
     orders = Order.objects.select_related('restaurant', 'customer').all().order_by('-created_at')
-    for order in orders:
-        commission = float(order.total_price) * commission_rate / 100
-        restaurant_earns = float(order.total_price) - commission
-        
-        writer.writerow([
-            order.id,
-            order.restaurant.name,
-            order.customer.username,
-            order.customer_email,
-            order.status,
-            f'{order.total_price:.2f}',
-            f'{commission:.2f}',
-            f'{restaurant_earns:.2f}',
-            order.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-        ])
+    
+    def rows():
+        yield ['Order ID', 'Restaurant', 'Customer', 'Customer Email', 'Status', 'Total', 'Commission', 'Restaurant Earns', 'Created At']
+        for order in orders.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            commission = float(order.total_price) * commission_rate / 100
+            restaurant_earns = float(order.total_price) - commission
+            
+            yield [
+                order.id,
+                order.restaurant.name,
+                order.customer.username,
+                order.customer_email,
+                order.status,
+                f'{order.total_price:.2f}',
+                f'{commission:.2f}',
+                f'{restaurant_earns:.2f}',
+                order.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            ]
     
     AuditLog.log(
         user=request.user,
         action_type='export_data',
-        description=f'Exported {orders.count()} orders to CSV',
+        description=f'Exported {Order.objects.count()} orders to CSV',
         target_model='Order',
         request=request
     )
     
-    return response
+    return _stream_csv('orders', rows())
 
 
 @login_required
@@ -1559,57 +1600,55 @@ def export_revenue_report(request):
         messages.error(request, 'Access denied. Admin only.')
         return redirect('dashboard')
     
-    from .models import AuditLog, PlatformSettings
+    from .models import AuditLog
+    from .platform_settings import get_platform_settings
     
-    settings = PlatformSettings.get_settings()
+    settings = get_platform_settings()
     commission_rate = float(settings.commission_percentage)
     
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="revenue_report_{timezone.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-    
-    writer = csv.writer(response)
-    
-    # Summary section
-    writer.writerow(['=== REVENUE REPORT ==='])
-    writer.writerow(['Generated:', timezone.now().strftime('%Y-%m-%d %H:%M:%S')])
-    writer.writerow(['Commission Rate:', f'{commission_rate}%'])
-    writer.writerow([])
-    
-    # Overall stats
-    total_orders = Order.objects.count()
-    completed_orders = Order.objects.filter(status='completed').count()
-    total_revenue = Order.objects.filter(status='completed').aggregate(Sum('total_price'))['total_price__sum'] or 0
+    # Overall stats from the daily rollups
+    from orders.models import DailyRestaurantStats
+    totals = DailyRestaurantStats.objects.aggregate(
+        total_orders=Coalesce(Sum('order_count'), 0),
+        completed_orders=Coalesce(Sum('order_count', filter=Q(status='completed')), 0),
+        total_revenue=Sum('revenue', filter=Q(status='completed')),
+    )
+    total_revenue = totals['total_revenue'] or 0
     total_commission = float(total_revenue) * commission_rate / 100
-    
-    writer.writerow(['=== SUMMARY ==='])
-    writer.writerow(['Total Orders:', total_orders])
-    writer.writerow(['Completed Orders:', completed_orders])
-    writer.writerow(['Total Revenue:', f'{total_revenue:.2f}'])
-    writer.writerow(['Platform Commission:', f'{total_commission:.2f}'])
-    writer.writerow(['Restaurant Payouts:', f'{float(total_revenue) - total_commission:.2f}'])
-    writer.writerow([])
-    
-    # Revenue by restaurant
-    writer.writerow(['=== REVENUE BY RESTAURANT ==='])
-    writer.writerow(['Restaurant', 'Owner', 'Total Orders', 'Completed Orders', 'Gross Revenue', 'Platform Commission', 'Net Payout'])
-    
-    restaurants = Restaurant.objects.select_related('owner').all()
-    for r in restaurants:
-        r_orders = Order.objects.filter(restaurant=r)
-        r_total = r_orders.count()
-        r_completed = r_orders.filter(status='completed').count()
-        r_revenue = r_orders.filter(status='completed').aggregate(Sum('total_price'))['total_price__sum'] or 0
-        r_commission = float(r_revenue) * commission_rate / 100
-        
-        writer.writerow([
-            r.name,
-            r.owner.username,
-            r_total,
-            r_completed,
-            f'{r_revenue:.2f}',
-            f'{r_commission:.2f}',
-            f'{float(r_revenue) - r_commission:.2f}',
-        ])
+    generated_at = timezone.now()
+    
+    def rows():
+        # Summary section
+        yield ['=== REVENUE REPORT ===']
+        yield ['Generated:', generated_at.strftime('%Y-%m-%d %H:%M:%S')]
+        yield ['Commission Rate:', f'{commission_rate}%']
+        yield []
+        
+        yield ['=== SUMMARY ===']
+        yield ['Total Orders:', totals['total_orders']]
+        yield ['Completed Orders:', totals['completed_orders']]
+        yield ['Total Revenue:', f'{total_revenue:.2f}']
+        yield ['Platform Commission:', f'{total_commission:.2f}']
+        yield ['Restaurant Payouts:', f'{float(total_revenue) - total_commission:.2f}']
+        yield []
+        
+        # Revenue by restaurant
+        yield ['=== REVENUE BY RESTAURANT ===']
+        yield ['Restaurant', 'Owner', 'Total Orders', 'Completed Orders', 'Gross Revenue', 'Platform Commission', 'Net Payout']
+        
+        for r in _restaurants_with_order_totals().iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            r_revenue = r.revenue or 0
+            r_commission = float(r_revenue) * commission_rate / 100
+            
+            yield [
+                r.name,
+                r.owner.username,
+                r.order_count,
+                r.completed_count,
+                f'{r_revenue:.2f}',
+                f'{r_commission:.2f}',
+                f'{float(r_revenue) - r_commission:.2f}',
+            ]
     
     AuditLog.log(
         user=request.user,
@@ -1619,7 +1658,7 @@ def export_revenue_report(request):
         request=request
     )
     
-    return response
+    return _stream_csv('revenue_report', rows())
 
 
 # ============================================================================
@@ -1650,10 +1689,13 @@ def audit_log_list(request):
     # Filter by date
     date_filter = request.GET.get('date')
     if date_filter:
-        logs = logs.filter(created_at__date=date_filter)
+        try:
+            logs = logs.filter(on_day('created_at', date_filter))
+        except ValueError:
+            date_filter = None
     
-    # Limit to last 500
-    logs = logs[:500]
+    # Page through newest first instead of loading the last 500
+    logs = paginate_keyset(request, logs, per_page=50)
     
     # Get unique action types for filter dropdown
     action_types = AuditLog.ACTION_TYPES
@@ -1663,6 +1705,7 @@ def audit_log_list(request):
     
     context = {
         'logs': logs,
+        'page_obj': logs,
         'action_types': action_types,
         'admin_users': admin_users,
         'current_action': action_filter,
@@ -1682,9 +1725,10 @@ def validate_promo_code(request):
     if request.method != 'POST':
         return JsonResponse({'valid': False, 'error': 'Invalid request method'})
     
-    from .models import PromoCode, PromoCodeUsage, PlatformSettings
+    from .models import PromoCode, PromoCodeUsage
+    from .platform_settings import get_platform_settings
     
-    settings = PlatformSettings.get_settings()
+    settings = get_platform_settings()
     if not settings.enable_promo_codes:
         return JsonResponse({'valid': False, 'error': 'Promo codes are currently disabled'})
     
@@ -1767,4 +1811,58 @@ from .models import AdminFeedback
 @staff_member_required
 def admin_feedback_list(request):
     feedbacks = AdminFeedback.objects.all().order_by('-created_at')
-    return render(request, 'core/admin_feedback_list.html', {'feedbacks': feedbacks})
\ No newline at end of file
+    return render(request, 'core/admin_feedback_list.html', {'feedbacks': feedbacks})
+
+# ============== INTERNAL METRICS ==============
+
+def _is_platform_admin(user):
+    return user.is_authenticated and (user.role == 'admin' or user.is_superuser)
+
+
+@login_required
+def internal_metrics(request):
+    """Per-view SQL, template and total time of this worker (Admin only)"""
+    if not _is_platform_admin(request.user):
+        messages.error(request, 'Access denied. Admin only.')
+        return redirect('dashboard')
+
+    from . import metrics
+
+    if request.method == 'POST' and request.POST.get('reset'):
+        metrics.registry.reset()
+        return redirect('internal_metrics')
+
+    rows = []
+    for view, stats in metrics.registry.snapshot():
+        rows.append({
+            'view': view,
+            'stats': stats,
+            'avg_ms': stats.average(stats.total_time) * 1000,
+            'max_ms': stats.max_time * 1000,
+            'avg_sql': stats.average(stats.sql_count),
+            'avg_sql_ms': stats.average(stats.sql_time) * 1000,
+            'avg_template_ms': stats.average(stats.template_time) * 1000,
+        })
+    return render(request, 'core/internal_metrics.html', {
+        'rows': rows,
+        'pid': os.getpid(),
+        'since': datetime.fromtimestamp(metrics.registry.started_at, tz=timezone.get_current_timezone()),
+        'duplicate_threshold': metrics.METRICS_DUPLICATE_THRESHOLD,
+    })
+
+
+def internal_metrics_prometheus(request):
+    """Prometheus scrape endpoint: platform admins, or the METRICS_TOKEN bearer"""
+    from django.conf import settings
+    from django.utils.crypto import constant_time_compare
+
+    from . import metrics
+
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    auth = request.headers.get('Authorization', '')
+    allowed = _is_platform_admin(request.user) or (
+        token and auth.startswith('Bearer ') and constant_time_compare(auth[len('Bearer '):], token)
+    )
+    if not allowed:
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(metrics.prometheus_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
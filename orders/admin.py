@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Order, OrderItem, Review
+from .models import Order, OrderItem, OrderStatusHistory, Review
+from .transitions import bulk_transition, transition
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
@@ -8,16 +9,27 @@ class OrderItemInline(admin.TabularInline):
     fields = ('menu_item', 'quantity', 'price', 'total_price', 'special_requests')
     
     def total_price(self, obj):
-        return obj.total_price
+        # The inline's blank "add another" row has no price yet
+        return obj.total_price if obj.price is not None else '-'
     total_price.short_description = 'Total'
 
+class OrderStatusHistoryInline(admin.TabularInline):
+    model = OrderStatusHistory
+    extra = 0
+    can_delete = False
+    readonly_fields = ('from_status', 'to_status', 'payment_status', 'changed_by', 'source', 'created_at')
+    fields = readonly_fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ('id', 'customer', 'restaurant', 'total_price', 'status', 'created_at')
     list_filter = ('status', 'created_at', 'restaurant')
     search_fields = ('id', 'customer__username', 'restaurant__name', 'customer_name', 'customer_phone')
     readonly_fields = ('created_at', 'updated_at', 'total_price')
-    inlines = [OrderItemInline]
+    inlines = [OrderItemInline, OrderStatusHistoryInline]
     
     fieldsets = (
         ('Order Information', {
@@ -31,30 +43,41 @@ class OrderAdmin(admin.ModelAdmin):
         }),
     )
     
+    def save_model(self, request, obj, form, change):
+        if not (change and {'status', 'payment_status'} & set(form.changed_data)):
+            return super().save_model(request, obj, form, change)
+        # Save the other fields first, then move the status through the state
+        # machine so a cancel puts the stock back like every other path
+        status, payment_status = obj.status, obj.payment_status
+        obj.status = form.initial.get('status', status)
+        obj.payment_status = form.initial.get('payment_status', payment_status)
+        super().save_model(request, obj, form, change)
+        transition(obj, status, user=request.user, source='admin', payment_status=payment_status, validate=False)
+    
     actions = ['mark_pending', 'mark_confirmed', 'mark_preparing', 'mark_ready', 'mark_completed', 'mark_cancelled']
     
     def mark_pending(self, request, queryset):
-        updated = queryset.update(status='pending')
+        updated = bulk_transition(queryset, 'pending', user=request.user, request=request, validate=False).updated
         self.message_user(request, f'{updated} orders marked as Pending.')
     
     def mark_confirmed(self, request, queryset):
-        updated = queryset.update(status='confirmed')
+        updated = bulk_transition(queryset, 'confirmed', user=request.user, request=request, validate=False).updated
         self.message_user(request, f'{updated} orders marked as Confirmed.')
     
     def mark_preparing(self, request, queryset):
-        updated = queryset.update(status='preparing')
+        updated = bulk_transition(queryset, 'preparing', user=request.user, request=request, validate=False).updated
         self.message_user(request, f'{updated} orders marked as Preparing.')
     
     def mark_ready(self, request, queryset):
-        updated = queryset.update(status='ready')
+        updated = bulk_transition(queryset, 'ready', user=request.user, request=request, validate=False).updated
         self.message_user(request, f'{updated} orders marked as Ready.')
     
     def mark_completed(self, request, queryset):
-        updated = queryset.update(status='completed')
+        updated = bulk_transition(queryset, 'completed', user=request.user, request=request, validate=False).updated
         self.message_user(request, f'{updated} orders marked as Completed.')
     
     def mark_cancelled(self, request, queryset):
-        updated = queryset.update(status='cancelled')
+        updated = bulk_transition(queryset, 'cancelled', user=request.user, request=request, validate=False).updated
         self.message_user(request, f'{updated} orders marked as Cancelled.')
     
     # Set short descriptions for all actions
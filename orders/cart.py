@@ -1,3 +1,19 @@
+import logging
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def pending_sync_delay(session):
+    """Seconds until a deferred SavedCart sync is due (0 = now), or None if none is pending"""
+    if not session.get('cart_sync_pending'):
+        return None
+    debounce = getattr(settings, 'CART_SYNC_DEBOUNCE', 0)
+    return max(0.0, session.get('cart_synced_at', 0) + debounce - time.time())
+
+
 class Cart:
     def __init__(self, request):
         self.request = request
@@ -49,6 +65,9 @@ class Cart:
         menu_item_id = str(menu_item.id)
         restaurant_id = str(menu_item.category.restaurant.id)
 
+        in_cart = self.cart.get(restaurant_id, {}).get(menu_item_id, {}).get('quantity', 0)
+        self._hold_stock(menu_item, in_cart + quantity)
+
         # Ensure there's a subcart for that restaurant
         if restaurant_id not in self.cart:
             self.cart[restaurant_id] = {}
@@ -79,6 +98,7 @@ class Cart:
         restaurant_id = str(menu_item.category.restaurant.id)
         subcart = self.cart.get(restaurant_id, {})
         if menu_item_id in subcart:
+            self._release_stock([menu_item.id] if menu_item.track_stock else [])
             del subcart[menu_item_id]
             # If subcart empty, remove restaurant key
             if not subcart:
@@ -94,17 +114,19 @@ class Cart:
         restaurant_id = str(menu_item.category.restaurant.id)
         subcart = self.cart.get(restaurant_id, {})
         if menu_item_id in subcart:
-            subcart[menu_item_id]['quantity'] = quantity
-            subcart[menu_item_id]['special_requests'] = special_requests
             if quantity <= 0:
                 self.remove(menu_item)
-            else:
-                self.save()
-                self._sync_to_database(menu_item.category.restaurant)
+                return
+            self._hold_stock(menu_item, quantity)
+            subcart[menu_item_id]['quantity'] = quantity
+            subcart[menu_item_id]['special_requests'] = special_requests
+            self.save()
+            self._sync_to_database(menu_item.category.restaurant)
 
     def clear(self, all_restaurants=False):
         # Clear database cart for active restaurant or all
         if all_restaurants:
+            self._release_stock()
             # clear all saved carts for user
             if self.user and self.user.is_authenticated:
                 from orders.models import SavedCart
@@ -115,6 +137,7 @@ class Cart:
         else:
             rid = self._active_restaurant_id()
             if rid:
+                self._release_stock([int(item_id) for item_id in self.cart.get(rid, {})])
                 # Clear DB saved cart for this restaurant
                 if self.user and self.user.is_authenticated:
                     from orders.models import SavedCart
@@ -128,46 +151,119 @@ class Cart:
     def save(self):
         self.session.modified = True
 
+    def _hold_stock(self, menu_item, quantity):
+        """Reserve a stock-tracked item for this cart; raises ValueError if too few are left"""
+        if not menu_item.track_stock:
+            return
+        from restaurants import stock
+
+        try:
+            stock.hold(self.reservation_key, menu_item.id, quantity)
+        except stock.InsufficientStock:
+            raise ValueError(f"Sorry, there are not enough {menu_item.name} left to have {quantity} in your cart.")
+
+    def _release_stock(self, menu_item_ids=None):
+        """Give back stock this cart holds (the given items, or all of it)"""
+        if menu_item_ids is not None and not menu_item_ids:
+            return
+        from restaurants import stock
+
+        stock.release(self.reservation_key, menu_item_ids)
+
     def _sync_to_database(self, restaurant):
         """Sync current subcart to database for admin visibility"""
         if not self.user or not self.user.is_authenticated:
             return
 
+        if getattr(settings, 'CART_SYNC_DEBOUNCE', 0):
+            # Coalesce bursts of cart clicks: mark the cart pending and write
+            # every pending cart as soon as the window is due. The page then
+            # posts to sync_cart when the window ends (trailing flush), and
+            # CartSyncMiddleware catches any later request.
+            pending = set(self.session.get('cart_sync_pending', []))
+            pending.add(str(restaurant.id))
+            self.session['cart_sync_pending'] = sorted(pending)
+            self.flush_pending_sync()
+            return
+
+        self._write_saved_cart(restaurant.id)
+
+    def flush_pending_sync(self, force=False):
+        """Write saved carts whose sync was deferred by CART_SYNC_DEBOUNCE"""
+        pending = self.session.get('cart_sync_pending')
+        if not pending or not self.user or not self.user.is_authenticated:
+            return
+        if not force and pending_sync_delay(self.session):
+            return
+
+        self.session.pop('cart_sync_pending', None)
+        self.session['cart_synced_at'] = time.time()
+        for restaurant_id in pending:
+            self._write_saved_cart(int(restaurant_id))
+
+    def _write_saved_cart(self, restaurant_id):
+        """Upsert changed lines and delete removed ones instead of rewriting the cart"""
         from orders.models import SavedCart, SavedCartItem
         from restaurants.models import MenuItem
 
         try:
-            restaurant_id = str(restaurant.id)
-            subcart = self.cart.get(restaurant_id, {})
+            subcart = self.cart.get(str(restaurant_id), {})
+
+            # Delete saved cart if empty
+            if not subcart:
+                SavedCart.objects.filter(customer=self.user, restaurant_id=restaurant_id).delete()
+                return
 
             # Get or create saved cart for this user/restaurant
             saved_cart, created = SavedCart.objects.get_or_create(
                 customer=self.user,
-                restaurant=restaurant
+                restaurant_id=restaurant_id
             )
 
-            # Clear existing items and re-add
-            saved_cart.items.all().delete()
-
-            # Add current cart items
-            for item_id, item_data in subcart.items():
-                try:
-                    menu_item = MenuItem.objects.get(id=int(item_id))
-                    SavedCartItem.objects.create(
-                        cart=saved_cart,
-                        menu_item=menu_item,
-                        quantity=item_data['quantity'],
-                        special_requests=item_data.get('special_requests', '')
-                    )
-                except MenuItem.DoesNotExist:
-                    pass
+            wanted = {
+                int(item_id): (item_data['quantity'], item_data.get('special_requests', ''))
+                for item_id, item_data in subcart.items()
+            }
+            existing = {}
+            if not created:
+                existing = {
+                    menu_item_id: (quantity, special_requests)
+                    for menu_item_id, quantity, special_requests
+                    in saved_cart.items.values_list('menu_item_id', 'quantity', 'special_requests')
+                }
+
+            changed = [pk for pk, line in wanted.items() if existing.get(pk) != line]
+            new_ids = [pk for pk in changed if pk not in existing]
+            if new_ids:
+                # Skip lines whose menu item has since been deleted
+                missing = set(new_ids) - set(MenuItem.objects.filter(pk__in=new_ids).values_list('pk', flat=True))
+                changed = [pk for pk in changed if pk not in missing]
+
+            if changed:
+                SavedCartItem.objects.bulk_create(
+                    [
+                        SavedCartItem(
+                            cart=saved_cart,
+                            menu_item_id=pk,
+                            quantity=wanted[pk][0],
+                            special_requests=wanted[pk][1],
+                        )
+                        for pk in changed
+                    ],
+                    update_conflicts=True,
+                    unique_fields=['cart', 'menu_item'],
+                    update_fields=['quantity', 'special_requests'],
+                )
 
-            # Delete saved cart if empty
-            if saved_cart.items.count() == 0:
+            removed = set(existing) - set(wanted)
+            if removed:
+                saved_cart.items.filter(menu_item_id__in=removed).delete()
+
+            if not changed and not (set(existing) - removed):
                 saved_cart.delete()
 
         except Exception as e:
-            print(f"Cart sync error: {e}")
+            logger.exception(f"Cart sync error: {e}")
 
     def _clear_database_cart(self):
         """Clear the database cart for active restaurant"""
@@ -184,7 +280,7 @@ class Cart:
                     restaurant_id=int(restaurant_id)
                 ).delete()
         except Exception as e:
-            print(f"Cart clear error: {e}")
+            logger.exception(f"Cart clear error: {e}")
 
     def get_total_price(self):
         rid = self._active_restaurant_id()
@@ -203,6 +299,13 @@ class Cart:
     def get_restaurant_id(self):
         return self._active_restaurant_id()
 
+    @property
+    def reservation_key(self):
+        """Identifies this cart's stock reservations (see restaurants.stock)"""
+        if self.user:
+            return f"user:{self.user.pk}"
+        return f"session:{self.session.session_key}"
+
     def __iter__(self):
         rid = self._active_restaurant_id()
         if not rid:
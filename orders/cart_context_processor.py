@@ -1,3 +1,6 @@
+from .cart import pending_sync_delay
+
+
 def cart_context(request):
     cart = request.session.get('cart', {})
     total_items = 0
@@ -7,5 +10,7 @@ def cart_context(request):
     return {
         'cart_total_items': total_items,
         'session_cart': cart,
-        'current_cart_restaurant': request.session.get('current_cart_restaurant')
+        'current_cart_restaurant': request.session.get('current_cart_restaurant'),
+        # base.html schedules the trailing SavedCart sync from this
+        'cart_sync_in': pending_sync_delay(request.session),
     }
@@ -0,0 +1,109 @@
+"""
+Checkout helpers shared by cash/transfer checkout and the Paystack flow.
+
+The cart's menu items are loaded with one in_bulk query and order lines are
+written with bulk_create. Stock-tracked items are re-read with
+select_for_update and taken out of stock with one conditional UPDATE
+(restaurants/stock.py), so two concurrent checkouts cannot both buy the last
+portions. Stock the cart already reserved is counted towards the order.
+Call these inside transaction.atomic().
+
+An order that took stock is flagged holds_stock. Cancelling it
+(orders/transitions.py) calls release_stock(), which puts the stock back
+and clears the flag, so it happens at most once per order and never for
+orders placed before checkout took stock.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+
+from restaurants import stock
+from restaurants.models import MenuItem
+
+from .models import Order, OrderItem
+from .rollups import record_order_items
+
+
+class CheckoutError(Exception):
+    """Raised when the cart can no longer be ordered as it is"""
+
+
+def lock_cart_menu_items(cart_items, cart_key=None):
+    """Load and validate the cart's menu items, locking stock-tracked rows.
+
+    Returns a dict of menu item id -> MenuItem. Raises CheckoutError if an
+    item was removed, disabled or does not have enough stock left.
+    """
+    held = stock.held_quantities(cart_key) if cart_key else {}
+    quantities = {int(item['menu_item_id']): item['quantity'] for item in cart_items}
+    menu_items = MenuItem.objects.in_bulk(list(quantities))
+
+    tracked_ids = [pk for pk, menu_item in menu_items.items() if menu_item.track_stock]
+    if tracked_ids:
+        # Re-read tracked rows under a row lock so the stock we check is current
+        menu_items.update(MenuItem.objects.select_for_update().in_bulk(tracked_ids))
+
+    for pk, quantity in quantities.items():
+        menu_item = menu_items.get(pk)
+        if menu_item is None:
+            raise CheckoutError("An item in your cart is no longer on the menu. Please update your cart.")
+        if not menu_item.track_stock:
+            if not menu_item.is_available:
+                raise CheckoutError(f"{menu_item.name} is no longer available. Please update your cart.")
+            continue
+        available = menu_item.stock_quantity + held.get(pk, 0)
+        if available < quantity:
+            raise CheckoutError(f"Only {available} {menu_item.name} left. Please update your cart.")
+    return menu_items
+
+
+def create_order_items(order, cart_items, menu_items, cart_key=None):
+    """Insert all order lines in one query and take tracked items out of stock"""
+    order_items = []
+    needed = {}
+    for item in cart_items:
+        menu_item = menu_items[int(item['menu_item_id'])]
+        order_items.append(OrderItem(
+            order=order,
+            menu_item=menu_item,
+            quantity=item['quantity'],
+            price=Decimal(str(item['price'])),
+            special_requests=item['special_requests'],
+        ))
+        if menu_item.track_stock:
+            needed[menu_item.pk] = item['quantity']
+
+    ordered_ids = [int(item['menu_item_id']) for item in cart_items]
+    held = stock.consume(cart_key, ordered_ids) if cart_key else {}
+    # Hand back anything the cart held beyond what it is ordering
+    stock.add_stock_batch({pk: quantity - needed.get(pk, 0) for pk, quantity in held.items()})
+    try:
+        stock.reduce_stock_batch({pk: quantity - held.get(pk, 0) for pk, quantity in needed.items()})
+    except stock.InsufficientStock as e:
+        raise CheckoutError(f"{e}. Please update your cart.")
+    if needed:
+        order.holds_stock = True
+        Order.objects.filter(pk=order.pk).update(holds_stock=True)
+    order_items = OrderItem.objects.bulk_create(order_items)
+    # bulk_create sends no signals, so count the lines towards analytics here
+    record_order_items(order, order_items)
+    return order_items
+
+
+def release_stock(order_ids):
+    """Put tracked stock back for orders that will not go ahead; returns items restocked"""
+    with transaction.atomic():
+        holding = list(
+            Order.objects.select_for_update().filter(pk__in=list(order_ids), holds_stock=True).values_list('pk', flat=True)
+        )
+        if not holding:
+            return 0
+        Order.objects.filter(pk__in=holding).update(holds_stock=False)
+        quantities = dict(
+            OrderItem.objects.filter(order_id__in=holding, menu_item__track_stock=True)
+            .values('menu_item_id')
+            .annotate(total=Sum('quantity'))
+            .values_list('menu_item_id', 'total')
+        )
+        return stock.add_stock_batch(quantities)
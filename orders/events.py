@@ -0,0 +1,283 @@
+"""
+Live order events for the staff dashboard.
+
+Saving an order publishes a small event (order id, new and previous
+status) on the restaurant's channel once the transaction commits. The
+staff dashboard's Server-Sent Events stream (restaurants.views
+.staff_order_events) subscribes to that channel, so new tickets and status
+changes reach the kitchen without reloading the page. Bulk status changes
+(orders/transitions.py) publish one event listing every order they moved.
+
+The broker is chosen by settings.ORDER_EVENTS_BROKER. The default
+DatabaseBroker writes events to the OrderEvent table and every process
+polls it, so events published by one web worker, or by the Procfile's
+``events`` process, reach streams held open by any other. InProcessBroker
+skips the table and only reaches streams in the same process, which is
+enough for a single ASGI worker. Any class with the same
+publish()/subscribe() interface (Redis pub/sub, Postgres LISTEN/NOTIFY,
+...) can replace them.
+"""
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Order, OrderEvent
+
+logger = logging.getLogger(__name__)
+
+# Events a slow subscriber may fall behind by before it starts losing them
+SUBSCRIBER_QUEUE_SIZE = 100
+# Recent events kept per channel for streams that reconnect
+HISTORY_SIZE = 50
+# Seconds DatabaseBroker keeps re-reading, for rows whose insert committed
+# after a row with a higher id
+LATE_COMMIT_WINDOW = 5
+
+
+def restaurant_channel(restaurant_id):
+    return f'restaurant:{restaurant_id}'
+
+
+class Subscription:
+    """Events published on one channel after subscribing, for one consumer"""
+
+    def __init__(self, broker, channel, loop=None):
+        self.broker = broker
+        self.channel = channel
+        self.loop = loop or asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        # Event ids already queued by a replay
+        self.replayed = set()
+
+    def deliver(self, event):
+        """Called from any thread"""
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.warning('Dropping order event for a slow subscriber on %s', self.channel)
+
+    async def get(self, timeout=None):
+        """Next event, or None if nothing arrives within ``timeout`` seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """Fan-out to subscribers living in this process.
+
+    Each event gets an increasing id, and the last few per channel are kept
+    so a reconnecting stream can resume from its Last-Event-ID.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._last_id = 0
+        self._subscribers = defaultdict(set)
+        self._history = defaultdict(lambda: deque(maxlen=HISTORY_SIZE))
+
+    def publish(self, channel, event):
+        with self._lock:
+            event = {**event, 'id': next(self._ids)}
+            self._last_id = event['id']
+            self._history[channel].append(event)
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(event)
+
+    def subscribe(self, channel, after=None, loop=None):
+        """Subscribe to ``channel``, replaying kept events with an id above ``after``.
+
+        Events are delivered to ``loop``, by default the running one. Returns
+        None when ``after`` is newer than anything this broker has published
+        (it restarted since), meaning the caller has to resync from scratch.
+        """
+        subscription = Subscription(self, channel, loop)
+        with self._lock:
+            if after is not None and after > self._last_id:
+                return None
+            if after is not None:
+                for event in self._history.get(channel, ()):
+                    if event['id'] > after:
+                        subscription.queue.put_nowait(event)
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+
+class DatabaseBroker(InProcessBroker):
+    """Events stored in the OrderEvent table, so every process sees them.
+
+    publish() inserts a row. While a process has subscribers, a daemon
+    thread polls the table every ORDER_EVENTS_POLL_INTERVAL seconds and fans
+    new rows out in-process. Reconnecting streams replay from the table, and
+    rows older than ORDER_EVENTS_RETENTION seconds are pruned.
+    """
+
+    def __init__(self):
+        super().__init__()
+        # 0 disables the thread; call poll() yourself
+        self.poll_interval = getattr(settings, 'ORDER_EVENTS_POLL_INTERVAL', 1.0)
+        self.retention = getattr(settings, 'ORDER_EVENTS_RETENTION', 3600)
+        self._cursor = None
+        self._seen = deque(maxlen=1000)
+        self._poller = None
+        self._pruned_at = 0.0
+
+    def publish(self, channel, event):
+        OrderEvent.objects.create(channel=channel, payload=event)
+
+    def subscribe(self, channel, after=None, loop=None):
+        """Like InProcessBroker.subscribe, replaying from the table. Queries the database."""
+        subscription = Subscription(self, channel, loop)
+        with self._lock:
+            if self._cursor is None or after is not None:
+                bounds = OrderEvent.objects.aggregate(oldest=Min('id'), newest=Max('id'))
+            if self._cursor is None:
+                self._start_cursor(bounds['newest'] or 0)
+            if after is not None:
+                if after > (bounds['newest'] or 0) or after + 1 < (bounds['oldest'] or after + 1):
+                    # Pruned, or from before the table was reset
+                    return None
+                replay = list(
+                    OrderEvent.objects.filter(channel=channel, id__gt=after, id__lte=self._cursor)
+                    .order_by('id')[:SUBSCRIBER_QUEUE_SIZE + 1]
+                )
+                if len(replay) > SUBSCRIBER_QUEUE_SIZE:
+                    return None
+                for row in replay:
+                    subscription.queue.put_nowait(self._event(row))
+                    subscription.replayed.add(row.pk)
+            self._subscribers[channel].add(subscription)
+        self._ensure_poller()
+        return subscription
+
+    @staticmethod
+    def _event(row):
+        return {**row.payload, 'id': row.pk}
+
+    def _start_cursor(self, newest):
+        self._cursor = newest
+        self._seen.clear()
+        recent = OrderEvent.objects.filter(created_at__gte=timezone.now() - timedelta(seconds=LATE_COMMIT_WINDOW))
+        self._seen.extend(recent.values_list('pk', flat=True))
+
+    def _ensure_poller(self):
+        if self.poll_interval <= 0:
+            return
+        with self._lock:
+            if self._poller is None or not self._poller.is_alive():
+                self._poller = threading.Thread(target=self._run, name='order-events', daemon=True)
+                self._poller.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_interval)
+            close_old_connections()
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Could not poll order events: {e}")
+
+    def poll(self):
+        """Hand rows published since the last poll to this process's subscribers"""
+        with self._lock:
+            if not self._subscribers:
+                # Start again from the newest row when someone subscribes
+                self._cursor = None
+                return 0
+            cursor = self._cursor
+        recent = timezone.now() - timedelta(seconds=LATE_COMMIT_WINDOW)
+        rows = list(OrderEvent.objects.filter(Q(id__gt=cursor) | Q(created_at__gte=recent)).order_by('id'))
+
+        delivered = 0
+        with self._lock:
+            seen = set(self._seen)
+            for row in rows:
+                if row.pk in seen:
+                    continue
+                self._seen.append(row.pk)
+                self._cursor = max(self._cursor or 0, row.pk)
+                event = self._event(row)
+                for subscription in self._subscribers.get(row.channel, ()):
+                    if row.pk not in subscription.replayed:
+                        subscription.deliver(event)
+                        delivered += 1
+        self._prune()
+        return delivered
+
+    def _prune(self):
+        now = time.monotonic()
+        if now - self._pruned_at < 60:
+            return
+        self._pruned_at = now
+        OrderEvent.objects.filter(created_at__lt=timezone.now() - timedelta(seconds=self.retention)).delete()
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(getattr(settings, 'ORDER_EVENTS_BROKER', 'orders.events.DatabaseBroker'))()
+
+
+def publish_order_event(order, previous_status=None, created=False):
+    """Announce a new order or a status change once the transaction commits"""
+    event = {
+        'type': 'created' if created else 'status',
+        'order_id': order.pk,
+        'status': order.status,
+        'status_display': order.get_status_display(),
+        'previous_status': previous_status,
+    }
+    channel = restaurant_channel(order.restaurant_id)
+    transaction.on_commit(lambda: _publish(channel, event))
+
+
+def publish_order_events(restaurant_id, changes):
+    """Announce many status changes at one restaurant as a single event.
+
+    ``changes`` is a list of (order id, previous status, new status).
+    """
+    labels = dict(Order.STATUS_CHOICES)
+    event = {
+        'type': 'bulk',
+        'orders': [
+            {'order_id': pk, 'status': new, 'status_display': labels.get(new, new), 'previous_status': previous}
+            for pk, previous, new in changes
+        ],
+    }
+    channel = restaurant_channel(restaurant_id)
+    transaction.on_commit(lambda: _publish(channel, event))
+
+
+def _publish(channel, event):
+    try:
+        get_broker().publish(channel, event)
+    except Exception as e:
+        # A live-update hiccup must never fail the order itself
+        logger.error(f"Could not publish order event on {channel}: {e}")
@@ -0,0 +1,69 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from orders.models import Order
+from orders.stats import OwnerStats
+
+
+def legacy_owner_stats(owner):
+    """The per-metric queries restaurant_dashboard used to run, kept for comparison"""
+    today = timezone.now().date()
+    first_day_of_month = today.replace(day=1)
+    orders = Order.objects.filter(restaurant__owner=owner)
+    revenue = orders.filter(status__in=['confirmed', 'completed'])
+    return {
+        'total_orders': orders.count(),
+        'pending_orders': orders.filter(status='pending').count(),
+        'revenue_orders': revenue.count(),
+        'total_revenue': revenue.aggregate(Sum('total_price'))['total_price__sum'] or 0,
+        'today_orders': orders.filter(created_at__date=today).count(),
+        'today_revenue': revenue.filter(created_at__date=today).aggregate(Sum('total_price'))['total_price__sum'] or 0,
+        'monthly_revenue': revenue.filter(created_at__date__gte=first_day_of_month).aggregate(Sum('total_price'))['total_price__sum'] or 0,
+        'monthly_orders': orders.filter(created_at__date__gte=first_day_of_month).count(),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Compare query counts and timings of the legacy owner dashboard stats against OwnerStats'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', help='Username of the restaurant owner to benchmark (default: all owners)')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per implementation (default: 5)')
+
+    def _measure(self, func, repeat):
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                result = func()
+            elapsed = (time.perf_counter() - start) / repeat
+        return result, len(ctx.captured_queries) // repeat, elapsed * 1000
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        owners = User.objects.filter(role='restaurant_owner')
+        if options['owner']:
+            owners = owners.filter(username=options['owner'])
+            if not owners.exists():
+                raise CommandError(f'No restaurant owner named "{options["owner"]}"')
+
+        repeat = max(options['repeat'], 1)
+        for owner in owners:
+            legacy, legacy_queries, legacy_ms = self._measure(lambda: legacy_owner_stats(owner), repeat)
+            current, current_queries, current_ms = self._measure(lambda: OwnerStats(owner).summary(), repeat)
+
+            mismatched = [key for key, value in legacy.items() if value != current[key]]
+            self.stdout.write(
+                f'{owner.username}: legacy {legacy_queries} queries / {legacy_ms:.2f}ms, '
+                f'OwnerStats {current_queries} queries / {current_ms:.2f}ms '
+                f'({current["total_orders"]} orders)'
+            )
+            if mismatched:
+                self.stdout.write(self.style.ERROR(f'  Mismatched values: {", ".join(mismatched)}'))
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete.'))
@@ -0,0 +1,99 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from core.date_ranges import on_day
+from core.notification_counters import _compute_platform_counters
+from core.pagination import KeysetPaginator
+from orders.models import Order
+from orders.stats import OwnerStats
+from restaurants.models import Restaurant
+
+# Plan fragments meaning the orders table itself is read in full
+FULL_SCAN_MARKERS = ('SCAN orders_order', 'Seq Scan on orders_order', 'type: ALL')
+
+
+def _is_full_scan(line):
+    # Walking a covering index reads no table rows, so it is not flagged
+    return any(marker in line for marker in FULL_SCAN_MARKERS) and 'COVERING INDEX' not in line
+
+
+class _Recorder:
+    """Execute wrapper that remembers every statement a callable runs"""
+
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.statements.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = 'Print EXPLAIN plans for the hottest dashboard/order queries to verify index usage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', help='Restaurant owner username (default: first owner with a restaurant)')
+        parser.add_argument('--customer', help='Customer username (default: first customer with an order)')
+
+    def _hot_queries(self, owner, customer, restaurant):
+        today = timezone.now().date()
+        restaurants = Restaurant.objects.filter(owner=owner)
+        return [
+            ('Owner dashboard summary', lambda: OwnerStats(owner).summary()),
+            ("Owner today's orders", lambda: list(
+                Order.objects.filter(on_day('created_at', today), restaurant__in=restaurants)
+                .select_related('restaurant', 'customer').order_by('-created_at')
+            )),
+            ('Restaurant pending queue', lambda: list(
+                Order.objects.filter(restaurant=restaurant, status='pending').order_by('-created_at')[:20]
+            )),
+            ("Customer's orders at a restaurant", lambda: list(
+                Order.objects.filter(customer=customer, restaurant=restaurant).order_by('-created_at')[:5]
+            )),
+            ('Owner order history (first page)', lambda: KeysetPaginator(
+                Order.objects.filter(restaurant__owner=owner)
+            ).get_page()),
+            ('Navbar platform counters', _compute_platform_counters),
+        ]
+
+    def _explain(self, sql, params):
+        prefix = connection.ops.explain_query_prefix()
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            return [' | '.join(str(column) for column in row) for row in cursor.fetchall()]
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        owners = User.objects.filter(role='restaurant_owner', restaurant__isnull=False)
+        customers = User.objects.filter(role='customer', order__isnull=False)
+        if options['owner']:
+            owners = owners.filter(username=options['owner'])
+        if options['customer']:
+            customers = customers.filter(username=options['customer'])
+        owner, customer = owners.first(), customers.first()
+        if owner is None or customer is None:
+            raise CommandError('Need a restaurant owner with a restaurant and a customer with an order')
+        restaurant = Restaurant.objects.filter(owner=owner).first()
+
+        full_scans = 0
+        for label, run in self._hot_queries(owner, customer, restaurant):
+            recorder = _Recorder()
+            with connection.execute_wrapper(recorder):
+                run()
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f'== {label}'))
+            for sql, params in recorder.statements:
+                self.stdout.write(f'  {sql}')
+                for line in self._explain(sql, params):
+                    if _is_full_scan(line):
+                        full_scans += 1
+                        self.stdout.write(self.style.ERROR(f'    {line}'))
+                    else:
+                        self.stdout.write(f'    {line}')
+
+        if full_scans:
+            self.stdout.write(self.style.WARNING(f'{full_scans} plan step(s) scan the whole orders table.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Every hot query uses an index on orders.'))
@@ -0,0 +1,26 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the analytics rollup tables from orders, order items and payments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only rebuild days from this date (YYYY-MM-DD) onwards')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since must be a date like 2024-01-31')
+
+        written = rebuild_rollups(since)
+        for table, rows in written.items():
+            self.stdout.write(f'{table}: {rows} rows')
+        scope = f'since {since}' if since else 'from scratch'
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt analytics rollups {scope}.'))
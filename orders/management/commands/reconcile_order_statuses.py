@@ -1,20 +1,21 @@
 from django.core.management.base import BaseCommand
 from orders.models import Order
+from orders.transitions import bulk_transition
 
 
 class Command(BaseCommand):
-    help = 'Reconcile orders: if payment_status is confirmed and order.status is pending/awaiting_confirmation, set status to confirmed'
+    help = 'Reconcile orders: if payment_status is confirmed and order.status is pending/awaiting_confirmation, move the order on (paid orders complete)'
 
     def handle(self, *args, **options):
         qs = Order.objects.filter(payment_status='confirmed', status__in=['pending', 'awaiting_confirmation'])
-        count = qs.count()
-        if count == 0:
+        result = bulk_transition(qs, 'confirmed', reason='reconcile_order_statuses')
+        if not result.updated:
             self.stdout.write(self.style.SUCCESS('No orders to reconcile.'))
             return
-        for o in qs:
-            old = o.status
-            o.status = 'confirmed'
-            o.save()
-            self.stdout.write(f'Updated Order #{o.id}: {old} -> confirmed')
+        for (old, new), count in sorted(result.counts().items()):
+            self.stdout.write(f'{old} -> {new}: {count} order(s)')
+        if options['verbosity'] > 1:
+            for order_id, (old, new) in sorted(result.changed.items()):
+                self.stdout.write(f'Updated Order #{order_id}: {old} -> {new}')
 
-        self.stdout.write(self.style.SUCCESS(f'Reconciled {count} orders.'))
+        self.stdout.write(self.style.SUCCESS(f'Reconciled {result.updated} orders.'))
@@ -0,0 +1,15 @@
+from .cart import Cart
+
+
+class CartSyncMiddleware:
+    """Flush SavedCart writes deferred by CART_SYNC_DEBOUNCE on any request after the window"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        session = getattr(request, 'session', None)
+        if session is not None and session.get('cart_sync_pending') and request.user.is_authenticated:
+            Cart(request).flush_pending_sync()
+        return response
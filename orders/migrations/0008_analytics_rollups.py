@@ -0,0 +1,73 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('restaurants', '0009_stockreservation'),
+        ('orders', '0007_order_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyMenuItemStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='restaurants.menuitem')),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_item_stats', to='restaurants.restaurant')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CustomerRestaurantStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_count', models.IntegerField(default=0)),
+                ('first_order_at', models.DateTimeField()),
+                ('last_order_at', models.DateTimeField()),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='restaurant_stats', to=settings.AUTH_USER_MODEL)),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='customer_stats', to='restaurants.restaurant')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyRestaurantStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('awaiting_confirmation', 'Awaiting Payment Confirmation'), ('confirmed', 'Confirmed'), ('preparing', 'Preparing'), ('ready', 'Ready for Pickup'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], max_length=25)),
+                ('order_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='restaurants.restaurant')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'status'], name='daily_rest_stats_day_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrestaurantstats',
+            constraint=models.UniqueConstraint(fields=('restaurant', 'day', 'status'), name='daily_restaurant_stats_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='dailymenuitemstats',
+            index=models.Index(fields=['restaurant', 'day'], name='daily_item_stats_rest_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailymenuitemstats',
+            constraint=models.UniqueConstraint(fields=('menu_item', 'day'), name='daily_item_stats_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='customerrestaurantstats',
+            index=models.Index(fields=['restaurant', 'last_order_at'], name='customer_stats_last_order_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='customerrestaurantstats',
+            constraint=models.UniqueConstraint(fields=('restaurant', 'customer'), name='customer_restaurant_stats_uniq'),
+        ),
+    ]
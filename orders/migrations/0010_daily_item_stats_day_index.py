@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_order_status_history'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dailymenuitemstats',
+            index=models.Index(fields=['day', 'menu_item'], name='daily_item_stats_day_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_daily_item_stats_day_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='holds_stock',
+            field=models.BooleanField(default=False),
+        ),
+    ]
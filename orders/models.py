@@ -38,8 +38,9 @@ class Order(models.Model):
         ('failed', 'Failed'),
     )
     
-    customer = models.ForeignKey(User, on_delete=models.CASCADE, limit_choices_to={'role': 'customer'})
-    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE)
+    # No single-column indexes: the composite indexes below lead with these columns
+    customer = models.ForeignKey(User, on_delete=models.CASCADE, limit_choices_to={'role': 'customer'}, db_index=False)
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, db_index=False)
     status = models.CharField(max_length=25, choices=STATUS_CHOICES, default='pending')
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     special_instructions = models.TextField(blank=True)
@@ -54,12 +55,32 @@ class Order(models.Model):
     customer_name = models.CharField(max_length=100)
     customer_phone = models.CharField(max_length=15)
     customer_email = models.EmailField()
+
+    # True while stock-tracked items are out of stock on this order's behalf
+    # (set by checkout, cleared when cancelling puts the stock back)
+    holds_stock = models.BooleanField(default=False)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination (core/pagination.py) walks (created_at, id) per customer/restaurant.
+            # status and total_price also make the restaurant one cover the owner dashboard
+            # aggregates (counts and revenue by date) without touching the table.
+            models.Index(fields=['customer', '-created_at', '-id'], name='order_customer_keyset_idx'),
+            models.Index(
+                fields=['restaurant', '-created_at', '-id', 'status', 'total_price'], name='order_rest_keyset_cover_idx',
+            ),
+            models.Index(fields=['-created_at', '-id'], name='order_keyset_idx'),
+            # Status lists per restaurant (kitchen view, pending queues, bulk updates)
+            models.Index(fields=['restaurant', 'status', 'created_at'], name='order_rest_status_created_idx'),
+            # A customer's orders at one restaurant (restaurant page, ajax history)
+            models.Index(fields=['customer', 'restaurant', 'created_at'], name='order_cust_rest_created_idx'),
+            # Platform-wide status counts and reconciliation sweeps
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} - {self.restaurant.name}"
@@ -82,6 +103,29 @@ class OrderItem(models.Model):
         return f"{self.quantity} x {self.menu_item.name}"
 
 
+class OrderStatusHistory(models.Model):
+    """One row per order status change, written by orders/transitions.py"""
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='status_history')
+    # Empty for the row recording the status an order was placed with
+    from_status = models.CharField(max_length=25, blank=True)
+    to_status = models.CharField(max_length=25, choices=Order.STATUS_CHOICES)
+    payment_status = models.CharField(max_length=25, choices=Order.PAYMENT_STATUS_CHOICES)
+    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    # What made the change: a view, the webhook processor, a command, ...
+    source = models.CharField(max_length=50, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        verbose_name_plural = 'order status history'
+        indexes = [
+            models.Index(fields=['order', 'created_at'], name='order_history_timeline_idx'),
+        ]
+
+    def __str__(self):
+        return f"Order #{self.order_id}: {self.from_status or 'new'} -> {self.to_status}"
+
+
 # Persistent Cart Model for Admin Visibility
 class SavedCart(models.Model):
     """Persistent cart stored in database for admin tracking"""
@@ -153,4 +197,82 @@ class Review(models.Model):
         return f"Review for {self.restaurant.name} by {self.customer.username}"
     
     def get_rating_stars(self):
-        return '⭐' * self.rating   
\ No newline at end of file
+        return '⭐' * self.rating   
+
+# Analytics rollups, kept in step with orders by orders/rollups.py
+class DailyRestaurantStats(models.Model):
+    """Orders of one restaurant placed on one day that are currently in one status"""
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField()
+    status = models.CharField(max_length=25, choices=Order.STATUS_CHOICES)
+    order_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['restaurant', 'day', 'status'], name='daily_restaurant_stats_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['day', 'status'], name='daily_rest_stats_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.restaurant_id} {self.day} {self.status}: {self.order_count}"
+
+
+class DailyMenuItemStats(models.Model):
+    """Units of one menu item ordered on one day"""
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='daily_item_stats')
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField()
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['menu_item', 'day'], name='daily_item_stats_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['restaurant', 'day'], name='daily_item_stats_rest_idx'),
+            # Platform-wide top sellers (core/home_feeds.py)
+            models.Index(fields=['day', 'menu_item'], name='daily_item_stats_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.menu_item_id} {self.day}: {self.quantity}"
+
+
+class CustomerRestaurantStats(models.Model):
+    """How often one customer has ordered from one restaurant"""
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='customer_stats')
+    customer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='restaurant_stats')
+    order_count = models.IntegerField(default=0)
+    first_order_at = models.DateTimeField()
+    last_order_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['restaurant', 'customer'], name='customer_restaurant_stats_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['restaurant', 'last_order_at'], name='customer_stats_last_order_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.customer_id} @ {self.restaurant_id}: {self.order_count}"
+
+
+class OrderEvent(models.Model):
+    """A published staff dashboard event, read by every process (orders/events.py)"""
+    channel = models.CharField(max_length=50)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Replaying one channel after a Last-Event-ID
+            models.Index(fields=['channel', 'id'], name='order_event_channel_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.channel} #{self.pk}"
@@ -0,0 +1,314 @@
+"""
+Pre-aggregated analytics tables.
+
+The analytics dashboards used to group every Order, OrderItem and Payment
+by day on each request. They now read small rollup tables instead, so
+their cost grows with the number of days shown, not the number of orders:
+
+- DailyRestaurantStats: orders and revenue per restaurant, day and status
+- DailyPaymentStats: payments per restaurant, day and status
+- DailyMenuItemStats: units sold and revenue per menu item and day
+- CustomerRestaurantStats: order count and first/last order per customer
+
+The rows are updated as orders and payments are created, change status or
+are deleted (orders/signals.py, payments/signals.py). Checkout records
+order lines explicitly because they are bulk-created. Bulk status changes
+must go through ORDER_ROLLUP / PAYMENT_ROLLUP.bulk_set_status() (for orders,
+via orders.transitions.bulk_transition) rather than queryset.update(). ``manage.py rebuild_rollups`` recomputes everything
+from the raw tables.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, DecimalField, F, Max, Min, Sum, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from core.date_ranges import since_day
+from payments.models import DailyPaymentStats, Payment
+
+from .models import CustomerRestaurantStats, DailyMenuItemStats, DailyRestaurantStats, Order, OrderItem
+
+# The stored (day, status, amount) of an instance has not been read
+_UNKNOWN = object()
+
+
+def local_day(value):
+    """Calendar day a timestamp falls on, as TruncDate would compute it"""
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.date()
+
+
+def _bump(model, keys, **deltas):
+    """Add ``deltas`` to the rollup row identified by ``keys``"""
+    changes = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(**keys).update(**changes):
+        return
+    if min(deltas.values()) < 0:
+        # Nothing to take away from: the day has not been backfilled yet
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**keys, **deltas)
+    except IntegrityError:
+        # Another request created the row first
+        model.objects.filter(**keys).update(**changes)
+
+
+class StatusRollup:
+    """Keeps a per restaurant/day/status rollup in step with one model.
+
+    pre_save reads the stored (day, status, amount) of the row being updated
+    with one narrow lookup (none for inserts, or for saves whose
+    update_fields leave those columns alone), so a save only touches the
+    rollup when one of them changed. Loading instances costs nothing extra.
+    """
+
+    def __init__(self, model, stats_model, restaurant_lookup, amount_field, count_field, total_field):
+        self.model = model
+        self.stats_model = stats_model
+        self.restaurant_lookup = restaurant_lookup
+        self.amount_field = amount_field
+        self.count_field = count_field
+        self.total_field = total_field
+        self.fields = ('created_at', 'status', amount_field)
+
+    def _state(self, instance):
+        return (local_day(instance.created_at), instance.status, getattr(instance, self.amount_field))
+
+    def _restaurant_id(self, instance):
+        if self.restaurant_lookup == 'restaurant_id':
+            return instance.restaurant_id
+        return instance.order.restaurant_id
+
+    def _apply(self, restaurant_id, state, sign):
+        day, status, amount = state
+        _bump(
+            self.stats_model,
+            {'restaurant_id': restaurant_id, 'day': day, 'status': status},
+            **{self.count_field: sign, self.total_field: sign * (amount or Decimal('0'))},
+        )
+
+    def prepare(self, instance, update_fields=None):
+        """pre_save: note what the stored row currently contributes"""
+        if instance._state.adding:
+            instance._rollup_state = None
+            return
+        if getattr(instance, '_rollup_state', _UNKNOWN) is not _UNKNOWN:
+            # Saved before through this instance, which left its state behind
+            return
+        if update_fields is not None and not set(self.fields) & set(update_fields):
+            instance._rollup_state = _UNKNOWN
+            return
+        row = self.model.objects.filter(pk=instance.pk).values(*self.fields).first()
+        instance._rollup_state = (local_day(row['created_at']), row['status'], row[self.amount_field]) if row else None
+
+    def stored_status(self, instance):
+        """Status read by prepare(), None for new rows"""
+        state = getattr(instance, '_rollup_state', None)
+        return state[1] if isinstance(state, tuple) else None
+
+    def saved(self, instance, created):
+        """post_save: move the instance between buckets if needed"""
+        old = None if created else getattr(instance, '_rollup_state', _UNKNOWN)
+        if old is _UNKNOWN:
+            return
+        new = self._state(instance)
+        if old != new:
+            restaurant_id = self._restaurant_id(instance)
+            if old is not None:
+                self._apply(restaurant_id, old, -1)
+            self._apply(restaurant_id, new, 1)
+        instance._rollup_state = new
+
+    def deleted(self, instance):
+        """post_delete: take the instance out of its bucket"""
+        try:
+            restaurant_id = self._restaurant_id(instance)
+        except ObjectDoesNotExist:
+            return
+        self._apply(restaurant_id, self._state(instance), -1)
+
+    def bulk_set_status(self, queryset, status, **extra):
+        """queryset.update(status=status, **extra) that keeps the rollup in step"""
+        with transaction.atomic():
+            pks = list(queryset.exclude(status=status).select_for_update().values_list('pk', flat=True))
+            buckets = list(
+                self.model.objects.filter(pk__in=pks)
+                .values('status', restaurant_ref=F(self.restaurant_lookup), day=TruncDate('created_at'))
+                .annotate(n=Count('id'), total=Sum(self.amount_field))
+                .order_by()
+            )
+            updated = queryset.update(status=status, **extra)
+            for bucket in buckets:
+                keys = {'restaurant_id': bucket['restaurant_ref'], 'day': bucket['day']}
+                total = bucket['total'] or Decimal('0')
+                _bump(self.stats_model, {**keys, 'status': bucket['status']},
+                      **{self.count_field: -bucket['n'], self.total_field: -total})
+                _bump(self.stats_model, {**keys, 'status': status},
+                      **{self.count_field: bucket['n'], self.total_field: total})
+        return updated
+
+    def rebuild(self, since=None):
+        """Recompute the rollup rows from ``since`` (a date) onwards, or all of them"""
+        rows = self.stats_model.objects.all()
+        source = self.model.objects.all()
+        if since:
+            rows = rows.filter(day__gte=since)
+            source = source.filter(since_day('created_at', since))
+        rows.delete()
+
+        buckets = (
+            source.values('status', restaurant_ref=F(self.restaurant_lookup), day=TruncDate('created_at'))
+            .annotate(n=Count('id'), total=Sum(self.amount_field))
+            .order_by()
+        )
+        return len(self.stats_model.objects.bulk_create([
+            self.stats_model(
+                restaurant_id=bucket['restaurant_ref'],
+                day=bucket['day'],
+                status=bucket['status'],
+                **{self.count_field: bucket['n'], self.total_field: bucket['total'] or Decimal('0')},
+            )
+            for bucket in buckets.iterator()
+        ], batch_size=500))
+
+
+ORDER_ROLLUP = StatusRollup(
+    Order, DailyRestaurantStats, 'restaurant_id', 'total_price', 'order_count', 'revenue',
+)
+PAYMENT_ROLLUP = StatusRollup(
+    Payment, DailyPaymentStats, 'order__restaurant_id', 'amount', 'payment_count', 'amount',
+)
+
+
+# ---------------------------------------------------------------------------
+# Order lines and customers
+# ---------------------------------------------------------------------------
+
+def record_order_items(order, order_items, sign=1):
+    """Count ``order_items`` (all belonging to ``order``) towards the item rollup.
+
+    Runs two queries however many lines the order has: one insert for
+    missing rows and one UPDATE with a CASE per menu item.
+    """
+    day = local_day(order.created_at)
+    totals = defaultdict(lambda: [0, Decimal('0')])
+    for item in order_items:
+        totals[item.menu_item_id][0] += item.quantity
+        totals[item.menu_item_id][1] += item.quantity * item.price
+    if not totals:
+        return
+
+    if sign > 0:
+        DailyMenuItemStats.objects.bulk_create([
+            DailyMenuItemStats(restaurant_id=order.restaurant_id, menu_item_id=menu_item_id, day=day)
+            for menu_item_id in totals
+        ], ignore_conflicts=True)
+
+    def per_item(field, index):
+        return Case(
+            *[When(menu_item_id=pk, then=F(field) + sign * values[index]) for pk, values in totals.items()],
+            default=F(field),
+        )
+
+    DailyMenuItemStats.objects.filter(day=day, menu_item_id__in=list(totals)).update(
+        quantity=per_item('quantity', 0), revenue=per_item('revenue', 1),
+    )
+
+
+def order_item_deleted(item):
+    order = Order.objects.filter(pk=item.order_id).only('restaurant_id', 'created_at').first()
+    if order is not None:
+        record_order_items(order, [item], sign=-1)
+
+
+def _customer_totals(orders):
+    return (
+        orders.values('restaurant_id', 'customer_id')
+        .annotate(order_count=Count('id'), first_order_at=Min('created_at'), last_order_at=Max('created_at'))
+        .order_by()
+    )
+
+
+def count_customer_order(order):
+    """Add a newly placed order to its customer's row"""
+    keys = {'restaurant_id': order.restaurant_id, 'customer_id': order.customer_id}
+    if CustomerRestaurantStats.objects.filter(**keys).update(
+        order_count=F('order_count') + 1, last_order_at=order.created_at,
+    ):
+        return
+    refresh_customer_stats(order.restaurant_id, order.customer_id)
+
+
+def refresh_customer_stats(restaurant_id, customer_id):
+    """Recompute one customer's row from their orders at the restaurant"""
+    totals = Order.objects.filter(restaurant_id=restaurant_id, customer_id=customer_id).aggregate(
+        order_count=Count('id'), first_order_at=Min('created_at'), last_order_at=Max('created_at'),
+    )
+    if not totals['order_count']:
+        CustomerRestaurantStats.objects.filter(restaurant_id=restaurant_id, customer_id=customer_id).delete()
+        return
+    CustomerRestaurantStats.objects.update_or_create(
+        restaurant_id=restaurant_id, customer_id=customer_id, defaults=totals,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Backfill
+# ---------------------------------------------------------------------------
+
+def rebuild_item_rollup(since=None):
+    rows = DailyMenuItemStats.objects.all()
+    items = OrderItem.objects.all()
+    if since:
+        rows = rows.filter(day__gte=since)
+        items = items.filter(since_day('order__created_at', since))
+    rows.delete()
+
+    buckets = (
+        items.values('menu_item_id', restaurant_ref=F('order__restaurant_id'), day=TruncDate('order__created_at'))
+        .annotate(
+            units=Sum('quantity'),
+            total=Sum(F('quantity') * F('price'), output_field=DecimalField(max_digits=12, decimal_places=2)),
+        )
+        .order_by()
+    )
+    return len(DailyMenuItemStats.objects.bulk_create([
+        DailyMenuItemStats(
+            restaurant_id=bucket['restaurant_ref'],
+            menu_item_id=bucket['menu_item_id'],
+            day=bucket['day'],
+            quantity=bucket['units'],
+            revenue=bucket['total'] or Decimal('0'),
+        )
+        for bucket in buckets.iterator()
+    ], batch_size=500))
+
+
+def rebuild_customer_rollup(since=None):
+    rows = CustomerRestaurantStats.objects.all()
+    orders = Order.objects.all()
+    if since:
+        # Customer rows span all time, so recompute every customer active since then
+        active = Order.objects.filter(since_day('created_at', since)).values('customer_id')
+        rows = rows.filter(customer_id__in=active)
+        orders = orders.filter(customer_id__in=active)
+    rows.delete()
+    return len(CustomerRestaurantStats.objects.bulk_create([
+        CustomerRestaurantStats(**totals) for totals in _customer_totals(orders).iterator()
+    ], batch_size=500))
+
+
+def rebuild_rollups(since=None):
+    """Recompute every rollup from the raw tables. Returns rows written per table."""
+    with transaction.atomic():
+        return {
+            'daily restaurant stats': ORDER_ROLLUP.rebuild(since),
+            'daily payment stats': PAYMENT_ROLLUP.rebuild(since),
+            'daily menu item stats': rebuild_item_rollup(since),
+            'customer stats': rebuild_customer_rollup(since),
+        }
@@ -1,11 +1,75 @@
-from django.db.models.signals import post_save
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from .models import Order
+from .cart import Cart
+from .events import publish_order_event
+from .models import Order, OrderItem
+from .rollups import (
+    ORDER_ROLLUP, count_customer_order, order_item_deleted, record_order_items, refresh_customer_stats,
+)
+from .transitions import record_change
 
 
+# Status history (orders/transitions.py records later changes)
 @receiver(post_save, sender=Order)
-def ensure_status_matches_payment(sender, instance, **kwargs):
-    """Ensure order.status is consistent with payment_status after save."""
-    if instance.payment_status == 'confirmed' and instance.status in ['pending', 'awaiting_confirmation', 'confirmed']:
-        instance.status = 'completed'
-        instance.save()
+def record_initial_status(sender, instance, created, **kwargs):
+    if created:
+        record_change(instance, '')
+
+
+# Analytics rollups (orders/rollups.py)
+@receiver(pre_save, sender=Order)
+def load_order_rollup_state(sender, instance, update_fields=None, **kwargs):
+    ORDER_ROLLUP.prepare(instance, update_fields)
+
+
+@receiver(post_save, sender=Order)
+def update_order_rollups(sender, instance, created, **kwargs):
+    ORDER_ROLLUP.saved(instance, created)
+    if created:
+        count_customer_order(instance)
+
+
+@receiver(post_delete, sender=Order)
+def remove_order_from_rollups(sender, instance, **kwargs):
+    ORDER_ROLLUP.deleted(instance)
+    refresh_customer_stats(instance.restaurant_id, instance.customer_id)
+
+
+@receiver(post_save, sender=OrderItem)
+def add_order_item_to_rollups(sender, instance, created, **kwargs):
+    # Checkout bulk-creates its lines and records them itself
+    if created:
+        record_order_items(instance.order, [instance])
+
+
+@receiver(post_delete, sender=OrderItem)
+def remove_order_item_from_rollups(sender, instance, **kwargs):
+    order_item_deleted(instance)
+
+
+# Live staff dashboard events (orders/events.py)
+@receiver(pre_save, sender=Order)
+def remember_published_status(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'status' not in update_fields:
+        instance._published_status = instance.__dict__.get('status')
+    else:
+        # Read by load_order_rollup_state above
+        instance._published_status = ORDER_ROLLUP.stored_status(instance)
+
+
+@receiver(post_save, sender=Order)
+def publish_order_status(sender, instance, created, **kwargs):
+    if 'status' not in instance.__dict__:
+        # Status was deferred and so not saved
+        return
+    previous = None if created else instance._published_status
+    if created or instance.status != previous:
+        publish_order_event(instance, previous, created)
+
+
+# Deferred SavedCart sync (orders/cart.py): logging out flushes the session
+@receiver(user_logged_out)
+def flush_cart_sync_on_logout(sender, request, user, **kwargs):
+    if request is not None and user is not None and request.session.get('cart_sync_pending'):
+        Cart(request).flush_pending_sync(force=True)
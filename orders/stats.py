@@ -0,0 +1,90 @@
+"""
+Order statistics for the owner and customer dashboards.
+
+OwnerStats and CustomerStats collapse the per-metric COUNT/SUM queries the
+dashboards used to run into a single conditional-aggregation query over
+the owner's or the customer's orders.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from core.date_ranges import between_days, on_day, since_day
+
+from .models import Order
+
+# Statuses counted as revenue on the owner dashboard (and as spent by customers)
+REVENUE_STATUSES = ('confirmed', 'completed')
+
+# Orders a customer is still waiting on
+OPEN_STATUSES = ('pending', 'awaiting_confirmation', 'confirmed', 'preparing', 'ready')
+
+
+class OwnerStats:
+    """Aggregated order stats across all restaurants of one owner.
+
+    ``owner`` may be a user instance or a user id. ``start_date`` and
+    ``end_date`` optionally restrict the orders to a date range (inclusive),
+    as used by the analytics time filters.
+    """
+
+    def __init__(self, owner, start_date=None, end_date=None):
+        self.owner = owner
+        self.start_date = start_date
+        self.end_date = end_date
+
+    def queryset(self):
+        orders = Order.objects.filter(restaurant__owner=self.owner)
+        if self.start_date:
+            orders = orders.filter(between_days('created_at', self.start_date, self.end_date or timezone.now().date()))
+        return orders
+
+    def summary(self):
+        """Return all dashboard counters computed in one query"""
+        today = timezone.now().date()
+        first_day_of_month = today.replace(day=1)
+        revenue = Q(status__in=REVENUE_STATUSES)
+        today_q = on_day('created_at', today)
+        month_q = since_day('created_at', first_day_of_month)
+
+        stats = self.queryset().aggregate(
+            total_orders=Count('id'),
+            pending_orders=Count('id', filter=Q(status='pending')),
+            completed_orders=Count('id', filter=Q(status='completed')),
+            revenue_orders=Count('id', filter=revenue),
+            total_revenue=Sum('total_price', filter=revenue),
+            today_orders=Count('id', filter=today_q),
+            today_revenue=Sum('total_price', filter=revenue & today_q),
+            monthly_orders=Count('id', filter=month_q),
+            monthly_revenue=Sum('total_price', filter=revenue & month_q),
+        )
+        for key in ('total_revenue', 'today_revenue', 'monthly_revenue'):
+            stats[key] = stats[key] or Decimal('0')
+        return stats
+
+
+class CustomerStats:
+    """Aggregated order stats of one customer, for the customer dashboard"""
+
+    def __init__(self, customer):
+        self.customer = customer
+
+    def summary(self):
+        """Return all dashboard counters computed in one query"""
+        first_day_of_month = timezone.now().date().replace(day=1)
+        spent = Q(status__in=REVENUE_STATUSES)
+
+        stats = Order.objects.filter(customer=self.customer).aggregate(
+            total_orders=Count('id'),
+            completed_orders=Count('id', filter=spent),
+            pending_orders=Count('id', filter=Q(status__in=OPEN_STATUSES)),
+            cancelled_orders=Count('id', filter=Q(status='cancelled')),
+            total_spent=Sum('total_price', filter=spent),
+            monthly_spent=Sum('total_price', filter=spent & since_day('created_at', first_day_of_month)),
+            recent_activity_count=Count('id', filter=Q(created_at__gte=timezone.now() - timedelta(days=7))),
+        )
+        for key in ('total_spent', 'monthly_spent'):
+            stats[key] = stats[key] or Decimal('0')
+        return stats
@@ -1,3 +1,282 @@
-from django.test import TestCase
+import asyncio
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import CustomUser
+from restaurants.models import Category, MenuItem, Restaurant
+from restaurants.stock import InsufficientStock
+
+from core.notification_counters import get_owner_counters
+
+from .events import DatabaseBroker
+from .models import DailyRestaurantStats, Order, OrderEvent, SavedCart
+from .stats import CustomerStats
+from .transitions import bulk_transition, transition
+
+
+@override_settings(CART_SYNC_DEBOUNCE=60)
+class CartSyncDebounceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        owner = CustomUser.objects.create_user('owner', 'owner@example.com', 'pw', role='restaurant_owner')
+        cls.customer = CustomUser.objects.create_user('customer', 'customer@example.com', 'pw', role='customer')
+        restaurant = Restaurant.objects.create(
+            owner=owner, name='Mama Put', slug='mama-put', address='1 Road', phone='080',
+            email='mama@example.com', opening_time='09:00', closing_time='21:00',
+        )
+        category = Category.objects.create(restaurant=restaurant, name='Mains')
+        cls.rice = MenuItem.objects.create(category=category, name='Jollof Rice', price=1500)
+        cls.plantain = MenuItem.objects.create(category=category, name='Plantain', price=500)
+
+    def setUp(self):
+        self.client.force_login(self.customer)
+
+    def add(self, item, quantity=1):
+        return self.client.post(
+            reverse('add_to_cart', args=[item.pk]), {'quantity': quantity}, HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        ).json()
+
+    def saved_lines(self):
+        cart = SavedCart.objects.filter(customer=self.customer).first()
+        return dict(cart.items.values_list('menu_item_id', 'quantity')) if cart else {}
+
+    def test_first_change_is_written_and_burst_is_deferred(self):
+        first = self.add(self.rice)
+        self.assertIsNone(first['cart_sync_in'])
+        self.assertEqual(self.saved_lines(), {self.rice.pk: 1})
+
+        second = self.add(self.plantain, 2)
+        self.assertGreater(second['cart_sync_in'], 0)
+        self.assertEqual(self.saved_lines(), {self.rice.pk: 1})
+
+    def test_trailing_flush_writes_deferred_change(self):
+        self.add(self.rice)
+        self.add(self.rice, 2)
+        self.assertEqual(self.saved_lines(), {self.rice.pk: 1})
+
+        self.client.post(reverse('sync_cart'))
+        self.assertEqual(self.saved_lines(), {self.rice.pk: 3})
+        self.assertNotIn('cart_sync_pending', self.client.session)
+
+    def test_later_request_flushes_once_window_is_due(self):
+        self.add(self.rice)
+        self.add(self.plantain)
+        session = self.client.session
+        session['cart_synced_at'] -= 61
+        session.save()
+
+        self.client.get(reverse('ajax_cart_total_count'))
+        self.assertEqual(self.saved_lines(), {self.rice.pk: 1, self.plantain.pk: 1})
+
+    def test_logout_flushes_deferred_change(self):
+        self.add(self.rice)
+        self.add(self.plantain)
+        self.client.logout()
+        self.assertEqual(self.saved_lines(), {self.rice.pk: 1, self.plantain.pk: 1})
+
+    def test_pages_schedule_the_trailing_flush(self):
+        self.add(self.rice)
+        self.add(self.plantain)
+        response = self.client.get(reverse('cart'))
+        self.assertIsNotNone(response.context['cart_sync_in'])
+        self.assertContains(response, 'window.scheduleCartSync(')
+
+
+@override_settings(ORDER_EVENTS_POLL_INTERVAL=0)
+class DatabaseBrokerTests(TestCase):
+    """Two brokers stand in for two worker processes sharing the database"""
+
+    def setUp(self):
+        self.web, self.worker = DatabaseBroker(), DatabaseBroker()
+
+    async def subscribe(self, channel='restaurant:1', after=None):
+        return await sync_to_async(self.web.subscribe)(channel, after=after, loop=asyncio.get_running_loop())
+
+    async def publish(self, order_id, channel='restaurant:1'):
+        await sync_to_async(self.worker.publish)(channel, {'type': 'status', 'order_id': order_id})
+        return await OrderEvent.objects.alatest('id')
+
+    async def test_poll_delivers_events_published_elsewhere(self):
+        subscription = await self.subscribe()
+        await self.publish(7)
+        await self.publish(8, channel='restaurant:2')
+
+        self.assertEqual(await sync_to_async(self.web.poll)(), 1)
+        event = await subscription.get(timeout=1)
+        self.assertEqual(event['order_id'], 7)
+        self.assertEqual(await sync_to_async(self.web.poll)(), 0)
+
+    async def test_reconnect_replays_events_after_last_event_id(self):
+        first = await self.publish(1)
+        await self.publish(2)
+        await self.publish(3)
+
+        subscription = await self.subscribe(after=first.pk)
+        replayed = [(await subscription.get(timeout=1))['order_id'] for _ in range(2)]
+        self.assertEqual(replayed, [2, 3])
+        self.assertEqual(await sync_to_async(self.web.poll)(), 0)
+
+    async def test_unknown_or_pruned_last_event_id_needs_resync(self):
+        first = await self.publish(1)
+        last = await self.publish(2)
+        self.assertIsNone(await self.subscribe(after=last.pk + 10))
+
+        pruned = first.pk
+        await first.adelete()
+        self.assertIsNone(await self.subscribe(after=pruned - 1))
+        self.assertIsNotNone(await self.subscribe(after=pruned))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'orders-tests'}})
+class BulkTransitionCounterTests(TestCase):
+    def test_bulk_transition_refreshes_owner_counters(self):
+        owner = CustomUser.objects.create_user('owner', 'owner@example.com', 'pw', role='restaurant_owner')
+        customer = CustomUser.objects.create_user('customer', 'customer@example.com', 'pw', role='customer')
+        restaurant = Restaurant.objects.create(
+            owner=owner, name='Mama Put', slug='mama-put', address='1 Road', phone='080',
+            email='mama@example.com', opening_time='09:00', closing_time='21:00',
+        )
+        for _ in range(2):
+            Order.objects.create(
+                customer=customer, restaurant=restaurant, total_price=1500,
+                customer_name='Ada', customer_phone='080', customer_email='ada@example.com',
+            )
+        self.assertEqual(get_owner_counters(owner.pk)['pending_orders'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_transition(Order.objects.filter(restaurant=restaurant), 'confirmed')
+        self.assertEqual(get_owner_counters(owner.pk)['pending_orders'], 0)
+
+
+class CustomerStatsTests(TestCase):
+    def test_summary_matches_the_per_status_counts(self):
+        owner = CustomUser.objects.create_user('owner', 'owner@example.com', 'pw', role='restaurant_owner')
+        customer = CustomUser.objects.create_user('customer', 'customer@example.com', 'pw', role='customer')
+        restaurant = Restaurant.objects.create(
+            owner=owner, name='Mama Put', slug='mama-put', address='1 Road', phone='080',
+            email='mama@example.com', opening_time='09:00', closing_time='21:00',
+        )
+        for status, total in [('pending', 500), ('confirmed', 1000), ('completed', 2000), ('cancelled', 4000)]:
+            Order.objects.create(
+                customer=customer, restaurant=restaurant, status=status, total_price=total,
+                customer_name='Ada', customer_phone='080', customer_email='ada@example.com',
+            )
+
+        with self.assertNumQueries(1):
+            stats = CustomerStats(customer).summary()
+        self.assertEqual(stats['total_orders'], 4)
+        self.assertEqual(stats['completed_orders'], 2)
+        self.assertEqual(stats['pending_orders'], 2)
+        self.assertEqual(stats['cancelled_orders'], 1)
+        self.assertEqual(stats['total_spent'], 3000)
+        self.assertEqual(stats['monthly_spent'], 3000)
+        self.assertEqual(stats['recent_activity_count'], 4)
+
+
+class CheckoutStockTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        owner = CustomUser.objects.create_user('owner', 'owner@example.com', 'pw', role='restaurant_owner')
+        cls.customer = CustomUser.objects.create_user('customer', 'customer@example.com', 'pw', role='customer')
+        restaurant = Restaurant.objects.create(
+            owner=owner, name='Mama Put', slug='mama-put', address='1 Road', phone='080',
+            email='mama@example.com', opening_time='09:00', closing_time='21:00',
+        )
+        category = Category.objects.create(restaurant=restaurant, name='Mains')
+        cls.suya = MenuItem.objects.create(category=category, name='Suya', price=2000, track_stock=True, stock_quantity=5)
+
+    def test_stock_drained_during_checkout_sends_customer_back_to_cart(self):
+        self.client.force_login(self.customer)
+        self.client.post(reverse('add_to_cart', args=[self.suya.pk]), {'quantity': 2})
+
+        # Another checkout took the stock after this one validated the cart
+        with mock.patch('orders.checkout.stock.reduce_stock_batch', side_effect=InsufficientStock('Not enough stock')):
+            response = self.client.post(reverse('process_checkout'), {'payment_method': 'cash'}, follow=True)
+
+        self.assertRedirects(response, reverse('cart'))
+        self.assertTrue(any('Please update your cart' in str(m) for m in response.context['messages']))
+        self.assertFalse(Order.objects.exists())
+
+
+class AdminStatusChangeTests(TestCase):
+    def test_cancelling_in_the_change_form_puts_the_stock_back(self):
+        owner = CustomUser.objects.create_user('owner', 'owner@example.com', 'pw', role='restaurant_owner')
+        customer = CustomUser.objects.create_user('customer', 'customer@example.com', 'pw', role='customer')
+        admin_user = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        restaurant = Restaurant.objects.create(
+            owner=owner, name='Mama Put', slug='mama-put', address='1 Road', phone='080',
+            email='mama@example.com', opening_time='09:00', closing_time='21:00',
+        )
+        category = Category.objects.create(restaurant=restaurant, name='Mains')
+        suya = MenuItem.objects.create(category=category, name='Suya', price=2000, track_stock=True, stock_quantity=5)
+        self.client.force_login(customer)
+        self.client.post(reverse('add_to_cart', args=[suya.pk]), {'quantity': 2})
+        self.client.post(reverse('process_checkout'), {'payment_method': 'cash'})
+        order = Order.objects.get(customer=customer)
+        suya.refresh_from_db()
+        self.assertEqual(suya.stock_quantity, 3)
+
+        self.client.force_login(admin_user)
+        placed = order.status
+        url = reverse('admin:orders_order_change', args=[order.pk])
+        history = list(order.status_history.values_list('pk', flat=True))
+        data = {
+            'customer': customer.pk, 'restaurant': restaurant.pk, 'status': 'cancelled',
+            'customer_name': order.customer_name, 'customer_phone': '080',
+            'customer_email': order.customer_email, 'special_instructions': '',
+            'orderitem_set-TOTAL_FORMS': order.orderitem_set.count(), 'orderitem_set-INITIAL_FORMS': order.orderitem_set.count(),
+            'status_history-TOTAL_FORMS': len(history), 'status_history-INITIAL_FORMS': len(history),
+        }
+        for n, item in enumerate(order.orderitem_set.all()):
+            data.update({f'orderitem_set-{n}-id': item.pk, f'orderitem_set-{n}-order': order.pk, f'orderitem_set-{n}-special_requests': ''})
+        for n, pk in enumerate(history):
+            data.update({f'status_history-{n}-id': pk, f'status_history-{n}-order': order.pk})
+        with mock.patch('orders.events._publish') as publish, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, data)
+
+        self.assertEqual(response.status_code, 302)
+        order.refresh_from_db()
+        suya.refresh_from_db()
+        self.assertEqual(order.status, 'cancelled')
+        self.assertFalse(order.holds_stock)
+        self.assertEqual(suya.stock_quantity, 5)
+        event = publish.call_args.args[1]
+        self.assertEqual((event['order_id'], event['previous_status'], event['status']), (order.pk, placed, 'cancelled'))
+        history = order.status_history.latest('created_at')
+        self.assertEqual((history.to_status, history.source, history.changed_by), ('cancelled', 'admin', admin_user))
+
+
+class RollupSnapshotTests(TestCase):
+    def setUp(self):
+        owner = CustomUser.objects.create_user('owner', 'owner@example.com', 'pw', role='restaurant_owner')
+        customer = CustomUser.objects.create_user('customer', 'customer@example.com', 'pw', role='customer')
+        self.restaurant = Restaurant.objects.create(
+            owner=owner, name='Mama Put', slug='mama-put', address='1 Road', phone='080',
+            email='mama@example.com', opening_time='09:00', closing_time='21:00',
+        )
+        self.order = Order.objects.create(
+            customer=customer, restaurant=self.restaurant, total_price=1500,
+            customer_name='Ada', customer_phone='080', customer_email='ada@example.com',
+        )
+
+    def buckets(self):
+        return dict(DailyRestaurantStats.objects.filter(restaurant=self.restaurant).values_list('status', 'order_count'))
+
+    def test_status_change_on_a_loaded_order_moves_its_bucket(self):
+        transition(Order.objects.get(pk=self.order.pk), 'cancelled')
+        self.assertEqual(self.buckets(), {'pending': 0, 'cancelled': 1})
+
+    def test_loading_and_unrelated_saves_read_nothing_back(self):
+        order = Order.objects.get(pk=self.order.pk)
+        self.assertFalse(hasattr(order, '_rollup_state'))
+
+        order.special_instructions = 'No pepper'
+        with CaptureQueriesContext(connection) as queries:
+            order.save(update_fields=['special_instructions'])
+        self.assertFalse([q for q in queries if q['sql'].startswith('SELECT') and 'orders_order' in q['sql']])
+        self.assertEqual(self.buckets(), {'pending': 1})
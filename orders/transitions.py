@@ -0,0 +1,212 @@
+"""
+Order status state machine.
+
+Every status change goes through transition() (one order) or
+bulk_transition() (many). Both only move orders along ORDER_TRANSITIONS,
+apply the paid-order rule (an order whose payment is confirmed goes to
+'completed' when asked for pending, awaiting_confirmation or confirmed)
+and append to OrderStatusHistory, so an order's timeline is one indexed
+query. Moving an order to 'cancelled' puts back the stock its checkout
+took (checkout.release_stock), whichever path cancels it.
+
+transition() writes the order once with save(update_fields=...), so the
+rollup and live-event receivers still run. bulk_transition() issues one
+UPDATE per resulting status instead of a save() per order, keeps the
+analytics rollups in step (ORDER_ROLLUP.bulk_set_status), publishes one
+live event per restaurant, drops the owners' cached navbar counters and
+writes one AuditLog row for the batch.
+Notification emails stay with the callers, which know who to tell.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.notification_counters import invalidate_counters
+from restaurants.models import Restaurant
+
+from .checkout import release_stock
+from .events import publish_order_events
+from .models import Order, OrderStatusHistory
+from .rollups import ORDER_ROLLUP
+
+# Statuses an order may move to from each status
+ORDER_TRANSITIONS = {
+    'pending': {'awaiting_confirmation', 'confirmed', 'preparing', 'ready', 'completed', 'cancelled'},
+    'awaiting_confirmation': {'pending', 'confirmed', 'preparing', 'ready', 'completed', 'cancelled'},
+    'confirmed': {'preparing', 'ready', 'completed', 'cancelled'},
+    'preparing': {'ready', 'completed', 'cancelled'},
+    'ready': {'completed', 'cancelled'},
+    'completed': set(),
+    'cancelled': set(),
+}
+
+# Statuses a paid order skips straight past
+PAID_COMPLETES = frozenset({'pending', 'awaiting_confirmation', 'confirmed'})
+
+
+class InvalidTransition(Exception):
+    """Raised when an order may not move to the requested status"""
+
+
+def can_transition(current, new):
+    return new in ORDER_TRANSITIONS.get(current, ())
+
+
+def effective_status(status, payment_status):
+    """The status an order really ends up in when asked for ``status``"""
+    if payment_status == 'confirmed' and status in PAID_COMPLETES:
+        return 'completed'
+    return status
+
+
+def transition(order, status=None, user=None, source='', payment_status=None, validate=True):
+    """Move ``order`` to ``status`` and/or ``payment_status`` with a single write.
+
+    Returns False if nothing changed. Raises InvalidTransition if the move is
+    not allowed (validate=False lets admins override).
+    """
+    status = status or order.status
+    if status not in ORDER_TRANSITIONS:
+        raise InvalidTransition(f'Unknown order status: {status}')
+    previous = order.status
+    payment_status = payment_status or order.payment_status
+    target = effective_status(status, payment_status)
+    if target == previous and payment_status == order.payment_status:
+        return False
+    if validate and target != previous and not can_transition(previous, target):
+        raise InvalidTransition(
+            f"Order #{order.pk} cannot go from {order.get_status_display()} to {dict(Order.STATUS_CHOICES)[target]}."
+        )
+
+    order.status = target
+    order.payment_status = payment_status
+    with transaction.atomic():
+        order.save(update_fields=['status', 'payment_status', 'updated_at'])
+        if target == 'cancelled' and previous != 'cancelled':
+            release_stock([order.pk])
+            order.holds_stock = False
+        record_change(order, previous, user, source)
+    return True
+
+
+def mark_payment_confirmed(order, user=None, source=''):
+    """Mark the order's payment received (paid orders that were not yet being prepared complete)"""
+    return transition(order, payment_status='confirmed', user=user, source=source)
+
+
+def mark_payment_rejected(order, user=None, source=''):
+    """Mark the order's payment as not received and cancel it"""
+    return transition(order, 'cancelled', payment_status='failed', user=user, source=source)
+
+
+def record_change(order, previous_status, user=None, source=''):
+    """Append the order's current status to its history"""
+    return OrderStatusHistory.objects.create(
+        order=order,
+        from_status=previous_status or '',
+        to_status=order.status,
+        payment_status=order.payment_status,
+        changed_by=user if user is not None and user.is_authenticated else None,
+        source=source[:50],
+    )
+
+
+@dataclass
+class TransitionResult:
+    status: str
+    # order id -> (previous status, new status)
+    changed: dict = field(default_factory=dict)
+    # order id -> current status, for orders that may not move to ``status``
+    rejected: dict = field(default_factory=dict)
+    unchanged: int = 0
+
+    @property
+    def updated(self):
+        return len(self.changed)
+
+    def counts(self):
+        """{(previous, new): number of orders}"""
+        totals = defaultdict(int)
+        for previous, new in self.changed.values():
+            totals[(previous, new)] += 1
+        return dict(totals)
+
+
+def bulk_transition(queryset, status, user=None, request=None, validate=True, reason='', source=''):
+    """Move the orders in ``queryset`` to ``status``; returns a TransitionResult.
+
+    With validate=False any status change is applied (admin overrides).
+    """
+    if status not in ORDER_TRANSITIONS:
+        raise InvalidTransition(f'Unknown order status: {status}')
+
+    result = TransitionResult(status)
+    with transaction.atomic():
+        rows = list(
+            queryset.select_for_update().order_by().values_list('pk', 'status', 'payment_status', 'restaurant_id')
+        )
+        targets = defaultdict(list)
+        details = {}
+        for pk, current, payment_status, restaurant_id in rows:
+            target = effective_status(status, payment_status)
+            if target == current:
+                result.unchanged += 1
+            elif validate and not can_transition(current, target):
+                result.rejected[pk] = current
+            else:
+                targets[target].append(pk)
+                result.changed[pk] = (current, target)
+                details[pk] = (restaurant_id, payment_status)
+
+        now = timezone.now()
+        for target, pks in targets.items():
+            ORDER_ROLLUP.bulk_set_status(Order.objects.filter(pk__in=pks), target, updated_at=now)
+        if targets.get('cancelled'):
+            release_stock(targets['cancelled'])
+
+        if result.changed:
+            changed_by = user if user is not None and user.is_authenticated else None
+            OrderStatusHistory.objects.bulk_create([
+                OrderStatusHistory(
+                    order_id=pk, from_status=previous, to_status=new, payment_status=details[pk][1],
+                    changed_by=changed_by, source=(source or reason)[:50],
+                )
+                for pk, (previous, new) in result.changed.items()
+            ], batch_size=500)
+
+            by_restaurant = defaultdict(list)
+            for pk, (previous, new) in result.changed.items():
+                by_restaurant[details[pk][0]].append((pk, previous, new))
+            for restaurant_id, changes in by_restaurant.items():
+                publish_order_events(restaurant_id, changes)
+            # The UPDATEs send no post_save, so core/signals.py does not see them
+            owner_ids = set(Restaurant.objects.filter(pk__in=list(by_restaurant)).values_list('owner_id', flat=True))
+            transaction.on_commit(lambda: invalidate_counters(*owner_ids))
+            _audit(result, user, request, reason)
+    return result
+
+
+def _audit(result, user, request, reason):
+    from core.models import AuditLog
+
+    counts = result.counts()
+    description = f'Bulk status change of {result.updated} order(s) to {result.status}'
+    if reason:
+        description = f'{description} ({reason})'
+    AuditLog.log(
+        user=user,
+        action_type='order_cancel' if result.status == 'cancelled' else 'order_update',
+        description=description,
+        target_model='Order',
+        request=request,
+        extra_data={
+            'status': result.status,
+            'order_ids': sorted(result.changed),
+            'transitions': [
+                {'from': previous, 'to': new, 'count': n} for (previous, new), n in sorted(counts.items())
+            ],
+            'rejected': len(result.rejected),
+        },
+    )
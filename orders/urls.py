@@ -23,6 +23,7 @@ urlpatterns = [
     path('cart/update/<int:item_id>/', views.update_cart_item, name='update_cart_item'),
     path('cart/remove/<int:item_id>/', views.remove_from_cart, name='remove_from_cart'),
     path('cart/clear/', views.clear_cart, name='clear_cart'),
+    path('cart/sync/', views.sync_cart, name='sync_cart'),
     path('checkout/', views.checkout, name='checkout'),
     path('checkout/process/', views.process_checkout, name='process_checkout'),
 ]
\ No newline at end of file
@@ -40,8 +40,16 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
-from .models import Order, OrderItem
+from django.db import transaction
+from .models import Order
+from .checkout import CheckoutError, create_order_items, lock_cart_menu_items
+from restaurants.stock import InsufficientStock
+from .transitions import InvalidTransition, mark_payment_confirmed, mark_payment_rejected, transition
+from core.pagination import KeysetPaginator, paginate_keyset
 from restaurants.models import Restaurant, MenuItem
+import logging
+
+logger = logging.getLogger(__name__)
 
 # Delete canceled order (customer only)
 @login_required
@@ -102,20 +110,24 @@ def ajax_cart_total_count(request):
         if isinstance(subcart, dict):
             for item_id, item_data in subcart.items():
                 total += item_data.get('quantity', 0)
-    print(f"DEBUG: Cart session: {cart}")
-    print(f"DEBUG: Total cart items (all restaurants): {total}")
+    logger.debug(f"Cart total for user {request.user.pk}: {total} item(s) across {len(cart)} restaurant(s)")
     return JsonResponse({'cart_total_items': total, 'success': True})
-from .cart import Cart
+from .cart import Cart, pending_sync_delay
 from django.urls import reverse
 
+@login_required
+@require_POST
+def sync_cart(request):
+    """Trailing flush of a SavedCart write deferred by CART_SYNC_DEBOUNCE"""
+    Cart(request).flush_pending_sync(force=True)
+    return JsonResponse({'success': True})
+
 @login_required
 def ajax_switch_cart_restaurant(request, restaurant_id):
     """AJAX: Set the active cart restaurant in session and return JSON."""
-    print(f"DEBUG: Switching to restaurant {restaurant_id}")
-    print(f"DEBUG: Session before: {request.session.get('current_cart_restaurant')}")
+    logger.debug(f"Switching cart from restaurant {request.session.get('current_cart_restaurant')} to {restaurant_id}")
     request.session['current_cart_restaurant'] = str(restaurant_id)
     request.session.modified = True
-    print(f"DEBUG: Session after: {request.session.get('current_cart_restaurant')}")
     return JsonResponse({'success': True, 'current_cart_restaurant': str(restaurant_id)})
 
 @login_required
@@ -141,7 +153,7 @@ def create_order(request, restaurant_slug):
 @login_required
 def add_to_cart(request, item_id):
     if request.method == 'POST':
-        menu_item = get_object_or_404(MenuItem, id=item_id, is_available=True)
+        menu_item = get_object_or_404(MenuItem.objects.select_related('category__restaurant'), id=item_id, is_available=True)
         cart = Cart(request)
         
         try:
@@ -164,6 +176,7 @@ def add_to_cart(request, item_id):
                 return JsonResponse({
                     'success': True,
                     'cart_total_items': total_items,
+                    'cart_sync_in': pending_sync_delay(request.session),
                     'message': f'{menu_item.name} added to cart!'
                 })
             else:
@@ -238,18 +251,18 @@ def switch_cart_restaurant(request, restaurant_id):
 @login_required
 def update_cart_item(request, item_id):
     if request.method == 'POST':
-        menu_item = get_object_or_404(MenuItem, id=item_id)
+        menu_item = get_object_or_404(MenuItem.objects.select_related('category__restaurant'), id=item_id)
         cart = Cart(request)
         
         quantity = int(request.POST.get('quantity', 1))
         special_requests = request.POST.get('special_requests', '')
         
-        print(f"DEBUG: Updating item {item_id} to quantity {quantity}")
-        print(f"DEBUG: Cart before: {cart.cart}")
-        
-        cart.update(menu_item, quantity, special_requests)
-        
-        print(f"DEBUG: Cart after: {cart.cart}")
+        logger.debug(f"Updating cart item {item_id} to quantity {quantity}")
+        try:
+            cart.update(menu_item, quantity, special_requests)
+        except ValueError as e:
+            messages.error(request, str(e))
+            return redirect('cart')
         
         messages.success(request, f'Cart updated! {menu_item.name} x {quantity}')
         return redirect('cart')
@@ -257,7 +270,7 @@ def update_cart_item(request, item_id):
 @login_required
 def remove_from_cart(request, item_id):
     if request.method == 'POST':
-        menu_item = get_object_or_404(MenuItem, id=item_id)
+        menu_item = get_object_or_404(MenuItem.objects.select_related('category__restaurant'), id=item_id)
         cart = Cart(request)
         cart.remove(menu_item)
         
@@ -331,13 +344,6 @@ def process_checkout(request):
     restaurant = get_object_or_404(Restaurant, id=restaurant_id)
     payment_method = request.POST.get('payment_method', 'cash')
     
-    # Validate cart items are still available
-    for item in cart_items:
-        menu_item = get_object_or_404(MenuItem, id=item['menu_item_id'])
-        if not menu_item.is_available:
-            messages.error(request, f"{menu_item.name} is no longer available. Please update your cart.")
-            return redirect('cart')
-    
     try:
         # Determine initial status based on payment method
         if payment_method == 'cash':
@@ -356,34 +362,36 @@ def process_checkout(request):
             order_status = 'pending'
             payment_status = 'pending'
         
-        # Create order
-        order = Order.objects.create(
-            customer=request.user,
-            restaurant=restaurant,
-            total_price=total_price,
-            customer_name=request.user.get_full_name() or request.user.username,
-            customer_phone=request.user.phone_number or '',
-            customer_email=request.user.email,
-            payment_method=payment_method,
-            payment_status=payment_status,
-            status=order_status,
-        )
-        
-        # Handle payment proof upload (for bank transfer / mobile money)
-        if request.FILES.get('payment_proof'):
-            order.payment_proof = request.FILES['payment_proof']
-            order.save()
-        
-        # Create order items
-        for item in cart_items:
-            menu_item = get_object_or_404(MenuItem, id=item['menu_item_id'])
-            OrderItem.objects.create(
-                order=order,
-                menu_item=menu_item,
-                quantity=item['quantity'],
-                price=item['price'],
-                special_requests=item['special_requests']
-            )
+        # A cart that can no longer be ordered (removed items, or stock another
+        # checkout took meanwhile) rolls the whole order back
+        try:
+            with transaction.atomic():
+                # Validate cart items are still available (locks stock-tracked rows)
+                menu_items = lock_cart_menu_items(cart_items, cart.reservation_key)
+                
+                # Create order
+                order = Order.objects.create(
+                    customer=request.user,
+                    restaurant=restaurant,
+                    total_price=total_price,
+                    customer_name=request.user.get_full_name() or request.user.username,
+                    customer_phone=request.user.phone_number or '',
+                    customer_email=request.user.email,
+                    payment_method=payment_method,
+                    payment_status=payment_status,
+                    status=order_status,
+                )
+                
+                # Handle payment proof upload (for bank transfer / mobile money)
+                if request.FILES.get('payment_proof'):
+                    order.payment_proof = request.FILES['payment_proof']
+                    order.save()
+                
+                # Create order items
+                create_order_items(order, cart_items, menu_items, cart.reservation_key)
+        except (CheckoutError, InsufficientStock) as e:
+            messages.error(request, str(e))
+            return redirect('cart')
         
         # Clear cart
         cart.clear()
@@ -394,7 +402,7 @@ def process_checkout(request):
             send_order_confirmation(order)
             send_order_notification_to_restaurant(order)
         except Exception as e:
-            print(f"Email sending failed: {e}")
+            logger.exception(f"Email sending failed for order {order.id}: {e}")
         
         # Redirect to delivery method selection for transfer/mobile/Paystack
         if payment_method in ['bank_transfer', 'mobile_money', 'paystack']:
@@ -462,13 +470,11 @@ def order_history(request):
         if restaurant:
             orders = orders.filter(restaurant=restaurant)
 
-    orders = orders.order_by('-created_at')
-
-    # Force evaluation to avoid stale cache
-    orders = list(orders)
+    orders = paginate_keyset(request, orders.select_related('restaurant'))
 
     context = {
         'orders': orders,
+        'page_obj': orders,
         'filter_restaurant': restaurant,
     }
     return render(request, 'orders/order_history.html', context)
@@ -476,21 +482,18 @@ def order_history(request):
 
 @login_required
 def ajax_restaurant_orders(request, restaurant_slug):
-    """Return paginated JSON of the requesting customer's orders for a given restaurant."""
+    """Return cursor-paginated JSON of the requesting customer's orders for a given restaurant.
+
+    Pass the previous response's next_cursor as ?cursor= to get the next page.
+    """
     if not request.user.is_authenticated or request.user.role != 'customer':
         return JsonResponse({'error': 'Unauthorized'}, status=403)
 
     restaurant = get_object_or_404(Restaurant, slug=restaurant_slug, is_active=True)
-    try:
-        page = int(request.GET.get('page', 1))
-    except ValueError:
-        page = 1
     per = 5
-    offset = (page - 1) * per
 
-    qs = Order.objects.filter(customer=request.user, restaurant=restaurant).order_by('-created_at')
-    total = qs.count()
-    orders = qs[offset:offset+per]
+    qs = Order.objects.filter(customer=request.user, restaurant=restaurant)
+    orders = KeysetPaginator(qs, per).get_page(request.GET.get('cursor'))
 
     data = []
     for o in orders:
@@ -502,7 +505,7 @@ def ajax_restaurant_orders(request, restaurant_slug):
             'detail_url': reverse('order_detail', args=[o.id])
         })
 
-    return JsonResponse({'orders': data, 'total': total, 'page': page, 'per': per})
+    return JsonResponse({'orders': data, 'next_cursor': orders.next_cursor, 'has_next': orders.has_next, 'per': per})
 
 
 @login_required
@@ -521,13 +524,8 @@ def confirm_payment(request, order_id):
     import logging
     logger = logging.getLogger(__name__)
     logger.info(f"Confirming payment for order {order.id} (current status: {order.status}, payment_status: {order.payment_status})")
-    # Update payment status
-    order.payment_status = 'confirmed'
-    # If order was pending or awaiting confirmation, now mark as completed
-    if order.status in ['pending', 'awaiting_confirmation', 'confirmed']:
-        logger.info(f"Order {order.id} status changing from {order.status} to completed")
-        order.status = 'completed'
-    order.save()
+    # Update payment status (orders not yet being prepared complete)
+    mark_payment_confirmed(order, user=request.user, source='confirm_payment')
     logger.info(f"Order {order.id} after save: status={order.status}, payment_status={order.payment_status}")
     
     # Send notification to customer
@@ -554,10 +552,12 @@ def reject_payment(request, order_id):
         messages.error(request, 'You do not have permission to reject this payment.')
         return redirect('order_detail', order_id=order_id)
     
-    # Update payment status
-    order.payment_status = 'failed'
-    order.status = 'cancelled'
-    order.save()
+    # Update payment status and cancel the order
+    try:
+        mark_payment_rejected(order, user=request.user, source='reject_payment')
+    except InvalidTransition as e:
+        messages.error(request, str(e))
+        return redirect('order_detail', order_id=order_id)
     
     # Send notification to customer
     try:
@@ -585,8 +585,11 @@ def update_order_status(request, order_id):
         valid_statuses = ['pending', 'awaiting_confirmation', 'confirmed', 'preparing', 'ready', 'completed', 'cancelled']
         
         if new_status in valid_statuses:
-            order.status = new_status
-            order.save()
+            try:
+                transition(order, new_status, user=request.user, source='update_order_status')
+            except InvalidTransition as e:
+                messages.error(request, str(e))
+                return redirect('order_detail', order_id=order_id)
             # If delivery and marked as completed, send dispatch notification
             if order.delivery_method == 'delivery' and new_status == 'completed':
                 try:
@@ -637,8 +640,11 @@ def cancel_order(request, order_id):
             return redirect('order_detail', order_id=order_id)
     
     # Cancel the order
-    order.status = 'cancelled'
-    order.save()
+    try:
+        transition(order, 'cancelled', user=request.user, source='cancel_order', validate=not is_admin)
+    except InvalidTransition as e:
+        messages.error(request, str(e))
+        return redirect('order_detail', order_id=order_id)
     
     # Send notification
     try:
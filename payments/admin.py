@@ -1,5 +1,9 @@
 from django.contrib import admin
-from .models import Payment
+from orders.rollups import PAYMENT_ROLLUP
+
+from django.utils import timezone
+
+from .models import Payment, PaystackEvent
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
@@ -23,16 +27,33 @@ class PaymentAdmin(admin.ModelAdmin):
     actions = ['mark_success', 'mark_failed', 'mark_pending']
     
     def mark_success(self, request, queryset):
-        updated = queryset.update(status='success')
+        updated = PAYMENT_ROLLUP.bulk_set_status(queryset, 'success')
         self.message_user(request, f'{updated} payments marked as Success.')
     mark_success.short_description = "Mark selected payments as Success"
     
     def mark_failed(self, request, queryset):
-        updated = queryset.update(status='failed')
+        updated = PAYMENT_ROLLUP.bulk_set_status(queryset, 'failed')
         self.message_user(request, f'{updated} payments marked as Failed.')
     mark_failed.short_description = "Mark selected payments as Failed"
     
     def mark_pending(self, request, queryset):
-        updated = queryset.update(status='pending')
+        updated = PAYMENT_ROLLUP.bulk_set_status(queryset, 'pending')
         self.message_user(request, f'{updated} payments marked as Pending.')
-    mark_pending.short_description = "Mark selected payments as Pending"
\ No newline at end of file
+    mark_pending.short_description = "Mark selected payments as Pending"
+
+
+@admin.register(PaystackEvent)
+class PaystackEventAdmin(admin.ModelAdmin):
+    list_display = ('event_key', 'event_type', 'reference', 'status', 'deliveries', 'attempts', 'received_at', 'processed_at')
+    list_filter = ('status', 'event_type')
+    search_fields = ('event_key', 'reference')
+    readonly_fields = ('event_key', 'event_type', 'reference', 'payload', 'deliveries', 'received_at', 'processed_at')
+
+    actions = ['requeue']
+
+    def requeue(self, request, queryset):
+        updated = queryset.exclude(status='processed').update(
+            status='pending', attempts=0, last_error='', next_attempt_at=timezone.now(),
+        )
+        self.message_user(request, f'{updated} events queued for processing.')
+    requeue.short_description = "Queue selected events for processing again"
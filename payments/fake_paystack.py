@@ -0,0 +1,223 @@
+"""
+A local stand-in for the Paystack API.
+
+Serves the endpoints PaystackService uses (transaction initialize/verify,
+transferrecipient, bank) over HTTP/1.1 keep-alive from a background
+thread. Use it in tests or local development:
+
+    with FakePaystackServer() as fake:
+        with override_settings(PAYSTACK_BASE_URL=fake.url):
+            ...
+
+or run ``manage.py fake_paystack`` and set PAYSTACK_BASE_URL. Its hosted
+checkout page (the authorization_url) marks the payment successful and
+redirects straight back to the callback URL.
+
+Idempotency-Key is honoured: a repeated key returns the stored response.
+fail_next() makes the next requests answer with an error status (or any
+raw body, such as a proxy's HTML page), to exercise retries and error
+handling. ``requests`` and ``connections`` record what the client
+did.
+"""
+import json
+import re
+import secrets
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BANKS = [
+    {'name': 'Access Bank', 'code': '044', 'slug': 'access-bank'},
+    {'name': 'Guaranty Trust Bank', 'code': '058', 'slug': 'guaranty-trust-bank'},
+    {'name': 'United Bank For Africa', 'code': '033', 'slug': 'united-bank-for-africa'},
+    {'name': 'Zenith Bank', 'code': '057', 'slug': 'zenith-bank'},
+]
+
+VERIFY_PATH = re.compile(r'^/transaction/verify/(?P<reference>[^/?]+)$')
+CHECKOUT_PATH = re.compile(r'^/checkout/(?P<access_code>[0-9a-f]+)$')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, so client pooling is observable
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.fake.lock:
+            self.server.fake.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_raw(self, status, text):
+        data = text.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, method):
+        fake = self.server.fake
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = json.loads(self.rfile.read(length) or b'null') if length else None
+        key = self.headers.get('Idempotency-Key')
+        with fake.lock:
+            fake.requests.append({'method': method, 'path': self.path, 'payload': payload, 'idempotency_key': key})
+            if fake.failures:
+                fake.failures -= 1
+                if fake.failure_body is not None:
+                    return self._send_raw(fake.failure_status, fake.failure_body)
+                return self._send(fake.failure_status, {'status': False, 'message': 'Fake upstream error'})
+            if key and key in fake.idempotent_responses:
+                return self._send(*fake.idempotent_responses[key])
+
+        checkout = CHECKOUT_PATH.match(self.path) if method == 'GET' else None
+        if checkout:
+            # The hosted payment page: pay at once and go back to the shop
+            callback_url = fake.pay(checkout.group('access_code'))
+            if callback_url is None:
+                return self._send(404, {'status': False, 'message': 'Unknown checkout'})
+            self.send_response(302)
+            self.send_header('Location', callback_url)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        if not self.headers.get('Authorization', '').startswith('Bearer '):
+            return self._send(401, {'status': False, 'message': 'Invalid key'})
+
+        status, body = fake.respond(method, self.path, payload)
+        if key and method == 'POST':
+            with fake.lock:
+                fake.idempotent_responses[key] = (status, body)
+        self._send(status, body)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+
+class FakePaystackServer:
+    """Paystack look-alike on 127.0.0.1; use as a context manager"""
+
+    def __init__(self, port=0):
+        self.lock = threading.Lock()
+        self.transactions = {}
+        self.recipients = []
+        self.requests = []
+        self.connections = 0
+        self.idempotent_responses = {}
+        self.failures = 0
+        self.failure_status = 502
+        self.failure_body = None
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def fail_next(self, count=1, status=502, body=None):
+        """Answer the next ``count`` requests with ``status`` (and ``body`` as-is, if given)"""
+        with self.lock:
+            self.failures = count
+            self.failure_status = status
+            self.failure_body = body
+
+    def complete(self, reference, status='success'):
+        """Settle a transaction as the customer paying on Paystack would"""
+        with self.lock:
+            self.transactions[reference]['status'] = status
+
+    def pay(self, access_code):
+        """Mark the transaction with ``access_code`` paid; returns its callback URL"""
+        with self.lock:
+            for transaction in self.transactions.values():
+                if transaction['access_code'] == access_code:
+                    transaction['status'] = 'success'
+                    return transaction['callback_url'] or '/'
+        return None
+
+    def respond(self, method, path, payload):
+        if method == 'POST' and path == '/transaction/initialize':
+            return self._initialize(payload or {})
+        if method == 'POST' and path == '/transferrecipient':
+            return self._create_recipient(payload or {})
+        if method == 'GET' and path == '/bank':
+            return 200, {'status': True, 'message': 'Banks retrieved', 'data': BANKS}
+        match = VERIFY_PATH.match(path) if method == 'GET' else None
+        if match:
+            return self._verify(match.group('reference'))
+        return 404, {'status': False, 'message': 'Not found'}
+
+    def _initialize(self, payload):
+        reference = payload.get('reference') or secrets.token_hex(8)
+        with self.lock:
+            if reference in self.transactions:
+                return 400, {'status': False, 'message': 'Duplicate Transaction Reference'}
+            access_code = secrets.token_hex(6)
+            self.transactions[reference] = {
+                'id': len(self.transactions) + 1,
+                'reference': reference,
+                'amount': payload.get('amount'),
+                'currency': payload.get('currency', 'NGN'),
+                'customer': {'email': payload.get('email')},
+                'status': 'abandoned',
+                'access_code': access_code,
+                'callback_url': payload.get('callback_url'),
+            }
+        return 200, {
+            'status': True,
+            'message': 'Authorization URL created',
+            'data': {
+                'authorization_url': f'{self.url}/checkout/{access_code}',
+                'access_code': access_code,
+                'reference': reference,
+            },
+        }
+
+    def _verify(self, reference):
+        with self.lock:
+            transaction = self.transactions.get(reference)
+            if transaction is None:
+                return 400, {'status': False, 'message': 'Transaction reference not found'}
+            return 200, {'status': True, 'message': 'Verification successful', 'data': dict(transaction)}
+
+    def _create_recipient(self, payload):
+        with self.lock:
+            recipient = {
+                'id': len(self.recipients) + 1,
+                'recipient_code': f'RCP_{secrets.token_hex(6)}',
+                'name': payload.get('name'),
+                'details': {'account_number': payload.get('account_number'), 'bank_code': payload.get('bank_code')},
+            }
+            self.recipients.append(recipient)
+        return 200, {'status': True, 'message': 'Transfer recipient created successfully', 'data': recipient}
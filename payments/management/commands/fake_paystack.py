@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from payments.fake_paystack import FakePaystackServer
+
+
+class Command(BaseCommand):
+    help = 'Run a local fake Paystack API (set PAYSTACK_BASE_URL to the printed URL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8765)
+
+    def handle(self, *args, **options):
+        with FakePaystackServer(port=options['port']) as fake:
+            self.stdout.write(self.style.SUCCESS(f'Fake Paystack listening on {fake.url}'))
+            self.stdout.write(f'Run the site with PAYSTACK_BASE_URL={fake.url}. Ctrl-C to stop.')
+            try:
+                while True:
+                    time.sleep(1)
+            except KeyboardInterrupt:
+                self.stdout.write(f'\n{len(fake.requests)} requests over {fake.connections} connections.')
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from payments.webhooks import process_events
+
+
+class Command(BaseCommand):
+    help = 'Apply stored Paystack webhook events exactly once, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Events claimed per transaction (default: 100)')
+        parser.add_argument('--max-attempts', type=int, default=5, help='Attempts before an event is marked failed (default: 5)')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new events instead of exiting when none are due')
+        parser.add_argument('--interval', type=float, default=2, help='Seconds between polls in --loop mode (default: 2)')
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        max_attempts = max(options['max_attempts'], 1)
+
+        while True:
+            processed, ignored, failed = process_events(batch_size, max_attempts)
+            if processed or ignored or failed:
+                self.stdout.write(f'Applied {processed} event(s), ignored {ignored}, {failed} failed attempt(s)')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS('Paystack events processed.'))
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from payments.reconciliation import reconcile_payments
+
+
+class Command(BaseCommand):
+    help = 'Verify stale pending Paystack payments and confirm, fail or abandon them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=int, default=5, help='Only check payments at least this many minutes old (default: 5)')
+        parser.add_argument('--batch-size', type=int, default=100, help='Payments loaded per batch (default: 100)')
+        parser.add_argument('--concurrency', type=int, default=8, help='Parallel Paystack verify calls (default: 8)')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without writing')
+        parser.add_argument('--loop', action='store_true', help='Keep sweeping instead of exiting after one pass')
+        parser.add_argument('--interval', type=float, default=60, help='Seconds between sweeps in --loop mode (default: 60)')
+
+    def handle(self, *args, **options):
+        while True:
+            result = reconcile_payments(
+                min_age_minutes=max(options['min_age'], 0),
+                batch_size=max(options['batch_size'], 1),
+                concurrency=max(options['concurrency'], 1),
+                dry_run=options['dry_run'],
+            )
+            # In --loop mode, quiet sweeps are not reported
+            if result.changes or result.errors or not options['loop']:
+                self._report(result, options)
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def _report(self, result, options):
+        if options['verbosity'] > 1:
+            for reference, outcome in result.changes:
+                self.stdout.write(f'{reference}: {outcome}')
+
+        prefix = 'Would settle' if options['dry_run'] else 'Settled'
+        self.stdout.write(
+            f'Checked {result.checked} payment(s): {result.confirmed} confirmed, {result.failed} failed, '
+            f'{result.abandoned} abandoned, {result.refund_due} to refund, {result.still_pending} still pending, {result.errors} not verifiable'
+        )
+        self.stdout.write(self.style.SUCCESS(f'{prefix} {len(result.changes)} payment(s).'))
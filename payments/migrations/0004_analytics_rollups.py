@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0009_stockreservation'),
+        ('payments', '0003_payment_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyPaymentStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('awaiting_confirmation', 'Awaiting Confirmation'), ('success', 'Successful'), ('failed', 'Failed'), ('abandoned', 'Abandoned')], max_length=25)),
+                ('payment_count', models.IntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_payment_stats', to='restaurants.restaurant')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'status'], name='daily_pay_stats_day_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailypaymentstats',
+            constraint=models.UniqueConstraint(fields=('restaurant', 'day', 'status'), name='daily_payment_stats_uniq'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0005_paystack_events'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dailypaymentstats',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('awaiting_confirmation', 'Awaiting Confirmation'), ('success', 'Successful'), ('failed', 'Failed'), ('abandoned', 'Abandoned'), ('refund_due', 'Refund Due')], max_length=25),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('awaiting_confirmation', 'Awaiting Confirmation'), ('success', 'Successful'), ('failed', 'Failed'), ('abandoned', 'Abandoned'), ('refund_due', 'Refund Due')], default='pending', max_length=25),
+        ),
+    ]
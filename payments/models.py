@@ -1,5 +1,7 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth import get_user_model
+from core.job_queue import QueuedJob
 from orders.models import Order
 
 User = get_user_model()
@@ -20,6 +22,8 @@ class Payment(models.Model):
         ('success', 'Successful'),
         ('failed', 'Failed'),
         ('abandoned', 'Abandoned'),
+        # Paystack took the money after the order was cancelled; refund it by hand
+        ('refund_due', 'Refund Due'),
     )
     
     order = models.OneToOneField(Order, on_delete=models.CASCADE)
@@ -42,10 +46,75 @@ class Payment(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='payment_keyset_idx'),
+        ]
     
     def __str__(self):
         return f"Payment #{self.reference} - {self.amount}"
     
     @property
     def is_successful(self):
-        return self.status == 'success'
\ No newline at end of file
+        return self.status == 'success'
+
+
+class DailyPaymentStats(models.Model):
+    """Payments for one restaurant's orders created on one day that are currently in one status"""
+    restaurant = models.ForeignKey('restaurants.Restaurant', on_delete=models.CASCADE, related_name='daily_payment_stats')
+    day = models.DateField()
+    status = models.CharField(max_length=25, choices=Payment.STATUS_CHOICES)
+    payment_count = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['restaurant', 'day', 'status'], name='daily_payment_stats_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['day', 'status'], name='daily_pay_stats_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.restaurant_id} {self.day} {self.status}: {self.amount}"
+
+
+class PaystackEvent(QueuedJob):
+    """Webhook delivery from Paystack, stored once and applied by process_paystack_events"""
+
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('processed', 'Processed'),
+        ('ignored', 'Ignored'),
+        ('failed', 'Failed'),
+    )
+
+    # "<event>:<data.id>", the same for every redelivery of one event
+    event_key = models.CharField(max_length=150, unique=True)
+    event_type = models.CharField(max_length=50)
+    reference = models.CharField(max_length=100, blank=True, db_index=True)
+    payload = models.JSONField()
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    deliveries = models.PositiveIntegerField(default=1)
+
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-received_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='paystack_event_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_key} ({self.status})"
+
+    def mark(self, status):
+        self.status = status
+        self.processed_at = timezone.now()
+        self.save(update_fields=['status', 'attempts', 'last_error', 'processed_at'])
+
+    @staticmethod
+    def key_for(payload):
+        data = payload.get('data') or {}
+        return f"{payload.get('event', '')}:{data.get('id') or data.get('reference') or ''}"
@@ -0,0 +1,144 @@
+"""
+Settle Paystack payments the customer never came back to verify.
+
+``manage.py reconcile_payments`` walks pending payments older than a few
+minutes in primary-key order, a batch at a time, and asks Paystack about
+each batch over a small thread pool sharing the pooled session
+(payments/services.py). Database writes stay on the calling thread.
+Run it with ``--loop`` as the Procfile ``reconcile`` process.
+
+- success: applied with webhooks.apply_charge_success, so it is a no-op if
+  the webhook or payment_verification already did it (and flags the
+  payment refund_due if its order was cancelled meanwhile)
+- failed / reversed: payment failed and order cancelled, as
+  payment_verification does
+- anything else (abandoned, ongoing, ...), including "reference not
+  found" (Paystack does not know references whose checkout was never
+  opened): once the payment is older than
+  PlatformSettings.order_timeout_minutes it is marked abandoned and its
+  order cancelled
+
+Cancelling an order puts its stock back (orders/transitions.py).
+
+Payments Paystack could not be asked about (timeouts, 5xx) are counted as
+errors and left for the next sweep, however old they are.
+"""
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.platform_settings import get_platform_settings
+from orders.transitions import transition
+
+from .models import Payment
+from .services import PaystackService
+from .webhooks import apply_charge_success
+
+logger = logging.getLogger(__name__)
+
+FAILED_STATUSES = frozenset({'failed', 'reversed'})
+
+# Paystack answered but has no such transaction (as opposed to a timeout or 5xx)
+ANSWERED_ERRORS = frozenset({400, 404})
+
+
+@dataclass
+class ReconcileResult:
+    checked: int = 0
+    confirmed: int = 0
+    failed: int = 0
+    abandoned: int = 0
+    refund_due: int = 0
+    still_pending: int = 0
+    errors: int = 0
+    changes: list = field(default_factory=list)
+
+
+def _close_unpaid(reference, payment_status, gateway_data):
+    """Move a still-pending payment to ``payment_status`` and cancel its order"""
+    with transaction.atomic():
+        payment = (
+            Payment.objects.select_for_update()
+            .select_related('order')
+            .filter(reference=reference, status='pending')
+            .first()
+        )
+        if payment is None:
+            # Settled by the webhook or the customer in the meantime
+            return False
+
+        payment.status = payment_status
+        payment.gateway_response = json.dumps(gateway_data)
+        payment.save(update_fields=['status', 'gateway_response', 'updated_at'])
+
+        order = payment.order
+        if order.status in ('pending', 'awaiting_confirmation'):
+            transition(order, 'cancelled', source='reconcile_payments')
+        return True
+
+
+def _verify(service, reference):
+    try:
+        return service.verify_transaction(reference)
+    except Exception as e:
+        return {'status': False, 'message': str(e)}
+
+
+def reconcile_payments(min_age_minutes=5, batch_size=100, concurrency=8, dry_run=False):
+    """Verify stale pending payments with Paystack and settle them; returns a ReconcileResult"""
+    now = timezone.now()
+    timeout = timedelta(minutes=get_platform_settings().order_timeout_minutes)
+    stale = Payment.objects.filter(status='pending', created_at__lte=now - timedelta(minutes=min_age_minutes))
+
+    result = ReconcileResult()
+    service = PaystackService()
+    last_pk = 0
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+        while True:
+            batch = list(
+                stale.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'reference', 'created_at')[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+
+            verifications = pool.map(lambda row: _verify(service, row[1]), batch)
+            for (pk, reference, created_at), verification in zip(batch, verifications):
+                result.checked += 1
+                answered = verification.get('status') or verification.get('http_status') in ANSWERED_ERRORS
+                data = (verification.get('data') or {}) if verification.get('status') else {}
+                remote_status = data.get('status')
+                if remote_status == 'success':
+                    outcome = 'confirmed'
+                elif remote_status in FAILED_STATUSES:
+                    outcome = 'failed'
+                elif answered and now - created_at >= timeout:
+                    # Includes "reference not found": the customer never opened the checkout
+                    outcome = 'abandoned'
+                    data = data or {'message': verification.get('message')}
+                elif not answered:
+                    logger.warning(f"Could not verify payment {reference}: {verification.get('message')}")
+                    result.errors += 1
+                    continue
+                else:
+                    result.still_pending += 1
+                    continue
+
+                if not dry_run:
+                    if outcome == 'confirmed':
+                        payment = apply_charge_success(reference, data)
+                        changed = payment is not None
+                        if changed and payment.status == 'refund_due':
+                            outcome = 'refund_due'
+                    else:
+                        changed = _close_unpaid(reference, outcome, data)
+                    if not changed:
+                        continue
+                setattr(result, outcome, getattr(result, outcome) + 1)
+                result.changes.append((reference, outcome))
+    return result
@@ -1,14 +1,80 @@
+"""
+Paystack API client.
+
+All calls in a process share one requests.Session, so repeated initialize
+and verify calls reuse kept-alive TLS connections instead of handshaking
+each time. Timeouts are split into connect and read
+(PAYSTACK_CONNECT_TIMEOUT / PAYSTACK_READ_TIMEOUT). Connection errors,
+timeouts and 502/503/504 responses are retried PAYSTACK_MAX_RETRIES times
+with jittered exponential backoff. Every POST carries an Idempotency-Key
+that stays the same across its retries, so a retried request cannot create
+a second transaction or recipient.
+
+AsyncPaystackService has the same methods as coroutines for ASGI views.
+It runs the pooled client in a worker thread, which keeps the event loop
+free without a second HTTP stack.
+
+Point PAYSTACK_BASE_URL at payments/fake_paystack.py
+(``manage.py fake_paystack``) to develop or test without the real API.
+"""
+import logging
+import random
+import threading
+import time
+import uuid
+
+import requests
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.utils.crypto import get_random_string
-import requests
-import json
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Gateway and availability errors. A 500 is returned at once like a 4xx.
+RETRY_STATUSES = frozenset({502, 503, 504})
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """The process-wide pooled session"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                pool_size = getattr(settings, 'PAYSTACK_POOL_SIZE', 10)
+                # Retries are done in PaystackService._request so they can back off with jitter
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+def close_session():
+    """Drop pooled connections (e.g. after the base URL changes)"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
 
 class PaystackService:
     def __init__(self):
         self.secret_key = settings.PAYSTACK_SECRET_KEY
         self.public_key = settings.PAYSTACK_PUBLIC_KEY
-        self.base_url = "https://api.paystack.co"
-    
+        self.base_url = getattr(settings, 'PAYSTACK_BASE_URL', 'https://api.paystack.co').rstrip('/')
+        self.timeout = (
+            getattr(settings, 'PAYSTACK_CONNECT_TIMEOUT', 5),
+            getattr(settings, 'PAYSTACK_READ_TIMEOUT', 15),
+        )
+        self.max_retries = getattr(settings, 'PAYSTACK_MAX_RETRIES', 2)
+        self.backoff = getattr(settings, 'PAYSTACK_RETRY_BACKOFF', 0.25)
+
     def get_headers(self):
         return {
             'Authorization': f'Bearer {self.secret_key}',
@@ -17,15 +83,58 @@ class PaystackService:
             'Accept': 'application/json',
             'Cache-Control': 'no-cache',
         }
-    
-    def initialize_transaction(self, email, amount, reference, callback_url=None, channels=None):
+
+    def _sleep_before_retry(self, attempt):
+        # Full jitter: anywhere between 0 and the exponential cap
+        time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+
+    def _request(self, method, path, payload=None, idempotency_key=None):
+        """Call the API and return its JSON, or {'status': False, 'message': ...} on failure"""
+        url = f"{self.base_url}{path}"
+        headers = self.get_headers()
+        if method == 'POST':
+            headers['Idempotency-Key'] = idempotency_key or uuid.uuid4().hex
+
+        session = get_session()
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                response = session.request(method, url, json=payload, headers=headers, timeout=self.timeout)
+            except requests.exceptions.Timeout:
+                logger.warning(f"Paystack {method} {path} timed out (attempt {attempt + 1})")
+                if last_attempt:
+                    return {'status': False, 'message': 'Request timed out. Please try again.'}
+            except requests.exceptions.ConnectionError as e:
+                logger.warning(f"Paystack {method} {path} connection error (attempt {attempt + 1}): {e}")
+                if last_attempt:
+                    return {'status': False, 'message': 'Connection error. Please check your internet connection.'}
+            except Exception as e:
+                logger.error(f"Paystack {method} {path} failed: {e}")
+                return {'status': False, 'message': str(e)}
+            else:
+                if response.status_code == 200:
+                    try:
+                        return response.json()
+                    except ValueError:
+                        # e.g. an HTML error page from a proxy in front of the API
+                        logger.warning(f"Paystack {method} {path} returned non-JSON: {response.text[:500]}")
+                        return {'status': False, 'message': 'Invalid response from Paystack. Please try again.'}
+                if response.status_code not in RETRY_STATUSES or last_attempt:
+                    logger.warning(f"Paystack {method} {path} returned {response.status_code}: {response.text[:500]}")
+                    return {
+                        'status': False,
+                        'message': f'HTTP Error {response.status_code}: {response.text}',
+                        'http_status': response.status_code,
+                    }
+                logger.warning(f"Paystack {method} {path} returned {response.status_code} (attempt {attempt + 1})")
+            self._sleep_before_retry(attempt)
+
+    def initialize_transaction(self, email, amount, reference, callback_url=None, channels=None, idempotency_key=None):
         """Initialize a Paystack transaction
-        
+
         channels can include: ['card', 'bank', 'ussd', 'qr', 'mobile_money', 'bank_transfer']
         - 'bank_transfer' enables Pay with Transfer (Dedicated Virtual Account)
         """
-        url = f"{self.base_url}/transaction/initialize"
-        
         payload = {
             'email': email,
             'amount': int(amount * 100),  # Paystack expects amount in kobo
@@ -33,66 +142,19 @@ class PaystackService:
             'callback_url': callback_url,
             'currency': 'NGN'
         }
-        
+
         # Add payment channels if specified
         if channels:
             payload['channels'] = channels
-        
-        try:
-            response = requests.post(
-                url,
-                json=payload,
-                headers=self.get_headers(),
-                timeout=30
-            )
-            
-            print(f"Paystack Response Status: {response.status_code}")
-            print(f"Paystack Response: {response.text[:500]}")
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                return {
-                    'status': False, 
-                    'message': f'HTTP Error {response.status_code}: {response.text}'
-                }
-                
-        except requests.exceptions.Timeout:
-            print("Paystack Error: Request timed out")
-            return {'status': False, 'message': 'Request timed out. Please try again.'}
-        except requests.exceptions.ConnectionError as e:
-            print(f"Paystack Connection Error: {str(e)}")
-            return {'status': False, 'message': 'Connection error. Please check your internet connection.'}
-        except Exception as e:
-            print(f"Paystack Error: {str(e)}")
-            return {'status': False, 'message': str(e)}
-    
+
+        return self._request('POST', '/transaction/initialize', payload, idempotency_key)
+
     def verify_transaction(self, reference):
         """Verify a Paystack transaction"""
-        url = f"{self.base_url}/transaction/verify/{reference}"
-        
-        try:
-            response = requests.get(
-                url,
-                headers=self.get_headers(),
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                return {
-                    'status': False,
-                    'message': f'HTTP Error {response.status_code}: {response.text}'
-                }
-                
-        except Exception as e:
-            return {'status': False, 'message': str(e)}
-    
-    def create_transfer_recipient(self, name, account_number, bank_code):
+        return self._request('GET', f'/transaction/verify/{reference}')
+
+    def create_transfer_recipient(self, name, account_number, bank_code, idempotency_key=None):
         """Create a transfer recipient for restaurant payouts"""
-        url = f"{self.base_url}/transferrecipient"
-        
         payload = {
             'type': 'nuban',
             'name': name,
@@ -100,44 +162,34 @@ class PaystackService:
             'bank_code': bank_code,
             'currency': 'NGN'
         }
-        
-        try:
-            response = requests.post(
-                url,
-                json=payload,
-                headers=self.get_headers(),
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                return {
-                    'status': False,
-                    'message': f'HTTP Error {response.status_code}: {response.text}'
-                }
-                
-        except Exception as e:
-            return {'status': False, 'message': str(e)}
-    
+        return self._request('POST', '/transferrecipient', payload, idempotency_key)
+
     def list_banks(self):
         """List all Nigerian banks"""
-        url = f"{self.base_url}/bank"
-        
-        try:
-            response = requests.get(
-                url,
-                headers=self.get_headers(),
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                return {'status': False, 'message': f'HTTP Error {response.status_code}'}
-                
-        except Exception as e:
-            return {'status': False, 'message': str(e)}
+        return self._request('GET', '/bank')
+
+
+class AsyncPaystackService:
+    """PaystackService for async views: same methods, awaitable"""
+
+    def __init__(self):
+        self._service = PaystackService()
+
+    async def _call(self, method, *args, **kwargs):
+        # Not thread-sensitive: calls may run in parallel on the shared pool
+        return await sync_to_async(getattr(self._service, method), thread_sensitive=False)(*args, **kwargs)
+
+    async def initialize_transaction(self, *args, **kwargs):
+        return await self._call('initialize_transaction', *args, **kwargs)
+
+    async def verify_transaction(self, reference):
+        return await self._call('verify_transaction', reference)
+
+    async def create_transfer_recipient(self, *args, **kwargs):
+        return await self._call('create_transfer_recipient', *args, **kwargs)
+
+    async def list_banks(self):
+        return await self._call('list_banks')
 
 
 def generate_payment_reference():
@@ -0,0 +1,22 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from orders.rollups import PAYMENT_ROLLUP
+
+from .models import Payment
+
+
+# Analytics rollups (orders/rollups.py)
+@receiver(pre_save, sender=Payment)
+def load_payment_rollup_state(sender, instance, update_fields=None, **kwargs):
+    PAYMENT_ROLLUP.prepare(instance, update_fields)
+
+
+@receiver(post_save, sender=Payment)
+def update_payment_rollups(sender, instance, created, **kwargs):
+    PAYMENT_ROLLUP.saved(instance, created)
+
+
+@receiver(post_delete, sender=Payment)
+def remove_payment_from_rollups(sender, instance, **kwargs):
+    PAYMENT_ROLLUP.deleted(instance)
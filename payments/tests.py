@@ -1,3 +1,150 @@
-from django.test import TestCase
+import asyncio
+import socket
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from accounts.models import CustomUser
+from core.models import AuditLog
+from orders.models import Order
+from restaurants.models import Category, MenuItem, Restaurant
+
+from .fake_paystack import FakePaystackServer
+from .models import Payment
+from .services import AsyncPaystackService, PaystackService, close_session
+from .webhooks import apply_charge_success
+
+
+class PaystackServiceTests(SimpleTestCase):
+    """PaystackService against payments/fake_paystack.py"""
+
+    def setUp(self):
+        self.fake = FakePaystackServer().start()
+        self.addCleanup(self.fake.stop)
+        settings = override_settings(
+            PAYSTACK_BASE_URL=self.fake.url, PAYSTACK_SECRET_KEY='sk_test', PAYSTACK_PUBLIC_KEY='pk_test',
+            PAYSTACK_MAX_RETRIES=2, PAYSTACK_RETRY_BACKOFF=0,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(close_session)
+        self.service = PaystackService()
+
+    def test_initialize_and_verify(self):
+        result = self.service.initialize_transaction('c@example.com', 1500, 'PAY_1')
+        self.assertTrue(result['status'])
+        self.fake.complete('PAY_1')
+        self.assertEqual(self.service.verify_transaction('PAY_1')['data']['status'], 'success')
+
+    def test_retries_server_errors_with_the_same_idempotency_key(self):
+        self.fake.fail_next(2)
+        result = self.service.initialize_transaction('c@example.com', 1500, 'PAY_1')
+        self.assertTrue(result['status'])
+        keys = [request['idempotency_key'] for request in self.fake.requests]
+        self.assertEqual(len(keys), 3)
+        self.assertEqual(len(set(keys)), 1)
+
+    def test_repeated_idempotency_key_does_not_create_a_second_transaction(self):
+        first = self.service.create_transfer_recipient('Mama Put', '0123456789', '058', idempotency_key='k1')
+        again = self.service.create_transfer_recipient('Mama Put', '0123456789', '058', idempotency_key='k1')
+        self.assertEqual(first['data']['recipient_code'], again['data']['recipient_code'])
+        self.assertEqual(len(self.fake.recipients), 1)
+
+    def test_gives_up_after_max_retries(self):
+        self.fake.fail_next(3, status=503)
+        result = self.service.list_banks()
+        self.assertFalse(result['status'])
+        self.assertEqual(result['http_status'], 503)
+        self.assertEqual(len(self.fake.requests), 3)
+
+    def test_client_errors_are_not_retried(self):
+        result = self.service.verify_transaction('PAY_UNKNOWN')
+        self.assertFalse(result['status'])
+        self.assertEqual(result['http_status'], 400)
+        self.assertEqual(len(self.fake.requests), 1)
+
+    def test_internal_server_errors_are_not_retried(self):
+        self.fake.fail_next(1, status=500)
+        result = self.service.list_banks()
+        self.assertEqual(result['http_status'], 500)
+        self.assertEqual(len(self.fake.requests), 1)
+
+    def test_non_json_response_is_a_failure(self):
+        self.fake.fail_next(1, status=200, body='<html>Bad gateway</html>')
+        result = self.service.list_banks()
+        self.assertFalse(result['status'])
+        self.assertIn('Invalid response', result['message'])
+
+    def test_connection_errors_are_retried_then_reported(self):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            closed_port = sock.getsockname()[1]
+        with override_settings(PAYSTACK_BASE_URL=f'http://127.0.0.1:{closed_port}'):
+            result = PaystackService().list_banks()
+        self.assertFalse(result['status'])
+        self.assertIn('Connection error', result['message'])
+
+    async def test_async_initialize_and_verify(self):
+        service = AsyncPaystackService()
+        result = await service.initialize_transaction('c@example.com', 1500, 'PAY_1')
+        self.assertTrue(result['status'])
+        self.fake.complete('PAY_1')
+        self.assertEqual((await service.verify_transaction('PAY_1'))['data']['status'], 'success')
+
+    async def test_async_retries_with_the_same_idempotency_key(self):
+        self.fake.fail_next(2, status=504)
+        result = await AsyncPaystackService().create_transfer_recipient('Mama Put', '0123456789', '058')
+        self.assertTrue(result['status'])
+        keys = [request['idempotency_key'] for request in self.fake.requests]
+        self.assertEqual(len(keys), 3)
+        self.assertEqual(len(set(keys)), 1)
+
+    async def test_async_calls_can_run_together(self):
+        service = AsyncPaystackService()
+        results = await asyncio.gather(*(
+            service.initialize_transaction('c@example.com', 1500, f'PAY_{i}') for i in range(5)
+        ))
+        self.assertTrue(all(result['status'] for result in results))
+        self.assertEqual(len(self.fake.transactions), 5)
+
+
+class ApplyChargeSuccessTests(TestCase):
+    def setUp(self):
+        owner = CustomUser.objects.create_user('owner', 'owner@example.com', 'pw', role='restaurant_owner')
+        customer = CustomUser.objects.create_user('customer', 'customer@example.com', 'pw', role='customer')
+        restaurant = Restaurant.objects.create(
+            owner=owner, name='Mama Put', slug='mama-put', address='1 Road', phone='080',
+            email='mama@example.com', opening_time='09:00', closing_time='21:00',
+        )
+        category = Category.objects.create(restaurant=restaurant, name='Mains')
+        self.suya = MenuItem.objects.create(category=category, name='Suya', price=2000, track_stock=True, stock_quantity=3)
+        self.order = Order.objects.create(
+            customer=customer, restaurant=restaurant, total_price=2000, payment_method='paystack',
+            customer_name='Ada', customer_phone='080', customer_email='ada@example.com',
+        )
+        self.payment = Payment.objects.create(
+            order=self.order, amount=2000, reference='PAY_1', payment_method='paystack',
+            customer_email='ada@example.com', customer_name='Ada',
+        )
+
+    def test_confirms_the_order(self):
+        self.assertIsNotNone(apply_charge_success('PAY_1', {'id': 42}))
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'confirmed')
+        self.assertIsNone(apply_charge_success('PAY_1', {'id': 42}))
+
+    def test_cancelled_order_is_flagged_for_refund_instead_of_revived(self):
+        Order.objects.filter(pk=self.order.pk).update(status='cancelled')
+        Payment.objects.filter(pk=self.payment.pk).update(status='abandoned')
+
+        payment = apply_charge_success('PAY_1', {'id': 42})
+
+        self.assertEqual(payment.status, 'refund_due')
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'cancelled')
+        self.suya.refresh_from_db()
+        self.assertEqual(self.suya.stock_quantity, 3)
+        entry = AuditLog.objects.get(action_type='payment_refund_due')
+        self.assertEqual(entry.target_id, self.payment.pk)
+        # A redelivery changes nothing more
+        self.assertIsNone(apply_charge_success('PAY_1', {'id': 42}))
+        self.assertEqual(AuditLog.objects.filter(action_type='payment_refund_due').count(), 1)
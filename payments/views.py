@@ -10,14 +10,20 @@ import hmac
 import hashlib
 
 from .models import Payment
-from orders.models import Order, OrderItem
-from restaurants.models import MenuItem, Restaurant
+from django.db import transaction
+from orders.models import Order
+from orders.checkout import CheckoutError, create_order_items, lock_cart_menu_items
+from orders.transitions import InvalidTransition, transition
+from core.pagination import KeysetPaginator, paginate_keyset
+from restaurants.models import Restaurant
 from orders.cart import Cart
 from .services import PaystackService, generate_payment_reference
-from core.email_service import send_order_confirmation, send_order_notification_to_restaurant, send_payment_confirmation
+from .webhooks import apply_charge_success, record_event
 from django.http import JsonResponse
 from django.urls import reverse
 
+REFUND_DUE_MESSAGE = 'We received your payment, but this order had already been cancelled. It will be refunded.'
+
 @login_required
 def initiate_payment(request):
     """Initiate payment process - create order and redirect to Paystack"""
@@ -38,45 +44,38 @@ def initiate_payment(request):
     # Get restaurant
     restaurant = get_object_or_404(Restaurant, id=restaurant_id)
     
-    # Validate cart items are still available
-    for item in cart_items:
-        menu_item = get_object_or_404(MenuItem, id=item['menu_item_id'])
-        if not menu_item.is_available:
-            messages.error(request, f"{menu_item.name} is no longer available. Please update your cart.")
-            return redirect('view_cart')
-    
     try:
-        # Create order first
-        order = Order.objects.create(
-            customer=request.user,
-            restaurant=restaurant,
-            total_price=total_price,
-            customer_name=request.user.get_full_name() or request.user.username,
-            customer_phone=request.user.phone_number or '',
-            customer_email=request.user.email or f"{request.user.username}@example.com"
-        )
-        
-        # Create order items
-        for item in cart_items:
-            menu_item = get_object_or_404(MenuItem, id=item['menu_item_id'])
-            OrderItem.objects.create(
+        with transaction.atomic():
+            # Validate cart items are still available (locks stock-tracked rows)
+            try:
+                menu_items = lock_cart_menu_items(cart_items, cart.reservation_key)
+            except CheckoutError as e:
+                messages.error(request, str(e))
+                return redirect('view_cart')
+            
+            # Create order first
+            order = Order.objects.create(
+                customer=request.user,
+                restaurant=restaurant,
+                total_price=total_price,
+                customer_name=request.user.get_full_name() or request.user.username,
+                customer_phone=request.user.phone_number or '',
+                customer_email=request.user.email or f"{request.user.username}@example.com"
+            )
+            
+            # Create order items
+            create_order_items(order, cart_items, menu_items, cart.reservation_key)
+            
+            # Create payment record
+            payment_reference = generate_payment_reference()
+            payment = Payment.objects.create(
                 order=order,
-                menu_item=menu_item,
-                quantity=item['quantity'],
-                price=item['price'],
-                special_requests=item['special_requests']
+                amount=total_price,
+                reference=payment_reference,
+                customer_email=request.user.email or f"{request.user.username}@example.com",
+                customer_name=request.user.get_full_name() or request.user.username
             )
         
-        # Create payment record
-        payment_reference = generate_payment_reference()
-        payment = Payment.objects.create(
-            order=order,
-            amount=total_price,
-            reference=payment_reference,
-            customer_email=request.user.email or f"{request.user.username}@example.com",
-            customer_name=request.user.get_full_name() or request.user.username
-        )
-        
         # Initialize Paystack payment
         paystack_service = PaystackService()
         callback_url = request.build_absolute_uri(reverse('payments:payment_verification', args=[payment_reference]))
@@ -107,8 +106,10 @@ def initiate_payment(request):
             else:
                 messages.error(request, f'Payment initialization failed: {error_msg}')
             
-            # Delete the created order since payment failed
-            order.delete()
+            # Delete the created order since payment failed (cancelling first returns its stock)
+            with transaction.atomic():
+                transition(order, 'cancelled', source='paystack_init_failed', validate=False)
+                order.delete()
             return redirect('checkout')
             
     except Exception as e:
@@ -125,31 +126,25 @@ def payment_verification(request, reference):
     verification = paystack_service.verify_transaction(reference)
     
     if verification.get('status') and verification['data']['status'] == 'success':
-        # Payment successful
-        payment.status = 'success'
-        payment.paystack_reference = verification['data']['reference']
-        payment.gateway_response = json.dumps(verification['data'])
-        payment.save()
-        
-        # Update order status
-        payment.order.status = 'confirmed'
-        payment.order.save()
+        # Payment successful; a no-op if the webhook (or a refresh) got here first
+        apply_charge_success(reference, verification['data'])
+        payment.refresh_from_db(fields=['status'])
+        if payment.status == 'refund_due':
+            messages.warning(request, REFUND_DUE_MESSAGE)
+            return redirect('payments:payment_failed', reference=reference)
         
         # Clear cart
         cart = Cart(request)
         cart.clear()
         
-        # Send email notifications
-        try:
-            send_order_confirmation(payment.order)
-            send_order_notification_to_restaurant(payment.order)
-            send_payment_confirmation(payment)
-        except Exception as e:
-            # Log email error but don't break the flow
-            print(f"Email sending failed: {e}")
-        
         messages.success(request, 'Payment successful! Your order has been confirmed.')
         return redirect('payments:payment_success', reference=reference)
+    elif payment.status == 'success':
+        # Already confirmed by the webhook; a flaky verify call must not undo it
+        return redirect('payments:payment_success', reference=reference)
+    elif payment.status == 'refund_due':
+        messages.warning(request, REFUND_DUE_MESSAGE)
+        return redirect('payments:payment_failed', reference=reference)
     else:
         # Payment failed
         payment.status = 'failed'
@@ -157,8 +152,11 @@ def payment_verification(request, reference):
         payment.save()
         
         # Update order status to reflect payment failure
-        payment.order.status = 'cancelled'
-        payment.order.save()
+        try:
+            transition(payment.order, 'cancelled', user=request.user, source='payment_verification')
+        except InvalidTransition:
+            # Already past the point where a failed charge cancels it
+            pass
         
         messages.error(request, 'Payment failed. Please try again.')
         return redirect('payments:payment_failed', reference=reference)
@@ -223,10 +221,11 @@ def payment_history(request):
         if restaurant:
             payments = payments.filter(order__restaurant=restaurant)
 
-    payments = payments.order_by('-created_at')
+    payments = paginate_keyset(request, payments.select_related('order'))
 
     context = {
         'payments': payments,
+        'page_obj': payments,
         'filter_restaurant': restaurant,
     }
     return render(request, 'payments/payment_history.html', context)
@@ -234,21 +233,18 @@ def payment_history(request):
 
 @login_required
 def ajax_restaurant_payments(request, restaurant_slug):
-    """Return paginated JSON of the requesting customer's payments for a given restaurant."""
+    """Return cursor-paginated JSON of the requesting customer's payments for a given restaurant.
+
+    Pass the previous response's next_cursor as ?cursor= to get the next page.
+    """
     if not request.user.is_authenticated or request.user.role != 'customer':
         return JsonResponse({'error': 'Unauthorized'}, status=403)
 
     restaurant = get_object_or_404(Restaurant, slug=restaurant_slug, is_active=True)
-    try:
-        page = int(request.GET.get('page', 1))
-    except ValueError:
-        page = 1
     per = 5
-    offset = (page - 1) * per
 
-    qs = Payment.objects.filter(order__customer=request.user, order__restaurant=restaurant).order_by('-created_at')
-    total = qs.count()
-    payments = qs[offset:offset+per]
+    qs = Payment.objects.filter(order__customer=request.user, order__restaurant=restaurant)
+    payments = KeysetPaginator(qs, per).get_page(request.GET.get('cursor'))
 
     data = []
     for p in payments:
@@ -259,7 +255,7 @@ def ajax_restaurant_payments(request, restaurant_slug):
             'detail_url': reverse('payments:payment_detail', args=[p.reference])
         })
 
-    return JsonResponse({'payments': data, 'total': total, 'page': page, 'per': per})
+    return JsonResponse({'payments': data, 'next_cursor': payments.next_cursor, 'has_next': payments.has_next, 'per': per})
 
 @login_required
 def payment_detail(request, reference):
@@ -298,28 +294,8 @@ def paystack_webhook(request):
 
             payload = json.loads(request.body)
 
-            # Handle Paystack "charge.success" events
-            if payload.get('event') == 'charge.success':
-                reference = payload['data']['reference']
-                
-                # Update payment status
-                payment = get_object_or_404(Payment, reference=reference)
-                payment.status = 'success'
-                payment.paystack_reference = payload['data']['id']
-                payment.gateway_response = json.dumps(payload['data'])
-                payment.save()
-                
-                # Update order status
-                payment.order.status = 'confirmed'
-                payment.order.save()
-                
-                # Send email notifications
-                try:
-                    send_order_confirmation(payment.order)
-                    send_order_notification_to_restaurant(payment.order)
-                    send_payment_confirmation(payment)
-                except Exception as e:
-                    print(f"Email sending failed in webhook: {e}")
+            # Store it and acknowledge; process_paystack_events applies it once
+            record_event(payload)
             
             return JsonResponse({'status': 'success'})
         
@@ -0,0 +1,139 @@
+"""
+Paystack webhook ingest.
+
+The webhook view only checks the signature and stores the delivery as a
+PaystackEvent keyed on "<event>:<data.id>", then answers 200 straight
+away. Paystack retries deliveries it considers failed or slow, so the
+same event can arrive many times; the unique key turns every repeat into
+a counter bump instead of a second row.
+
+``manage.py process_paystack_events`` applies stored events. Applying a
+charge.success locks the payment row and does nothing if it is already
+settled, so the payment/order status flip and the three notification
+emails happen once however often the event (or the customer's return to
+payment_verification) is seen.
+
+A charge for an order that was cancelled meanwhile (by reconcile_payments,
+a failed verification or staff) does not revive it: cancelling already
+put its stock back, so confirming it could oversell. The payment is marked
+refund_due and an audit entry asks an admin to refund it.
+"""
+import json
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from core.email_service import send_order_confirmation, send_order_notification_to_restaurant, send_payment_confirmation
+from core.job_queue import claim_due
+from core.models import AuditLog
+from orders.transitions import transition
+
+from .models import Payment, PaystackEvent
+
+logger = logging.getLogger(__name__)
+
+# Payment statuses a charge.success has already been applied to
+SETTLED_STATUSES = frozenset({'success', 'refund_due'})
+
+
+def record_event(payload):
+    """Store a webhook delivery; returns (event, created)"""
+    data = payload.get('data') or {}
+    key = PaystackEvent.key_for(payload)
+    try:
+        with transaction.atomic():
+            event = PaystackEvent.objects.create(
+                event_key=key,
+                event_type=payload.get('event', ''),
+                reference=str(data.get('reference') or '')[:100],
+                payload=payload,
+            )
+        return event, True
+    except IntegrityError:
+        PaystackEvent.objects.filter(event_key=key).update(deliveries=F('deliveries') + 1)
+        return None, False
+
+
+def apply_charge_success(reference, data):
+    """Mark the payment and its order paid, once.
+
+    Returns the payment if this call made the change (its status is
+    refund_due if the order had been cancelled), None if the payment was
+    already settled or does not exist.
+    """
+    with transaction.atomic():
+        payment = (
+            Payment.objects.select_for_update()
+            .select_related('order', 'order__restaurant', 'order__customer')
+            .filter(reference=reference)
+            .first()
+        )
+        if payment is None or payment.status in SETTLED_STATUSES:
+            return None
+
+        payment.paystack_reference = str(data.get('id') or data.get('reference') or '')
+        payment.gateway_response = json.dumps(data)
+        order = payment.order
+        if order.status == 'cancelled':
+            payment.status = 'refund_due'
+            payment.save()
+            AuditLog.log(
+                user=None,
+                action_type='payment_refund_due',
+                description=f'Paystack charged {payment.amount} for order #{order.id} after it was cancelled. '
+                            f'Refund payment {reference}.',
+                target_model='Payment',
+                target_id=payment.pk,
+                extra_data={'order_id': order.id, 'reference': reference, 'amount': str(payment.amount)},
+            )
+            logger.warning(f"Payment {reference} succeeded for cancelled order {order.id}; flagged for refund")
+            return payment
+
+        payment.status = 'success'
+        payment.save()
+
+        transition(payment.order, 'confirmed', source='paystack', validate=False)
+
+        # Queued in the same transaction (EMAIL_QUEUE_ENABLED), so they exist iff the flip does
+        try:
+            send_order_confirmation(payment.order)
+            send_order_notification_to_restaurant(payment.order)
+            send_payment_confirmation(payment)
+        except Exception as e:
+            logger.error(f"Email sending failed for payment {reference}: {e}")
+        return payment
+
+
+def handle_event(event):
+    """Apply one stored event; returns the status to record for it"""
+    if event.event_type != 'charge.success':
+        return 'ignored'
+    data = event.payload.get('data') or {}
+    if not Payment.objects.filter(reference=event.reference).exists():
+        event.last_error = f'No payment with reference {event.reference!r}'
+        return 'ignored'
+    apply_charge_success(event.reference, data)
+    return 'processed'
+
+
+def process_events(batch_size=100, max_attempts=5):
+    """Apply due events batch by batch until none are left; returns (processed, ignored, failed)"""
+    counts = {'processed': 0, 'ignored': 0, 'failed': 0}
+    while True:
+        with transaction.atomic():
+            batch = claim_due(PaystackEvent, batch_size)
+            if not batch:
+                break
+            for event in batch:
+                try:
+                    with transaction.atomic():
+                        status = handle_event(event)
+                except Exception as e:
+                    logger.warning(f"Paystack event {event.event_key} failed: {e}")
+                    event.schedule_retry(e, max_attempts)
+                    counts['failed'] += 1
+                else:
+                    event.mark(status)
+                    counts[status] += 1
+    return counts['processed'], counts['ignored'], counts['failed']
@@ -3,6 +3,7 @@ from django.contrib import admin
 from .models import Restaurant, Category, MenuItem, GalleryImage
 from restaurants.management.commands.populate_sample_menus import SAMPLE_MENUS
 from .admin_actions import add_buca_sample_menu
+from .menu_cache import invalidate_menu_for_items
 from . import admin_menu_loader  # Enables menu data upload admin
 
 # Register custom admin view for menu data loader
@@ -153,12 +154,16 @@ class MenuItemAdmin(admin.ModelAdmin):
     actions = ['make_available', 'make_unavailable']
     
     def make_available(self, request, queryset):
+        item_ids = list(queryset.values_list('pk', flat=True))
         updated = queryset.update(is_available=True)
+        invalidate_menu_for_items(item_ids)
         self.message_user(request, f'{updated} menu items made available.')
     make_available.short_description = "Make selected items available"
     
     def make_unavailable(self, request, queryset):
+        item_ids = list(queryset.values_list('pk', flat=True))
         updated = queryset.update(is_available=False)
+        invalidate_menu_for_items(item_ids)
         self.message_user(request, f'{updated} menu items made unavailable.')
     make_unavailable.short_description = "Make selected items unavailable"
 
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class RestaurantsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'restaurants'
+
+    def ready(self):
+        # Import signals to ensure they are registered
+        try:
+            from . import signals  # noqa: F401
+        except Exception:
+            pass
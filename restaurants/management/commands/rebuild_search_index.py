@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from restaurants.search import rebuild_all
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the restaurant search documents (and so the full-text index) from scratch'
+
+    def handle(self, *args, **options):
+        written = rebuild_all()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt search documents for {written} restaurant(s).'))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from restaurants.stock import release_expired
+
+
+class Command(BaseCommand):
+    help = 'Return stock held by expired cart reservations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep releasing instead of exiting after one pass')
+        parser.add_argument('--interval', type=float, default=60, help='Seconds between passes in --loop mode (default: 60)')
+
+    def handle(self, *args, **options):
+        while True:
+            restocked = release_expired()
+            if restocked or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f'Released expired reservations for {restocked} menu item(s).'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
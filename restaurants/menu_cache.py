@@ -0,0 +1,102 @@
+"""
+Cached menu snapshots for the public restaurant page.
+
+restaurant_detail used to rebuild the category/menu-item tree on every hit.
+The tree is now serialised once per restaurant into plain dicts and kept in
+the cache. Anonymous visitors are also served a pre-rendered HTML fragment
+of the menu section. MenuItem, Category and Restaurant signals (see
+restaurants/signals.py) and the stock service drop both entries whenever
+the menu changes. MENU_CACHE_TTL bounds how long a missed invalidation can
+last.
+"""
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core.cache_namespaces import NamespacedCache, bump_version
+
+cache = NamespacedCache('menus')
+
+MENU_CACHE_TTL = getattr(settings, 'MENU_CACHE_TTL', 3600)
+
+
+def _snapshot_key(restaurant_id):
+    return f"menu:snapshot:{restaurant_id}"
+
+
+def _fragment_key(restaurant_id):
+    return f"menu:fragment:anon:{restaurant_id}"
+
+
+def build_menu_snapshot(restaurant_id):
+    """Serialise a restaurant's categories and items (two queries)"""
+    from .models import Category
+
+    categories = Category.objects.filter(restaurant_id=restaurant_id).prefetch_related('menuitem_set')
+    snapshot = []
+    for category in categories:
+        snapshot.append({
+            'id': category.id,
+            'name': category.name,
+            'description': category.description,
+            'menu_items': [
+                {
+                    'id': item.id,
+                    'name': item.name,
+                    'description': item.description,
+                    'price': str(item.price),
+                    'image_url': item.image.url if item.image else '',
+                    'is_available': item.is_available,
+                }
+                for item in category.menuitem_set.all()
+            ],
+        })
+    return snapshot
+
+
+def get_menu_snapshot(restaurant_id):
+    """Menu snapshot for a restaurant, built on a cache miss"""
+    key = _snapshot_key(restaurant_id)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_menu_snapshot(restaurant_id)
+        cache.set(key, snapshot, MENU_CACHE_TTL)
+    return snapshot
+
+
+def get_anonymous_menu_html(restaurant_id):
+    """Rendered menu section as seen by logged-out visitors"""
+    key = _fragment_key(restaurant_id)
+    html = cache.get(key)
+    if html is None:
+        html = render_to_string('restaurants/menu_section.html', {
+            'categories': get_menu_snapshot(restaurant_id),
+        })
+        cache.set(key, str(html), MENU_CACHE_TTL)
+    return mark_safe(html)
+
+
+def invalidate_menu(*restaurant_ids):
+    """Drop the cached snapshot and fragment of the given restaurants"""
+    keys = []
+    for restaurant_id in restaurant_ids:
+        if restaurant_id is not None:
+            keys += [_snapshot_key(restaurant_id), _fragment_key(restaurant_id)]
+    if keys:
+        cache.delete_many(keys)
+        # Dish typeahead answers (restaurants/typeahead.py) and the home page
+        # feeds (core/home_feeds.py) span every menu
+        bump_version('typeahead')
+        bump_version('feeds')
+
+
+def invalidate_menu_for_items(menu_item_ids):
+    """Drop cached menus of the restaurants owning these menu items"""
+    from .models import MenuItem
+
+    restaurant_ids = (
+        MenuItem.objects.filter(pk__in=menu_item_ids)
+        .values_list('category__restaurant_id', flat=True)
+        .distinct()
+    )
+    invalidate_menu(*restaurant_ids)
@@ -0,0 +1,110 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+DOCUMENTS = 'restaurants_restaurantsearchdocument'
+FTS = 'restaurants_search_fts'
+
+POSTGRES_FORWARD = [
+    f"""ALTER TABLE {DOCUMENTS} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(body, '')), 'B')
+    ) STORED""",
+    f"CREATE INDEX restaurant_search_vector_idx ON {DOCUMENTS} USING GIN (search_vector)",
+]
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS restaurant_search_vector_idx",
+    f"ALTER TABLE {DOCUMENTS} DROP COLUMN IF EXISTS search_vector",
+]
+
+# External-content FTS5 table: the text lives in the documents table only
+SQLITE_FORWARD = [
+    f"""CREATE VIRTUAL TABLE {FTS} USING fts5(
+        name, body, content='{DOCUMENTS}', content_rowid='restaurant_id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER {FTS}_insert AFTER INSERT ON {DOCUMENTS} BEGIN
+        INSERT INTO {FTS}(rowid, name, body) VALUES (new.restaurant_id, new.name, new.body);
+    END""",
+    f"""CREATE TRIGGER {FTS}_delete AFTER DELETE ON {DOCUMENTS} BEGIN
+        INSERT INTO {FTS}({FTS}, rowid, name, body) VALUES ('delete', old.restaurant_id, old.name, old.body);
+    END""",
+    f"""CREATE TRIGGER {FTS}_update AFTER UPDATE ON {DOCUMENTS} BEGIN
+        INSERT INTO {FTS}({FTS}, rowid, name, body) VALUES ('delete', old.restaurant_id, old.name, old.body);
+        INSERT INTO {FTS}(rowid, name, body) VALUES (new.restaurant_id, new.name, new.body);
+    END""",
+]
+SQLITE_REVERSE = [
+    f"DROP TRIGGER IF EXISTS {FTS}_insert",
+    f"DROP TRIGGER IF EXISTS {FTS}_delete",
+    f"DROP TRIGGER IF EXISTS {FTS}_update",
+    f"DROP TABLE IF EXISTS {FTS}",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_FORWARD)
+    elif vendor == 'sqlite':
+        try:
+            _run(schema_editor, SQLITE_FORWARD)
+        except Exception:
+            # SQLite without FTS5: restaurants/search.py falls back to a plain scan
+            pass
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_REVERSE)
+    elif vendor == 'sqlite':
+        _run(schema_editor, SQLITE_REVERSE)
+
+
+def build_documents(apps, schema_editor):
+    Restaurant = apps.get_model('restaurants', 'Restaurant')
+    Category = apps.get_model('restaurants', 'Category')
+    MenuItem = apps.get_model('restaurants', 'MenuItem')
+    RestaurantSearchDocument = apps.get_model('restaurants', 'RestaurantSearchDocument')
+
+    categories, items = {}, {}
+    for restaurant_id, name in Category.objects.values_list('restaurant_id', 'name').iterator():
+        categories.setdefault(restaurant_id, []).append(name)
+    for restaurant_id, name in MenuItem.objects.values_list('category__restaurant_id', 'name').iterator():
+        items.setdefault(restaurant_id, []).append(name)
+    RestaurantSearchDocument.objects.bulk_create([
+        RestaurantSearchDocument(
+            restaurant_id=pk,
+            name=name,
+            body=' '.join(filter(None, [description, *categories.get(pk, []), *items.get(pk, [])])),
+        )
+        for pk, name, description in Restaurant.objects.values_list('pk', 'name', 'description').iterator()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0009_stockreservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RestaurantSearchDocument',
+            fields=[
+                ('restaurant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='restaurants.restaurant')),
+                ('name', models.CharField(max_length=100)),
+                ('body', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(build_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,80 @@
+from django.db import migrations
+
+ITEMS = 'restaurants_menuitem'
+FTS = 'restaurants_menuitem_fts'
+
+POSTGRES_FORWARD = [
+    f"""ALTER TABLE {ITEMS} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+    ) STORED""",
+    f"CREATE INDEX menuitem_search_vector_idx ON {ITEMS} USING GIN (search_vector)",
+]
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS menuitem_search_vector_idx",
+    f"ALTER TABLE {ITEMS} DROP COLUMN IF EXISTS search_vector",
+]
+
+# External-content FTS5 table over the menu items themselves. The prefix
+# option keeps ready-made indexes for 2, 3 and 4 character prefixes.
+# Updates only touch it when the name or description is written, not on
+# stock changes.
+SQLITE_FORWARD = [
+    f"""CREATE VIRTUAL TABLE {FTS} USING fts5(
+        name, description, content='{ITEMS}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3 4'
+    )""",
+    f"""CREATE TRIGGER {FTS}_insert AFTER INSERT ON {ITEMS} BEGIN
+        INSERT INTO {FTS}(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    f"""CREATE TRIGGER {FTS}_delete AFTER DELETE ON {ITEMS} BEGIN
+        INSERT INTO {FTS}({FTS}, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+    END""",
+    f"""CREATE TRIGGER {FTS}_update AFTER UPDATE OF name, description ON {ITEMS} BEGIN
+        INSERT INTO {FTS}({FTS}, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO {FTS}(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    f"INSERT INTO {FTS}({FTS}) VALUES ('rebuild')",
+]
+SQLITE_REVERSE = [
+    f"DROP TRIGGER IF EXISTS {FTS}_insert",
+    f"DROP TRIGGER IF EXISTS {FTS}_delete",
+    f"DROP TRIGGER IF EXISTS {FTS}_update",
+    f"DROP TABLE IF EXISTS {FTS}",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_FORWARD)
+    elif vendor == 'sqlite':
+        try:
+            _run(schema_editor, SQLITE_FORWARD)
+        except Exception:
+            # SQLite without FTS5: restaurants/typeahead.py falls back to a plain scan
+            pass
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_REVERSE)
+    elif vendor == 'sqlite':
+        _run(schema_editor, SQLITE_REVERSE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0010_restaurant_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -137,6 +137,17 @@ class Restaurant(models.Model):
     def __str__(self):
         return self.name
 
+class RestaurantSearchDocument(models.Model):
+    """Denormalised search text for one restaurant, kept up to date by restaurants/search.py"""
+    restaurant = models.OneToOneField(Restaurant, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    name = models.CharField(max_length=100)
+    # Description, category names and menu item names
+    body = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Search document for {self.name}"
+
 class GalleryImage(models.Model):
     restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='gallery_images')
     image = models.ImageField(upload_to='restaurant_gallery/')
@@ -232,22 +243,18 @@ class MenuItem(models.Model):
         return self.is_available
     
     def reduce_stock(self, quantity=1):
-        """Reduce stock after an order"""
-        if self.track_stock and self.stock_quantity >= quantity:
-            self.stock_quantity -= quantity
-            if self.stock_quantity == 0:
-                self.is_available = False
-            self.save()
+        """Reduce stock after an order (atomic, never goes below zero)"""
+        from .stock import reduce_stock
+        if reduce_stock(self.pk, quantity):
+            self.refresh_from_db(fields=['stock_quantity', 'is_available', 'updated_at'])
             return True
         return False
     
     def add_stock(self, quantity):
         """Add stock (restock)"""
-        if self.track_stock:
-            self.stock_quantity += quantity
-            if self.stock_quantity > 0 and not self.is_available:
-                self.is_available = True
-            self.save()
+        from .stock import add_stock
+        if add_stock(self.pk, quantity):
+            self.refresh_from_db(fields=['stock_quantity', 'is_available', 'updated_at'])
 
 
 class Staff(models.Model):
@@ -388,4 +395,23 @@ class StaffInvite(models.Model):
     
     @property
     def is_valid(self):
-        return not self.is_accepted and not self.is_expired
\ No newline at end of file
+        return not self.is_accepted and not self.is_expired
+
+class StockReservation(models.Model):
+    """Stock held for a cart until checkout or expiry (see restaurants/stock.py)"""
+    
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='stock_reservations')
+    cart_key = models.CharField(max_length=100, help_text="Cart holding the stock, e.g. user:12 or session:<key>")
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['expires_at']
+        unique_together = ['cart_key', 'menu_item']
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.quantity} x {self.menu_item.name} held by {self.cart_key}"
@@ -0,0 +1,144 @@
+"""
+Restaurant search.
+
+browse_restaurants used to OR three icontains filters across restaurants
+joined to their categories, then DISTINCT the fan-out: a full scan that
+got slower as menus grew. Each restaurant now has one
+RestaurantSearchDocument row holding its name plus its description,
+category names and menu item names, and a full-text index over it:
+
+- PostgreSQL: a generated, weighted tsvector column with a GIN index,
+  ranked with ts_rank
+- SQLite: an FTS5 table kept in step with the documents by triggers,
+  ranked with bm25
+
+Both are created by migration restaurants/0010. Other databases, or a
+SQLite build without FTS5, fall back to icontains over the documents
+table alone. Every query term matches as a prefix, so results appear
+while the visitor is still typing, and a name match outranks a menu match.
+
+Documents are rebuilt after the transaction that changed a restaurant,
+category or menu item commits (restaurants/signals.py).
+``manage.py rebuild_search_index`` rebuilds them all.
+"""
+import logging
+import re
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Case, IntegerField, Q, When
+
+from .models import Category, MenuItem, Restaurant, RestaurantSearchDocument
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'restaurants_search_fts'
+DOCUMENT_TABLE = RestaurantSearchDocument._meta.db_table
+
+# Most matches a search returns, best first
+SEARCH_RESULT_LIMIT = getattr(settings, 'SEARCH_RESULT_LIMIT', 200)
+# Terms beyond this are ignored
+MAX_TERMS = 8
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+
+def build_document(restaurant_id):
+    """Rebuild one restaurant's search document (three queries)"""
+    restaurant = Restaurant.objects.filter(pk=restaurant_id).values('name', 'description').first()
+    if restaurant is None:
+        RestaurantSearchDocument.objects.filter(restaurant_id=restaurant_id).delete()
+        return None
+    category_names = Category.objects.filter(restaurant_id=restaurant_id).values_list('name', flat=True)
+    item_names = MenuItem.objects.filter(category__restaurant_id=restaurant_id).values_list('name', flat=True)
+    body = ' '.join(filter(None, [restaurant['description'], *category_names, *item_names]))
+    document, _ = RestaurantSearchDocument.objects.update_or_create(
+        restaurant_id=restaurant_id, defaults={'name': restaurant['name'], 'body': body},
+    )
+    return document
+
+
+def schedule_refresh(restaurant_id):
+    """Rebuild the restaurant's document once the current transaction commits"""
+    def refresh():
+        try:
+            build_document(restaurant_id)
+        except Exception as e:
+            # A stale search entry must never fail the edit itself
+            logger.error(f"Could not refresh search document for restaurant {restaurant_id}: {e}")
+
+    transaction.on_commit(refresh)
+
+
+def rebuild_all():
+    """Rebuild every search document; returns how many were written"""
+    with transaction.atomic():
+        RestaurantSearchDocument.objects.all().delete()
+        written = 0
+        for restaurant_id in Restaurant.objects.values_list('pk', flat=True).iterator():
+            build_document(restaurant_id)
+            written += 1
+    return written
+
+
+def search_terms(query):
+    return [term.lower() for term in _TERM.findall(query or '')][:MAX_TERMS]
+
+
+def _postgres_ids(terms, limit):
+    tsquery = ' & '.join(f"{term}:*" for term in terms)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT restaurant_id FROM {DOCUMENT_TABLE}, to_tsquery('simple', %s) query "
+            f"WHERE search_vector @@ query ORDER BY ts_rank(search_vector, query) DESC, restaurant_id LIMIT %s",
+            [tsquery, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _sqlite_ids(terms, limit):
+    # Quoted so FTS5 operators typed by the visitor are taken literally
+    match = ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY bm25({FTS_TABLE}, 10.0, 1.0), rowid LIMIT %s",
+            [match, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _fallback_ids(terms, limit):
+    documents = RestaurantSearchDocument.objects.all()
+    for term in terms:
+        documents = documents.filter(Q(name__icontains=term) | Q(body__icontains=term))
+    name_first = Case(
+        When(Q(*[Q(name__icontains=term) for term in terms]), then=0), default=1, output_field=IntegerField(),
+    )
+    return list(documents.order_by(name_first, 'restaurant_id').values_list('restaurant_id', flat=True)[:limit])
+
+
+def search_restaurant_ids(query, limit=SEARCH_RESULT_LIMIT):
+    """Ids of restaurants matching ``query``, best match first"""
+    terms = search_terms(query)
+    if not terms:
+        return []
+    search = {'postgresql': _postgres_ids, 'sqlite': _sqlite_ids}.get(connection.vendor, _fallback_ids)
+    if search is _fallback_ids:
+        return search(terms, limit)
+    try:
+        with transaction.atomic():
+            return search(terms, limit)
+    except DatabaseError as e:
+        # No full-text index (e.g. SQLite built without FTS5)
+        logger.warning(f"Full-text restaurant search unavailable, using a plain scan: {e}")
+        return _fallback_ids(terms, limit)
+
+
+def search_restaurants(queryset, query, limit=SEARCH_RESULT_LIMIT):
+    """Restrict a Restaurant queryset to matches for ``query``, ordered by rank"""
+    ids = search_restaurant_ids(query, limit)
+    if not ids:
+        return queryset.none()
+    rank = Case(*[When(pk=pk, then=position) for position, pk in enumerate(ids)], output_field=IntegerField())
+    return queryset.filter(pk__in=ids).order_by(rank)
@@ -0,0 +1,53 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .menu_cache import invalidate_menu
+from .models import Category, MenuItem, Restaurant
+from .search import schedule_refresh
+
+
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+def refresh_menu_for_item(sender, instance, **kwargs):
+    """Drop the cached menu when an item is added, edited or removed."""
+    try:
+        restaurant_id = instance.category.restaurant_id
+    except Category.DoesNotExist:
+        return
+    invalidate_menu(restaurant_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def refresh_menu_for_category(sender, instance, **kwargs):
+    """Drop the cached menu when a category changes."""
+    invalidate_menu(instance.restaurant_id)
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+def refresh_menu_for_restaurant(sender, instance, **kwargs):
+    """Drop the cached menu when the restaurant itself changes."""
+    invalidate_menu(instance.pk)
+
+
+# Search documents (restaurants/search.py)
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+def refresh_search_for_item(sender, instance, **kwargs):
+    try:
+        restaurant_id = instance.category.restaurant_id
+    except Category.DoesNotExist:
+        return
+    schedule_refresh(restaurant_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def refresh_search_for_category(sender, instance, **kwargs):
+    schedule_refresh(instance.restaurant_id)
+
+
+@receiver(post_save, sender=Restaurant)
+def refresh_search_for_restaurant(sender, instance, **kwargs):
+    schedule_refresh(instance.pk)
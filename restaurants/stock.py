@@ -0,0 +1,192 @@
+"""
+Race-free stock changes for stock-tracked menu items.
+
+Every change is a single UPDATE built from F() expressions. Decrements
+carry a ``stock_quantity >= n`` condition, so two orders that both saw
+"1 left" cannot both succeed. is_available is switched off in the same
+statement when an item sells out.
+
+Carts can hold stock with reserve(). Held stock leaves stock_quantity
+straight away. release() or release_expired() hands it back, and
+consume() turns it into an order at checkout. orders/cart.py reserves as
+items are added and releases as they are removed; the ``reservations``
+process in the Procfile frees abandoned carts.
+
+Cached menus are dropped once the change commits, so a rolled-back
+checkout cannot leave a menu rebuilt from stock that was never taken.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+from .menu_cache import invalidate_menu_for_items
+from .models import MenuItem, StockReservation
+
+# Seconds a cart reservation holds stock before release_expired() frees it
+RESERVATION_TTL = getattr(settings, 'STOCK_RESERVATION_TTL', 900)
+
+
+class InsufficientStock(Exception):
+    """Raised when stock cannot be taken out in full"""
+
+
+def _per_item(quantities):
+    """CASE expression yielding each item's quantity (0 for anything else)"""
+    return Case(*[When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()], default=Value(0))
+
+
+def _decrement(amount):
+    """UPDATE values subtracting ``amount`` and disabling rows that hit zero"""
+    return {
+        # Listed before stock_quantity: MySQL applies SET clauses left to right
+        'is_available': Case(When(stock_quantity=amount, then=Value(False)), default=F('is_available')),
+        'stock_quantity': F('stock_quantity') - amount,
+        'updated_at': timezone.now(),
+    }
+
+
+def _refresh_sold_out_menus(menu_item_ids):
+    """Cached menus only change when a decrement sold an item out"""
+    transaction.on_commit(lambda: invalidate_menu_for_items(
+        MenuItem.objects.filter(pk__in=menu_item_ids, stock_quantity=0).values('pk')
+    ))
+
+
+def reduce_stock(menu_item_id, quantity=1):
+    """Take ``quantity`` of one item out of stock. Returns False if not enough is left."""
+    updated = MenuItem.objects.filter(
+        pk=menu_item_id, track_stock=True, stock_quantity__gte=quantity,
+    ).update(**_decrement(Value(quantity)))
+    if updated:
+        _refresh_sold_out_menus([menu_item_id])
+    return updated == 1
+
+
+def reduce_stock_batch(quantities):
+    """Take several items out of stock in one UPDATE, all or nothing.
+
+    ``quantities`` maps stock-tracked menu item ids to the amount needed.
+    Raises InsufficientStock (and changes nothing) if any item is short.
+    """
+    quantities = {pk: quantity for pk, quantity in quantities.items() if quantity > 0}
+    if not quantities:
+        return
+    enough = Q()
+    for pk, quantity in quantities.items():
+        enough |= Q(pk=pk, stock_quantity__gte=quantity)
+
+    with transaction.atomic():
+        updated = MenuItem.objects.filter(enough, track_stock=True).update(**_decrement(_per_item(quantities)))
+        if updated != len(quantities):
+            # Raising inside the atomic block rolls back the rows that did match
+            raise InsufficientStock('Not enough stock left for every item')
+        _refresh_sold_out_menus(list(quantities))
+
+
+def add_stock(menu_item_id, quantity):
+    """Put ``quantity`` back into stock, re-enabling the item"""
+    if quantity <= 0:
+        return False
+    updated = MenuItem.objects.filter(pk=menu_item_id, track_stock=True).update(
+        stock_quantity=F('stock_quantity') + quantity,
+        is_available=True,
+        updated_at=timezone.now(),
+    )
+    if updated:
+        transaction.on_commit(lambda: invalidate_menu_for_items([menu_item_id]))
+    return updated == 1
+
+
+def add_stock_batch(quantities):
+    """Put stock back for several items in one UPDATE"""
+    quantities = {pk: quantity for pk, quantity in quantities.items() if quantity > 0}
+    if not quantities:
+        return 0
+    updated = MenuItem.objects.filter(pk__in=list(quantities), track_stock=True).update(
+        stock_quantity=F('stock_quantity') + _per_item(quantities),
+        is_available=True,
+        updated_at=timezone.now(),
+    )
+    if updated:
+        transaction.on_commit(lambda: invalidate_menu_for_items(list(quantities)))
+    return updated
+
+
+# ============================================
+# CART RESERVATIONS
+# ============================================
+
+def reserve(cart_key, menu_item_id, quantity, ttl=None):
+    """Hold ``quantity`` more of an item for a cart. Raises InsufficientStock."""
+    expires_at = timezone.now() + timedelta(seconds=ttl or RESERVATION_TTL)
+    with transaction.atomic():
+        if not reduce_stock(menu_item_id, quantity):
+            raise InsufficientStock('Not enough stock left to reserve')
+        reservation, created = StockReservation.objects.get_or_create(
+            cart_key=cart_key,
+            menu_item_id=menu_item_id,
+            defaults={'quantity': quantity, 'expires_at': expires_at},
+        )
+        if not created:
+            StockReservation.objects.filter(pk=reservation.pk).update(
+                quantity=F('quantity') + quantity,
+                expires_at=expires_at,
+            )
+
+
+def hold(cart_key, menu_item_id, quantity, ttl=None):
+    """Make a cart hold exactly ``quantity`` of an item. Raises InsufficientStock."""
+    with transaction.atomic():
+        release(cart_key, [menu_item_id])
+        if quantity > 0:
+            reserve(cart_key, menu_item_id, quantity, ttl)
+
+
+def held_quantities(cart_key):
+    """Menu item id -> quantity currently held by a cart"""
+    return dict(StockReservation.objects.filter(cart_key=cart_key).values_list('menu_item_id', 'quantity'))
+
+
+def _pop(reservations):
+    """Delete reservations and return the quantities they held, per item"""
+    held = {}
+    for menu_item_id, quantity in reservations.select_for_update().values_list('menu_item_id', 'quantity'):
+        held[menu_item_id] = held.get(menu_item_id, 0) + quantity
+    reservations.delete()
+    return held
+
+
+def release(cart_key, menu_item_ids=None):
+    """Give a cart's held stock back (some items, or everything it holds)"""
+    reservations = StockReservation.objects.filter(cart_key=cart_key)
+    if menu_item_ids is not None:
+        reservations = reservations.filter(menu_item_id__in=list(menu_item_ids))
+    # Most carts hold nothing (untracked items, or checkout already consumed them)
+    if not reservations.exists():
+        return
+    with transaction.atomic():
+        add_stock_batch(_pop(reservations))
+
+
+def consume(cart_key, menu_item_ids=None):
+    """Drop a cart's reservations at checkout, keeping the stock out.
+
+    Only ``menu_item_ids`` are consumed when given, so other restaurants'
+    items in the same cart stay held. Returns the held quantities so the
+    caller only takes out the rest.
+    """
+    reservations = StockReservation.objects.filter(cart_key=cart_key)
+    if menu_item_ids is not None:
+        reservations = reservations.filter(menu_item_id__in=list(menu_item_ids))
+    with transaction.atomic():
+        return _pop(reservations)
+
+
+def release_expired(now=None):
+    """Give back stock from every expired reservation. Returns items restocked."""
+    expired = StockReservation.objects.filter(expires_at__lte=now or timezone.now())
+    with transaction.atomic():
+        return add_stock_batch(_pop(expired))
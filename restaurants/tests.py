@@ -1,3 +1,76 @@
-from django.test import TestCase
+import json
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from accounts.models import CustomUser
+from orders.events import get_broker, restaurant_channel
+from orders.models import OrderEvent
+
+from .models import Restaurant, Staff
+
+
+@override_settings(
+    ORDER_EVENTS_BROKER='orders.events.DatabaseBroker', ORDER_EVENTS_POLL_INTERVAL=0,
+    STAFF_EVENTS_KEEPALIVE=1, STAFF_EVENTS_MAX_DURATION=1,
+)
+class StaffOrderEventsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user('owner', 'owner@example.com', 'pw', role='restaurant_owner')
+        cls.cook = CustomUser.objects.create_user('cook', 'cook@example.com', 'pw', role='customer')
+        cls.restaurant = Restaurant.objects.create(
+            owner=cls.owner, name='Mama Put', slug='mama-put', address='1 Road', phone='080',
+            email='mama@example.com', opening_time='09:00', closing_time='21:00',
+        )
+        Staff.objects.create(user=cls.cook, restaurant=cls.restaurant, role='kitchen')
+
+    def setUp(self):
+        get_broker.cache_clear()
+        self.addCleanup(get_broker.cache_clear)
+
+    def publish(self, order_id, status, previous_status):
+        get_broker().publish(restaurant_channel(self.restaurant.pk), {
+            'type': 'status', 'order_id': order_id, 'status': status,
+            'status_display': status.title(), 'previous_status': previous_status,
+        })
+        return OrderEvent.objects.latest('id').pk
+
+    async def stream(self, user, last_event_id):
+        """Body of one stream, which ends after STAFF_EVENTS_MAX_DURATION"""
+        await sync_to_async(self.client.force_login)(user)
+        self.async_client.cookies = self.client.cookies
+        response = await self.async_client.get(
+            reverse('staff_order_events', args=[self.restaurant.slug]), headers={'Last-Event-ID': str(last_event_id)},
+        )
+        self.assertEqual(response.status_code, 200)
+        return b''.join([chunk async for chunk in response.streaming_content]).decode()
+
+    @staticmethod
+    def order_ids(body):
+        return [json.loads(line[len('data: '):])['order_id'] for line in body.splitlines() if line.startswith('data: ')]
+
+    async def publish_day(self):
+        publish = sync_to_async(self.publish)
+        first = await publish(1, 'pending', None)
+        await publish(1, 'confirmed', 'pending')
+        await publish(2, 'completed', 'ready')
+        await publish(3, 'ready', 'preparing')
+        return first
+
+    async def test_owner_replays_everything_after_last_event_id(self):
+        first = await self.publish_day()
+        self.assertEqual(self.order_ids(await self.stream(self.owner, first - 1)), [1, 1, 2, 3])
+        self.assertEqual(self.order_ids(await self.stream(self.owner, first + 1)), [2, 3])
+
+    async def test_kitchen_only_sees_orders_entering_or_leaving_its_statuses(self):
+        first = await self.publish_day()
+        body = await self.stream(self.cook, first - 1)
+        self.assertEqual(self.order_ids(body), [1, 3])
+        self.assertIn(f'id: {first + 1}\n', body)
+
+    async def test_unknown_last_event_id_asks_the_page_to_resync(self):
+        first = await self.publish_day()
+        body = await self.stream(self.owner, first + 100)
+        self.assertIn('event: resync', body)
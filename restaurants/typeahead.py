@@ -0,0 +1,133 @@
+"""
+Dish typeahead across every restaurant.
+
+suggest() matches the typed text against menu item names and
+descriptions, each word as a prefix, through a full-text index created by
+migration restaurants/0011:
+
+- PostgreSQL: a generated tsvector column on the menu items with a GIN
+  index, queried with ``word:*`` terms
+- SQLite: an FTS5 table with prefix indexes for 2-4 characters, kept in
+  step with the menu items by triggers
+
+Other databases fall back to istartswith on the name. Only items that
+can be ordered (MenuItem.can_be_ordered) from active restaurants are
+returned, name matches first.
+
+Answers are cached per normalised prefix in the "typeahead" cache
+namespace for TYPEAHEAD_CACHE_TTL seconds. Any menu change clears the
+namespace (menu_cache.invalidate_menu), so the index is only consulted
+for the first keystroke of a prefix after an edit.
+"""
+import logging
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.urls import reverse
+
+from core.cache_namespaces import NamespacedCache
+
+from .models import MenuItem
+from .search import search_terms
+
+logger = logging.getLogger(__name__)
+
+cache = NamespacedCache('typeahead')
+
+TYPEAHEAD_CACHE_TTL = getattr(settings, 'TYPEAHEAD_CACHE_TTL', 300)
+TYPEAHEAD_LIMIT = 10
+# Shorter input matches too much to be useful
+MIN_PREFIX_LENGTH = 2
+
+FTS_TABLE = 'restaurants_menuitem_fts'
+
+# Orderable items of active restaurants (MenuItem.can_be_ordered in SQL)
+_ORDERABLE = """
+    JOIN restaurants_category c ON c.id = m.category_id
+    JOIN restaurants_restaurant r ON r.id = c.restaurant_id
+    WHERE r.is_active
+      AND CASE WHEN m.track_stock THEN m.stock_quantity > 0 ELSE m.is_available END
+"""
+
+
+def normalize(query):
+    """Cache key form of the typed text: lower-cased words, single spaces"""
+    return ' '.join(search_terms(query))[:100]
+
+
+def _postgres_ids(terms, limit):
+    tsquery = ' & '.join(f"{term}:*" for term in terms)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT m.id FROM restaurants_menuitem m {_ORDERABLE} "
+            f"AND m.search_vector @@ to_tsquery('simple', %s) "
+            f"ORDER BY ts_rank(m.search_vector, to_tsquery('simple', %s)) DESC, m.name LIMIT %s",
+            [tsquery, tsquery, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _sqlite_ids(terms, limit):
+    match = ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT m.id FROM {FTS_TABLE} JOIN restaurants_menuitem m ON m.id = {FTS_TABLE}.rowid {_ORDERABLE} "
+            f"AND {FTS_TABLE} MATCH %s ORDER BY bm25({FTS_TABLE}, 10.0, 1.0), m.name LIMIT %s",
+            [match, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _fallback_ids(terms, limit):
+    items = MenuItem.objects.filter(category__restaurant__is_active=True).exclude(track_stock=True, stock_quantity=0)
+    items = items.exclude(track_stock=False, is_available=False)
+    for term in terms:
+        items = items.filter(name__icontains=term)
+    return list(items.filter(name__istartswith=terms[0]).order_by('name').values_list('pk', flat=True)[:limit])
+
+
+def _matching_ids(terms, limit):
+    search = {'postgresql': _postgres_ids, 'sqlite': _sqlite_ids}.get(connection.vendor, _fallback_ids)
+    if search is _fallback_ids:
+        return search(terms, limit)
+    try:
+        with transaction.atomic():
+            return search(terms, limit)
+    except DatabaseError as e:
+        logger.warning(f"Menu item full-text index unavailable, using a plain scan: {e}")
+        return _fallback_ids(terms, limit)
+
+
+def _serialize(ids):
+    items = MenuItem.objects.filter(pk__in=ids).select_related('category__restaurant').only(
+        'name', 'price', 'image', 'category__restaurant__name', 'category__restaurant__slug',
+    )
+    by_id = {item.pk: item for item in items}
+    results = []
+    for pk in ids:
+        item = by_id.get(pk)
+        if item is None:
+            continue
+        restaurant = item.category.restaurant
+        results.append({
+            'id': item.pk,
+            'name': item.name,
+            'price': str(item.price),
+            'image_url': item.image.url if item.image else '',
+            'restaurant': restaurant.name,
+            'url': reverse('restaurant_detail', args=[restaurant.slug]),
+        })
+    return results
+
+
+def suggest(query, limit=TYPEAHEAD_LIMIT):
+    """Orderable dishes matching ``query`` as a list of plain dicts, best first"""
+    prefix = normalize(query)
+    if len(prefix) < MIN_PREFIX_LENGTH:
+        return []
+    key = f"typeahead:{limit}:{prefix.replace(' ', '+')}"
+    results = cache.get(key)
+    if results is None:
+        results = _serialize(_matching_ids(prefix.split(' '), limit))
+        cache.set(key, results, TYPEAHEAD_CACHE_TTL)
+    return results
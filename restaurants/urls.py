@@ -29,8 +29,13 @@ urlpatterns = [
     path('<slug:slug>/staff/<int:staff_id>/update/', views.update_staff, name='update_staff'),
     path('<slug:slug>/staff/invite/<int:invite_id>/cancel/', views.cancel_invite, name='cancel_invite'),
     path('<slug:slug>/staff-dashboard/', views.staff_dashboard, name='staff_dashboard'),
+    path('<slug:slug>/staff-dashboard/events/', views.staff_order_events, name='staff_order_events'),
+    path('<slug:slug>/staff-dashboard/orders/<int:order_id>/row/', views.staff_order_row, name='staff_order_row'),
     path('<slug:slug>/staff/order/<int:order_id>/', views.staff_update_order, name='staff_update_order'),
     
+    # Dish typeahead (JSON)
+    path('menu-search/', views.menu_item_typeahead, name='menu_item_typeahead'),
+    
     # Preferred Restaurant (Customer Feature)
     path('<slug:slug>/set-preferred/', views.set_preferred_restaurant, name='set_preferred_restaurant'),
     path('remove-preferred/', views.remove_preferred_restaurant, name='remove_preferred_restaurant'),
@@ -1,17 +1,42 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import require_GET
 from django.utils import timezone
 from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.db.models import Count, Q
+from asgiref.sync import sync_to_async
 from datetime import timedelta
+import asyncio
+import json
 from .models import Restaurant, Category, MenuItem, GalleryImage, Staff, StaffInvite
+from .menu_cache import get_anonymous_menu_html, get_menu_snapshot
+from .typeahead import suggest
+from core.date_ranges import on_day
+from orders.events import get_broker, restaurant_channel
 from orders.models import Order
+from orders.stats import OwnerStats
+from orders.transitions import InvalidTransition, bulk_transition, mark_payment_confirmed, transition
 from payments.models import Payment
 from reviews.models import Feedback
 
 User = get_user_model()
 
+# Orders kitchen staff see on the staff dashboard
+KITCHEN_ORDER_STATUSES = ('confirmed', 'preparing')
+
+
+# PUBLIC VIEW - Dish typeahead across all restaurants
+@require_GET
+@cache_control(public=True, max_age=30)
+def menu_item_typeahead(request):
+    """JSON list of orderable dishes matching ?q= (prefix match on every word)"""
+    query = request.GET.get('q', '')
+    return JsonResponse({'query': query, 'results': suggest(query)})
+
 
 # PUBLIC VIEW - Restaurant detail page
 def restaurant_detail(request, slug):
@@ -20,7 +45,15 @@ def restaurant_detail(request, slug):
     logger = logging.getLogger(__name__)
     try:
         restaurant = get_object_or_404(Restaurant, slug=slug, is_active=True)
-        categories = Category.objects.filter(restaurant=restaurant).prefetch_related('menuitem_set')
+        
+        # Menu comes from the cached snapshot; logged-out visitors get the
+        # whole menu section pre-rendered
+        menu_html = None
+        categories = []
+        if request.user.is_authenticated:
+            categories = get_menu_snapshot(restaurant.id)
+        else:
+            menu_html = get_anonymous_menu_html(restaurant.id)
 
         # Check if this is user's preferred restaurant
         is_preferred = False
@@ -52,6 +85,7 @@ def restaurant_detail(request, slug):
         context = {
             'restaurant': restaurant,
             'categories': categories,
+            'menu_html': menu_html,
             'is_preferred': is_preferred,
             'user_orders': user_orders,
             'user_payments': user_payments,
@@ -110,51 +144,18 @@ def restaurant_dashboard(request):
         return redirect('dashboard')
     
     restaurants = Restaurant.objects.filter(owner=request.user)
-    recent_orders = Order.objects.filter(restaurant__owner=request.user).order_by('-created_at')[:10]
+    recent_orders = Order.objects.filter(restaurant__owner=request.user).select_related(
+        'restaurant', 'customer'
+    ).order_by('-created_at')[:10]
     
-    # Basic stats
-    total_orders = Order.objects.filter(restaurant__owner=request.user).count()
-    pending_orders = Order.objects.filter(restaurant__owner=request.user, status='pending').count()
-    completed_orders = Order.objects.filter(restaurant__owner=request.user, status__in=['confirmed', 'completed']).count()
-    
-    # Revenue calculation
-    from django.db.models import Sum
-    total_revenue = Order.objects.filter(
-        restaurant__owner=request.user, 
-        status__in=['confirmed', 'completed']
-    ).aggregate(Sum('total_price'))['total_price__sum'] or 0
-    
-    # Today's stats
-    from django.utils import timezone
-    today = timezone.now().date()
-    today_orders = Order.objects.filter(
-        restaurant__owner=request.user,
-        created_at__date=today
-    ).count()
-    today_revenue = Order.objects.filter(
-        restaurant__owner=request.user,
-        status__in=['confirmed', 'completed'],
-        created_at__date=today
-    ).aggregate(Sum('total_price'))['total_price__sum'] or 0
-    
-    # This month's stats
-    from datetime import timedelta
-    first_day_of_month = today.replace(day=1)
-    monthly_revenue = Order.objects.filter(
-        restaurant__owner=request.user,
-        status__in=['confirmed', 'completed'],
-        created_at__date__gte=first_day_of_month
-    ).aggregate(Sum('total_price'))['total_price__sum'] or 0
-    monthly_orders = Order.objects.filter(
-        restaurant__owner=request.user,
-        created_at__date__gte=first_day_of_month
-    ).count()
+    # Totals, today's and this month's stats in a single aggregate query
+    stats = OwnerStats(request.user).summary()
     
     # Active orders (not completed/cancelled)
     active_orders = Order.objects.filter(
         restaurant__owner=request.user,
         status__in=['pending', 'awaiting_confirmation', 'preparing', 'ready']
-    ).order_by('-created_at')[:5]
+    ).select_related('restaurant', 'customer').order_by('-created_at')[:5]
     
     # Menu items count
     from restaurants.models import MenuItem
@@ -167,14 +168,14 @@ def restaurant_dashboard(request):
         'restaurants': restaurants,
         'recent_orders': recent_orders,
         'active_orders': active_orders,
-        'total_orders': total_orders,
-        'pending_orders': pending_orders,
-        'completed_orders': completed_orders,
-        'total_revenue': total_revenue,
-        'today_orders': today_orders,
-        'today_revenue': today_revenue,
-        'monthly_revenue': monthly_revenue,
-        'monthly_orders': monthly_orders,
+        'total_orders': stats['total_orders'],
+        'pending_orders': stats['pending_orders'],
+        'completed_orders': stats['revenue_orders'],
+        'total_revenue': stats['total_revenue'],
+        'today_orders': stats['today_orders'],
+        'today_revenue': stats['today_revenue'],
+        'monthly_revenue': stats['monthly_revenue'],
+        'monthly_orders': stats['monthly_orders'],
         'total_menu_items': total_menu_items,
         'total_staff': total_staff,
     }
@@ -587,18 +588,22 @@ def update_stock(request, item_id):
         quantity = int(request.POST.get('quantity', 0))
         
         if action == 'add':
-            menu_item.stock_quantity += quantity
+            # Atomic increment so a restock never overwrites stock sold meanwhile
+            was_available = menu_item.is_available
+            menu_item.add_stock(quantity)
             messages.success(request, f'Added {quantity} to {menu_item.name} stock. New total: {menu_item.stock_quantity}')
+            if menu_item.is_available and not was_available:
+                messages.info(request, f'{menu_item.name} automatically re-enabled (stock available)')
         elif action == 'set':
             menu_item.stock_quantity = quantity
             messages.success(request, f'Set {menu_item.name} stock to {quantity}')
-        
-        # Auto-enable if stock added to out-of-stock item
-        if menu_item.stock_quantity > 0 and not menu_item.is_available and menu_item.track_stock:
-            menu_item.is_available = True
-            messages.info(request, f'{menu_item.name} automatically re-enabled (stock available)')
-        
-        menu_item.save()
+            
+            # Auto-enable if stock added to out-of-stock item
+            if menu_item.stock_quantity > 0 and not menu_item.is_available and menu_item.track_stock:
+                menu_item.is_available = True
+                messages.info(request, f'{menu_item.name} automatically re-enabled (stock available)')
+            
+            menu_item.save(update_fields=['stock_quantity', 'is_available', 'updated_at'])
         return redirect('manage_menu', restaurant_id=menu_item.category.restaurant.id)
     
     return redirect('dashboard')
@@ -636,8 +641,10 @@ def update_order_status(request, order_id):
         new_status = request.POST.get('status')
         
         if new_status in dict(Order.STATUS_CHOICES):
-            order.status = new_status
-            order.save()
+            try:
+                transition(order, new_status, user=request.user, source='update_order_status')
+            except InvalidTransition as e:
+                return JsonResponse({'success': False, 'message': str(e)})
             
             return JsonResponse({
                 'success': True,
@@ -663,11 +670,13 @@ def update_order_status(request, order_id):
         old_status = order.status  # Save old status for email
         
         if new_status in dict(Order.STATUS_CHOICES):
-            order.status = new_status
-            order.save()
+            try:
+                transition(order, new_status, user=request.user, source='update_order_status')
+            except InvalidTransition as e:
+                return JsonResponse({'success': False, 'message': str(e)})
             
             # Send status update email to customer
-            send_order_status_update(order, old_status, new_status)
+            send_order_status_update(order, old_status, order.status)
             
             return JsonResponse({
                 'success': True,
@@ -1097,30 +1106,146 @@ def staff_dashboard(request, slug):
     orders = Order.objects.filter(restaurant=restaurant).order_by('-created_at')
     
     # Filter orders for kitchen staff (only show preparing orders)
-    if staff and staff.role == 'kitchen':
-        orders = orders.filter(status__in=['confirmed', 'preparing'])
+    visible_statuses = _staff_visible_statuses(staff)
+    if visible_statuses:
+        orders = orders.filter(status__in=visible_statuses)
     
     # Get recent orders
-    recent_orders = orders[:20]
+    recent_orders = orders.select_related('customer').prefetch_related('orderitem_set__menu_item')[:20]
     
-    # Stats
+    # Stats in one query; the page then keeps them current from the event stream
     today = timezone.now().date()
-    today_orders = orders.filter(created_at__date=today)
+    counts = orders.aggregate(
+        today_orders_count=Count('id', filter=on_day('created_at', today)),
+        pending_orders=Count('id', filter=Q(status='pending')),
+        preparing_orders=Count('id', filter=Q(status='preparing')),
+        ready_orders=Count('id', filter=Q(status='ready')),
+    )
     
     context = {
         'restaurant': restaurant,
         'staff': staff,
         'is_owner': is_owner,
         'orders': recent_orders,
-        'today_orders_count': today_orders.count(),
-        'pending_orders': orders.filter(status='pending').count(),
-        'preparing_orders': orders.filter(status='preparing').count(),
-        'ready_orders': orders.filter(status='ready').count(),
         'permissions': staff.permissions if staff else Staff.ROLE_PERMISSIONS['manager'],  # Owner gets manager perms
+        **counts,
     }
     return render(request, 'restaurants/staff_dashboard.html', context)
 
 
+def _staff_visible_statuses(staff):
+    """Order statuses a staff member works on, or None for all of them"""
+    if staff and staff.role == 'kitchen':
+        return KITCHEN_ORDER_STATUSES
+    return None
+
+
+@login_required
+def staff_order_row(request, slug, order_id):
+    """One staff dashboard table row, fetched by the page when an order event arrives"""
+    restaurant = get_object_or_404(Restaurant, slug=slug)
+    staff = Staff.get_staff_for_user(request.user, restaurant)
+    is_owner = request.user == restaurant.owner
+    if not staff and not is_owner:
+        return HttpResponseForbidden()
+    
+    order = get_object_or_404(
+        Order.objects.select_related('customer').prefetch_related('orderitem_set__menu_item'),
+        id=order_id, restaurant=restaurant,
+    )
+    visible_statuses = _staff_visible_statuses(staff)
+    if visible_statuses and order.status not in visible_statuses:
+        return HttpResponse(status=204)
+    
+    return render(request, 'restaurants/staff_order_row.html', {
+        'restaurant': restaurant,
+        'staff': staff,
+        'is_owner': is_owner,
+        'order': order,
+        'permissions': staff.permissions if staff else Staff.ROLE_PERMISSIONS['manager'],
+    })
+
+
+def _staff_event_scope(request, slug):
+    """(restaurant id, visible statuses) for an event stream, or None if not allowed"""
+    if not request.user.is_authenticated:
+        return None
+    restaurant = Restaurant.objects.filter(slug=slug).first()
+    if restaurant is None:
+        return None
+    staff = Staff.get_staff_for_user(request.user, restaurant)
+    if not staff and request.user.id != restaurant.owner_id:
+        return None
+    return restaurant.id, _staff_visible_statuses(staff)
+
+
+async def staff_order_events(request, slug):
+    """Server-Sent Events stream of new orders and status changes for the staff dashboard.
+
+    Needs the ASGI application (restaurantsaas.asgi) so an open stream does not
+    hold a worker thread. Streams end after STAFF_EVENTS_MAX_DURATION seconds
+    and the browser reconnects on its own.
+    """
+    scope = await sync_to_async(_staff_event_scope)(request, slug)
+    if scope is None:
+        return HttpResponseForbidden()
+    restaurant_id, visible_statuses = scope
+    keepalive = getattr(settings, 'STAFF_EVENTS_KEEPALIVE', 15)
+    max_duration = getattr(settings, 'STAFF_EVENTS_MAX_DURATION', 300)
+
+    def is_visible(status):
+        return status is not None and (visible_statuses is None or status in visible_statuses)
+
+    # EventSource sends the last id it saw when it reconnects
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        last_event_id = None
+
+    async def stream():
+        subscription = await sync_to_async(get_broker().subscribe)(
+            restaurant_channel(restaurant_id), after=last_event_id, loop=asyncio.get_running_loop(),
+        )
+        if subscription is None:
+            # The events we missed are gone; the page has to reload
+            yield 'retry: 3000\nevent: resync\ndata: {}\n\n'
+            return
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_duration
+        try:
+            yield 'retry: 3000\n\n'
+            while loop.time() < deadline:
+                event = await subscription.get(timeout=min(keepalive, deadline - loop.time()))
+                if event is None:
+                    yield ': keepalive\n\n'
+                    continue
+                if event['type'] == 'bulk':
+                    orders = []
+                    for change in event['orders']:
+                        was_visible = is_visible(change['previous_status'])
+                        visible = is_visible(change['status'])
+                        if visible or was_visible:
+                            orders.append({**change, 'visible': visible, 'was_visible': was_visible})
+                    if not orders:
+                        continue
+                    data = json.dumps({'id': event['id'], 'orders': orders})
+                    yield f"id: {event['id']}\nevent: orders\ndata: {data}\n\n"
+                    continue
+                was_visible = is_visible(event['previous_status'])
+                visible = is_visible(event['status'])
+                if not (visible or was_visible):
+                    continue
+                data = json.dumps({**event, 'visible': visible, 'was_visible': was_visible})
+                yield f"id: {event['id']}\nevent: order\ndata: {data}\n\n"
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required  
 def staff_update_order(request, slug, order_id):
     """Staff action to update order status"""
@@ -1137,63 +1262,53 @@ def staff_update_order(request, slug, order_id):
     
     if request.method == 'POST':
         action = request.POST.get('action')
+        source = f'staff_dashboard:{action}'
         
-        # Kitchen staff can only: confirmed -> preparing -> ready
-        if staff and staff.role == 'kitchen':
-            allowed_transitions = {
-                'confirmed': 'preparing',
-                'preparing': 'ready'
-            }
-            if action == 'next_status' and order.status in allowed_transitions:
-                order.status = allowed_transitions[order.status]
-                order.save()
-                messages.success(request, f"Order #{order.id} is now {order.get_status_display()}.")
-            else:
-                messages.error(request, "You don't have permission for this action.")
-        
-        # Waiter can: ready -> completed + confirm payment
-        elif staff and staff.role == 'waiter':
-            if action == 'mark_delivered' and order.status == 'ready':
-                order.status = 'completed'
-                order.save()
-                messages.success(request, f"Order #{order.id} marked as delivered.")
-            elif action == 'confirm_cash' and order.payment_method == 'cash':
-                order.payment_status = 'confirmed'
-                # Also update order status if appropriate
-                if order.status in ['pending', 'awaiting_confirmation', 'confirmed']:
-                    order.status = 'completed'
-                order.save()
-                messages.success(request, f"Cash payment confirmed for Order #{order.id}.")
-            else:
-                messages.error(request, "You don't have permission for this action.")
-        
-        # Cashier can: confirm payments
-        elif staff and staff.role == 'cashier':
-            if action in ['confirm_cash', 'confirm_payment']:
-                order.payment_status = 'confirmed'
-                # Also update order status if appropriate
-                if order.status in ['pending', 'awaiting_confirmation', 'confirmed']:
-                    order.status = 'completed'
-                order.save()
-                messages.success(request, f"Payment confirmed for Order #{order.id}.")
-            else:
-                messages.error(request, "You don't have permission for this action.")
-        
-        # Manager and Owner can do everything
-        elif staff and staff.role == 'manager' or is_owner:
-            if action == 'update_status':
-                new_status = request.POST.get('status')
-                if new_status:
-                    order.status = new_status
-                    order.save()
-                    messages.success(request, f"Order #{order.id} status updated to {order.get_status_display()}.")
-            elif action in ['confirm_cash', 'confirm_payment']:
-                order.payment_status = 'confirmed'
-                # Also update order status if appropriate
-                if order.status in ['pending', 'awaiting_confirmation', 'confirmed']:
-                    order.status = 'completed'
-                order.save()
-                messages.success(request, f"Payment confirmed for Order #{order.id}.")
+        try:
+            # Kitchen staff can only: confirmed -> preparing -> ready
+            if staff and staff.role == 'kitchen':
+                allowed_transitions = {
+                    'confirmed': 'preparing',
+                    'preparing': 'ready'
+                }
+                if action == 'next_status' and order.status in allowed_transitions:
+                    transition(order, allowed_transitions[order.status], user=request.user, source=source)
+                    messages.success(request, f"Order #{order.id} is now {order.get_status_display()}.")
+                else:
+                    messages.error(request, "You don't have permission for this action.")
+            
+            # Waiter can: ready -> completed + confirm payment
+            elif staff and staff.role == 'waiter':
+                if action == 'mark_delivered' and order.status == 'ready':
+                    transition(order, 'completed', user=request.user, source=source)
+                    messages.success(request, f"Order #{order.id} marked as delivered.")
+                elif action == 'confirm_cash' and order.payment_method == 'cash':
+                    # Orders not yet being prepared complete once paid
+                    mark_payment_confirmed(order, user=request.user, source=source)
+                    messages.success(request, f"Cash payment confirmed for Order #{order.id}.")
+                else:
+                    messages.error(request, "You don't have permission for this action.")
+            
+            # Cashier can: confirm payments
+            elif staff and staff.role == 'cashier':
+                if action in ['confirm_cash', 'confirm_payment']:
+                    mark_payment_confirmed(order, user=request.user, source=source)
+                    messages.success(request, f"Payment confirmed for Order #{order.id}.")
+                else:
+                    messages.error(request, "You don't have permission for this action.")
+            
+            # Manager and Owner can do everything
+            elif staff and staff.role == 'manager' or is_owner:
+                if action == 'update_status':
+                    new_status = request.POST.get('status')
+                    if new_status:
+                        transition(order, new_status, user=request.user, source=source)
+                        messages.success(request, f"Order #{order.id} status updated to {order.get_status_display()}.")
+                elif action in ['confirm_cash', 'confirm_payment']:
+                    mark_payment_confirmed(order, user=request.user, source=source)
+                    messages.success(request, f"Payment confirmed for Order #{order.id}.")
+        except InvalidTransition as e:
+            messages.error(request, str(e))
     
     return redirect('staff_dashboard', slug=slug)
 
@@ -1220,11 +1335,10 @@ def bulk_update_order_status(request, restaurant_id):
         messages.error(request, 'Invalid status selected.')
         return redirect('restaurant_orders', restaurant_id=restaurant_id)
 
-    updated_count = 0
-    for order in Order.objects.filter(id__in=order_ids, restaurant=restaurant):
-        if order.status != new_status:
-            order.status = new_status
-            order.save()
-            updated_count += 1
-    messages.success(request, f"Updated {updated_count} order(s) to '{valid_statuses[new_status]}'.")
+    result = bulk_transition(
+        Order.objects.filter(id__in=order_ids, restaurant=restaurant), new_status, user=request.user, request=request,
+    )
+    messages.success(request, f"Updated {result.updated} order(s) to '{valid_statuses[new_status]}'.")
+    if result.rejected:
+        messages.warning(request, f"{len(result.rejected)} order(s) cannot move to '{valid_statuses[new_status]}' from their current status and were left unchanged.")
     return redirect('restaurant_orders', restaurant_id=restaurant_id)
\ No newline at end of file
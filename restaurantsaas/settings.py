@@ -1,4 +1,6 @@
 import os
+import sys
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -52,12 +54,14 @@ AUTH_USER_MODEL = 'accounts.CustomUser'
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'core.middleware.MetricsMiddleware',  # Per-view SQL/template timing, see core/metrics.py
     'django.contrib.sessions.middleware.SessionMiddleware',  # MUST BE BEFORE AuthenticationMiddleware
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',  # MUST BE AFTER SessionMiddleware
     'django.contrib.messages.middleware.MessageMiddleware',  # REQUIRED FOR ADMIN
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'orders.middleware.CartSyncMiddleware',
 ]
 
 ROOT_URLCONF = 'restaurantsaas.urls'
@@ -65,7 +69,7 @@ ROOT_URLCONF = 'restaurantsaas.urls'
 # TEMPLATES CONFIGURATION - REQUIRED FOR ADMIN
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.metrics.TimedDjangoTemplates',  # DjangoTemplates plus render timing
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -108,6 +112,75 @@ LOGIN_URL = 'login'
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
 
+# ========== Cache ==========
+# CACHE_BACKEND selects the cache shared by menus, stats and settings:
+#   locmem - per-process memory (default; each gunicorn worker warms its own)
+#   file   - CACHE_LOCATION directory, shared by all workers on one host
+#   redis  - CACHE_URL (redis://host:6379/1), shared by every host; any
+#            Redis-protocol server works. Needs the `redis` package.
+# Entries are versioned per namespace, see core/cache_namespaces.py.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem').lower()
+if len(sys.argv) > 1 and sys.argv[1] == 'test':
+    # Tests always run against a local in-memory stand-in
+    CACHE_BACKEND = 'locmem'
+_CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'halosaas'),
+    'file': (
+        'django.core.cache.backends.filebased.FileBasedCache',
+        os.getenv('CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'halosaas-cache')),
+    ),
+    'redis': ('django.core.cache.backends.redis.RedisCache', os.getenv('CACHE_URL', 'redis://127.0.0.1:6379/1')),
+}
+if CACHE_BACKEND not in _CACHE_BACKENDS:
+    raise RuntimeError(f"CACHE_BACKEND must be one of {', '.join(_CACHE_BACKENDS)} (got '{CACHE_BACKEND}')")
+CACHES = {
+    'default': {
+        'BACKEND': _CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': _CACHE_BACKENDS[CACHE_BACKEND][1],
+        'KEY_PREFIX': os.getenv('CACHE_KEY_PREFIX', 'halosaas'),
+        'TIMEOUT': int(os.getenv('CACHE_TIMEOUT', '300')),
+    }
+}
+if CACHE_BACKEND in ('locmem', 'file'):
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '5000'))}
+
+# Seconds a cached navbar notification count may be served before it is
+# recomputed (signals drop it earlier whenever orders/carts/restaurants change)
+NOTIFICATION_COUNTER_TTL = int(os.getenv('NOTIFICATION_COUNTER_TTL', '60'))
+
+# Seconds each worker trusts its in-process PlatformSettings copy before
+# checking the shared cache for an admin edit
+PLATFORM_SETTINGS_CHECK_INTERVAL = float(os.getenv('PLATFORM_SETTINGS_CHECK_INTERVAL', '1'))
+
+# Seconds a cached restaurant menu snapshot may live (signals drop it on menu changes)
+MENU_CACHE_TTL = int(os.getenv('MENU_CACHE_TTL', '3600'))
+
+# Seconds stock reserved by a cart stays held before release_expired_reservations frees it
+STOCK_RESERVATION_TTL = int(os.getenv('STOCK_RESERVATION_TTL', '900'))
+
+# Seconds to coalesce cart changes before writing the SavedCart copy (0 = write every change)
+CART_SYNC_DEBOUNCE = float(os.getenv('CART_SYNC_DEBOUNCE', '0'))
+
+# Live staff dashboard (orders/events.py). The default broker shares events
+# through the OrderEvent table, which every worker polls; InProcessBroker
+# skips the table but only reaches streams in the same process.
+ORDER_EVENTS_BROKER = os.getenv('ORDER_EVENTS_BROKER', 'orders.events.DatabaseBroker')
+# Seconds between polls of the OrderEvent table, and how long rows are kept for reconnecting streams
+ORDER_EVENTS_POLL_INTERVAL = float(os.getenv('ORDER_EVENTS_POLL_INTERVAL', '1'))
+ORDER_EVENTS_RETENTION = int(os.getenv('ORDER_EVENTS_RETENTION', '3600'))
+# Seconds between keepalive comments, and before a stream ends so the browser reconnects
+STAFF_EVENTS_KEEPALIVE = int(os.getenv('STAFF_EVENTS_KEEPALIVE', '15'))
+STAFF_EVENTS_MAX_DURATION = int(os.getenv('STAFF_EVENTS_MAX_DURATION', '300'))
+
+# Per-view request metrics (core/metrics.py). Server-Timing headers go to
+# staff always and to everyone when METRICS_SERVER_TIMING is on; a statement
+# repeated METRICS_DUPLICATE_THRESHOLD times in one request is reported as
+# N+1. METRICS_TOKEN lets a Prometheus scraper read /internal/metrics.prom.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+METRICS_SERVER_TIMING = os.getenv('METRICS_SERVER_TIMING', str(DEBUG)).lower() == 'true'
+METRICS_DUPLICATE_THRESHOLD = int(os.getenv('METRICS_DUPLICATE_THRESHOLD', '5'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
 # Email (development)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
@@ -115,6 +188,14 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 PAYSTACK_PUBLIC_KEY = os.getenv('PAYSTACK_PUBLIC_KEY', '')
 PAYSTACK_SECRET_KEY = os.getenv('PAYSTACK_SECRET_KEY', '')
 PAYSTACK_WEBHOOK_SECRET = os.getenv('PAYSTACK_WEBHOOK_SECRET', '')
+# API endpoint (point at `manage.py fake_paystack` for local runs), client
+# timeouts in seconds, retries on connection errors/5xx, and pooled connections
+PAYSTACK_BASE_URL = os.getenv('PAYSTACK_BASE_URL', 'https://api.paystack.co')
+PAYSTACK_CONNECT_TIMEOUT = float(os.getenv('PAYSTACK_CONNECT_TIMEOUT', '5'))
+PAYSTACK_READ_TIMEOUT = float(os.getenv('PAYSTACK_READ_TIMEOUT', '15'))
+PAYSTACK_MAX_RETRIES = int(os.getenv('PAYSTACK_MAX_RETRIES', '2'))
+PAYSTACK_RETRY_BACKOFF = float(os.getenv('PAYSTACK_RETRY_BACKOFF', '0.25'))
+PAYSTACK_POOL_SIZE = int(os.getenv('PAYSTACK_POOL_SIZE', '10'))
 
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -125,6 +206,10 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = 'Halo Sass <noreply@halosass.com>'
 
+# Queue outgoing email in the OutboundEmail table for the send_queued_emails
+# worker instead of sending over SMTP inside the request
+EMAIL_QUEUE_ENABLED = os.getenv('EMAIL_QUEUE_ENABLED', 'True').lower() == 'true'
+
 # For development - fallback to console if no email config
 if not EMAIL_HOST_USER or not EMAIL_HOST_PASSWORD:
     EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
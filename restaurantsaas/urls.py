@@ -6,9 +6,10 @@ from core.views import home  # Make sure this import works
 from restaurants.views import accept_staff_invite
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('', home, name='home'),
+    # Before the admin site, whose catch-all would otherwise 404 core's admin/... pages
     path('', include('core.urls')),
+    path('admin/', admin.site.urls),
     path('accounts/', include('accounts.urls')),
     path('restaurants/', include('restaurants.urls')),
     path('orders/', include('orders.urls')),